@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import shutil
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -72,12 +74,92 @@ WSGI_APPLICATION = 'chesssite.wsgi.application'
 ASGI_APPLICATION = 'chesssite.asgi.application'
 
 # Channel Layers for WebSocket support
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# Set CHANNEL_REDIS_URL (e.g. redis://localhost:6379/0) to share the channel layer
+# between processes and nodes; required for analysis workers
+CHANNEL_REDIS_URL = os.environ.get('CHANNEL_REDIS_URL')
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+        }
     }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
+    }
+
+# Stockfish engine
+# STOCKFISH_PATH environment variable wins, otherwise look for stockfish on PATH
+STOCKFISH_PATH = os.environ.get('STOCKFISH_PATH') or shutil.which('stockfish') or 'stockfish'
+
+ENGINE_DEPTH = 18  # tune depth vs. speed
+ENGINE_THREADS = 2  # search threads per Stockfish process
+ENGINE_MULTIPV = 3  # number of engine lines per position
+
+# Number of Stockfish processes shared by all analyses; keep
+# ENGINE_POOL_SIZE * ENGINE_THREADS at or below the number of cores
+ENGINE_POOL_SIZE = int(os.environ.get('ENGINE_POOL_SIZE', max(1, (os.cpu_count() or 2) // ENGINE_THREADS)))
+ENGINE_POOL_TIMEOUT = 30  # seconds to wait for a free engine
+
+# Adaptive analysis: search every position to ENGINE_MIN_DEPTH and only critical
+# ones (eval swings, unstable best move) deeper, up to ENGINE_DEPTH
+ENGINE_ADAPTIVE = os.environ.get('ENGINE_ADAPTIVE', '1') != '0'
+ENGINE_MIN_DEPTH = 10
+ENGINE_GAME_TIME = 60  # seconds of search per game in adaptive mode, None for no limit
+
+# Analyse whole games from the last position to the first, reusing what the engine
+# found about later positions. Applies to analyse_pgn (analyse_games); the live
+# view always streams positions forwards as they finish.
+ENGINE_BACKWARD = os.environ.get('ENGINE_BACKWARD', '0') == '1'
+
+# Known positions answered without the engine: a Polyglot opening book (.bin) and
+# Syzygy tablebase directories (separated by os.pathsep). Unset disables the lookup.
+OPENING_BOOK_PATH = os.environ.get('OPENING_BOOK_PATH')
+SYZYGY_PATH = os.environ.get('SYZYGY_PATH')
+
+# Position evaluation cache: in-process LRU entries and PositionEval table rows
+EVAL_CACHE_SIZE = 50_000
+EVAL_CACHE_MAX_ROWS = 2_000_000
+
+# Chess.com API: maximum parallel requests (Chess.com may answer 429 to more)
+CHESSCOM_MAX_CONCURRENCY = 3
+CHESSCOM_TIMEOUT = 10  # seconds per request
+CHESSCOM_RETRIES = 3  # retries after a 429, a server error or a dropped connection
+CHESSCOM_BACKOFF = 0.5  # seconds, doubled on each retry and jittered
+
+# Seconds Chess.com responses are kept in the Django cache, per endpoint
+# (games are stored in the database and refreshed per PLAYER_SYNC_INTERVAL)
+CHESSCOM_CACHE_TTL = {
+    "profile": 3600,
+    "stats": 300,
 }
 
+# Seconds before a player's stored games are checked against Chess.com again
+PLAYER_SYNC_INTERVAL = 60
+
+# Game lists are paginated on the server: default and largest page size
+GAMES_PAGE_SIZE = 50
+GAMES_MAX_PAGE_SIZE = 200
+
+# Opening trees index the first N plies of each stored game
+OPENING_TREE_PLIES = 20
+
+# Analysis jobs: store progress every N plies so a restarted job can resume
+ANALYSIS_SAVE_EVERY = 10
+
+# Run analyses in `manage.py analysis_worker` processes instead of the web process.
+# Web processes send jobs to ANALYSIS_WORKER_CHANNEL; a worker holds a job's lease
+# while running it and renews it on every ply, and workers look for expired leases
+# every ANALYSIS_RESUME_EVERY seconds, so a crashed worker's job is picked up again
+# once ANALYSIS_LEASE seconds have passed.
+ANALYSIS_WORKERS = os.environ.get('ANALYSIS_WORKERS', '0') == '1'
+ANALYSIS_WORKER_CHANNEL = 'analysis-worker'
+ANALYSIS_LEASE = 60
+ANALYSIS_RESUME_EVERY = 15
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
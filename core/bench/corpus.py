@@ -0,0 +1,137 @@
+import json
+import os
+import random
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import chess
+
+from ..utils.pgn import mainline_moves
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "games.json")
+
+# The player the corpus games belong to, as massage_games() needs one
+CORPUS_USERNAME = "benchuser"
+
+_TIME_CONTROLS = (("60", "bullet"), ("180", "blitz"), ("180+2", "blitz"), ("600", "rapid"))
+
+def _pick_move(rng: random.Random, board: chess.Board) -> chess.Move:
+    """A random legal move, captures and checks more likely so games look less aimless"""
+    moves = list(board.legal_moves)
+    weights = [1 + 2 * board.is_capture(move) + board.gives_check(move) for move in moves]
+    return rng.choices(moves, weights)[0]
+
+def _clock(seconds: float) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{{[%clk {int(hours)}:{int(minutes):02d}:{seconds:04.1f}]}}"
+
+def synthetic_game(rng: random.Random, plies: int, time_control: str = "180+2") -> str:
+    """A random legal game written like a Chess.com PGN, with a clock comment after every move"""
+    base, _, increment = time_control.partition("+")
+    clocks = [float(base), float(base)]
+    board = chess.Board()
+    tokens = []
+    for ply in range(plies):
+        if board.is_game_over():
+            break
+        move = _pick_move(rng, board)
+        tokens.append(f"{ply // 2 + 1}{'.' if ply % 2 == 0 else '...'}")
+        tokens.append(board.san(move))
+        board.push(move)
+        side = ply % 2
+        spent = min(clocks[side] - 0.1, rng.expovariate(1 / max(float(base) / 60, 0.5)))
+        clocks[side] = round(max(0.1, clocks[side] - spent + float(increment or 0)), 1)
+        tokens.append(_clock(clocks[side]))
+    result = board.result(claim_draw=False)
+    if result == "*":
+        result = rng.choice(("1-0", "0-1", "1/2-1/2"))
+    headers = "\n".join(f'[{name} "{value}"]' for name, value in (
+        ("Event", "Live Chess"), ("Site", "Chess.com"), ("White", "white"), ("Black", "black"),
+        ("Result", result), ("ECO", "A00"), ("TimeControl", time_control), ("CurrentPosition", board.fen()),
+    ))
+    return f"{headers}\n\n{' '.join(tokens)} {result}"
+
+def _results(result: str, mate: bool, rng: random.Random) -> Dict[str, str]:
+    if result == "1/2-1/2":
+        draw = rng.choice(("agreed", "repetition", "insufficient", "timevsinsufficient"))
+        return {"white": draw, "black": draw}
+    loss = "checkmated" if mate else rng.choice(("resigned", "timeout", "abandoned"))
+    return {"white": "win", "black": loss} if result == "1-0" else {"white": loss, "black": "win"}
+
+def generate_corpus(count: int, seed: int = 0) -> List[Dict]:
+    """
+    Random Chess.com-style games in the shape of the archive API
+
+    The checked-in corpus is generate_corpus(100, seed=0); regenerate it only
+    together with any stored benchmark baselines.
+
+    Args:
+        count: Number of games
+        seed: Seed for the move, clock and result choices
+
+    Returns:
+        List of raw game dicts with PGNs carrying %clk comments
+    """
+    rng = random.Random(seed)
+    games = []
+    end_time = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+    for index in range(count):
+        time_control, time_class = rng.choice(_TIME_CONTROLS)
+        pgn_text = synthetic_game(rng, rng.randint(30, 140), time_control)
+        opponent = f"opponent{rng.randint(1, 20)}"
+        white, black = (CORPUS_USERNAME, opponent) if index % 2 == 0 else (opponent, CORPUS_USERNAME)
+        pgn_text = pgn_text.replace('[White "white"]', f'[White "{white}"]').replace('[Black "black"]', f'[Black "{black}"]')
+        result = pgn_text.rsplit(" ", 1)[1]
+        results = _results(result, "#" in pgn_text, rng)
+        end_time += rng.randint(300, 20000)
+        games.append({
+            "url": f"https://www.chess.com/game/live/{100000000 + index}",
+            "pgn": pgn_text,
+            "time_control": time_control,
+            "end_time": end_time,
+            "rated": True,
+            "uuid": f"bench-{index:04d}",
+            "time_class": time_class,
+            "rules": "chess",
+            "white": {"rating": rng.randint(800, 2200), "result": results["white"], "username": white},
+            "black": {"rating": rng.randint(800, 2200), "result": results["black"], "username": black},
+        })
+    return games
+
+def load_corpus(limit: Optional[int] = None) -> List[Dict]:
+    """The checked-in benchmark games, the first *limit* of them if given"""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        games = json.load(f)
+    return games[:limit] if limit else games
+
+def synthetic_analysis(rng: random.Random, pgn_text: str, multipv: int = 3, book_plies: int = 6) -> List[Dict]:
+    """
+    A made-up analysis of a game in the shape the engine stores, one result per position
+
+    The first *book_plies* positions are tagged as book moves without lines,
+    the rest get *multipv* engine lines over legal moves, with the odd mate.
+    """
+    board, moves, _ = mainline_moves(pgn_text)
+    results = []
+    score = 20
+    for ply in range(len(moves) + 1):
+        if ply < book_plies:
+            results.append({"eval": {"type": "cp", "value": score}, "lines": [], "source": "book"})
+        else:
+            score = max(-2000, min(2000, score + int(rng.gauss(0, 60))))
+            legal = list(board.legal_moves)
+            lines = []
+            for rank, move in enumerate(rng.sample(legal, min(multipv, len(legal)))):
+                if rng.random() < 0.02:
+                    lines.append({"Move": move.uci(), "Centipawn": None, "Mate": rng.choice((-1, 1)) * rng.randint(1, 12)})
+                else:
+                    lines.append({"Move": move.uci(), "Centipawn": score - rank * rng.randint(0, 80), "Mate": None})
+            top = lines[0] if lines else {"Centipawn": score, "Mate": None}
+            if top["Mate"] is not None:
+                results.append({"eval": {"type": "mate", "value": top["Mate"]}, "lines": lines})
+            else:
+                results.append({"eval": {"type": "cp", "value": top["Centipawn"]}, "lines": lines})
+        if ply < len(moves):
+            board.push(moves[ply])
+    return results
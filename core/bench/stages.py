@@ -0,0 +1,146 @@
+import asyncio
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.test.utils import override_settings
+
+from ..consumers import AnalysisConsumer
+from ..services import evalcache
+from ..services.engine import iter_analysis
+from ..utils.ids import pgn_id
+from ..utils.pgn import mainline_moves
+from ..utils.transform import massage_games
+from .corpus import CORPUS_USERNAME
+
+def process_peak_rss_mb() -> float:
+    """
+    Peak resident memory of the whole process so far
+
+    The operating system only reports the high-water mark since the process
+    started, so a stage reports the peak of every stage run before it too.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _percentile_ms(seconds: Sequence[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(seconds, q)) * 1000, 2) if len(seconds) else None
+
+def _summary(games: int, positions: int, seconds: float, latencies: Sequence[float] = ()) -> Dict:
+    """Throughput and per-ply latency percentiles of one stage, with the process peak memory"""
+    seconds = max(seconds, 1e-9)
+    summary = {
+        "games": games,
+        "positions": positions,
+        "seconds": round(seconds, 4),
+        "games_per_sec": round(games / seconds, 1),
+        "positions_per_sec": round(positions / seconds, 1),
+    }
+    if latencies:
+        summary["ply_p50_ms"] = _percentile_ms(latencies, 50)
+        summary["ply_p95_ms"] = _percentile_ms(latencies, 95)
+    summary["process_peak_rss_mb"] = process_peak_rss_mb()
+    return summary
+
+def _positions(games: List[Dict]) -> int:
+    return sum(1 + len(mainline_moves(game["pgn"])[1]) for game in games)
+
+def bench_parse(games: List[Dict]) -> Dict:
+    """Mainline moves and clocks of every game"""
+    started = time.perf_counter()
+    positions = _positions(games)
+    return _summary(len(games), positions, time.perf_counter() - started)
+
+def bench_transform(games: List[Dict]) -> Dict:
+    """The game list transform of every game"""
+    started = time.perf_counter()
+    massage_games(games, CORPUS_USERNAME)
+    seconds = time.perf_counter() - started
+    return _summary(len(games), _positions(games), seconds)
+
+@contextmanager
+def cold_storage() -> Iterator[None]:
+    """
+    Run engine stages on a new, empty database with the evaluation cache off
+
+    Stages then start cold whatever earlier runs stored, and jobs, snapshots
+    and evaluations they write never reach the configured database. Django's
+    test database machinery creates the database (in memory for SQLite) and
+    drops it afterwards.
+    """
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    with evalcache._cache_lock:
+        shared, evalcache._cache = evalcache._cache, evalcache.EvalCache(max_entries=0, max_rows=0)
+    try:
+        yield
+    finally:
+        with evalcache._cache_lock:
+            evalcache._cache = shared
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+def bench_analysis(games: List[Dict], depth: int) -> Dict:
+    """
+    Engine analysis of every game at a fixed depth, without the evaluation cache
+
+    Per-ply latency is the time between consecutive positions of a game.
+    """
+    latencies = []
+    positions = 0
+    started = time.perf_counter()
+    with override_settings(ENGINE_DEPTH=depth):
+        for game in games:
+            last = time.perf_counter()
+            for _ in iter_analysis(game["pgn"], adaptive=False, backward=False, cached=False):
+                now = time.perf_counter()
+                latencies.append(now - last)
+                last = now
+                positions += 1
+    return _summary(len(games), positions, time.perf_counter() - started, latencies)
+
+async def _stream_game(pgn_text: str, latencies: List[float]) -> int:
+    """Follow one game's analysis as a WebSocket client, returning the plies received"""
+    game_id = pgn_id(pgn_text)
+    communicator = WebsocketCommunicator(AnalysisConsumer.as_asgi(), f"/ws/analysis/{game_id}/")
+    communicator.scope["url_route"] = {"kwargs": {"pgn_id": game_id}}
+    await communicator.connect()
+    await communicator.receive_json_from()  # connection status
+    try:
+        await communicator.send_json_to({"type": "start_analysis", "pgn": pgn_text})
+        plies = 0
+        last = time.perf_counter()
+        while True:
+            message = await communicator.receive_json_from(timeout=600)
+            if message["type"] != "analysis":
+                return plies
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+            plies += 1
+    finally:
+        await communicator.disconnect()
+
+def bench_consumer(games: List[Dict], depth: int) -> Dict:
+    """
+    The live path: WebSocket consumer, shared job, engine thread and channel layer
+
+    Games are followed one after the other at a fixed depth, starting with
+    no stored job or cached evaluation. Per-ply latency is the time between
+    consecutive messages a client receives.
+    """
+    latencies: List[float] = []
+
+    async def stream_all() -> int:
+        return sum([await _stream_game(game["pgn"], latencies) for game in games])
+
+    # In-process jobs, so the timing does not depend on a worker being up
+    with override_settings(ENGINE_DEPTH=depth, ENGINE_ADAPTIVE=False, ANALYSIS_WORKERS=False):
+        started = time.perf_counter()
+        positions = asyncio.run(stream_all())
+        seconds = time.perf_counter() - started
+    return _summary(len(games), positions, seconds, latencies)
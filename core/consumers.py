@@ -1,9 +1,13 @@
 import json
 import logging
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from asgiref.sync import sync_to_async
-from .services.engine import analyse_pgn
-import asyncio
+from .services.gamelist import find_pgn
+from .services.jobs import analysis_group, analysis_message, complete_message, subscribe
+from .services.metrics import timed
+from .services.snapshots import find_snapshot
+from .utils.ids import pgn_hash, pgn_id
+from .utils.snapshot import unpack_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +19,8 @@ class AnalysisConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         """Handle WebSocket connection"""
         self.pgn_id = self.scope["url_route"]["kwargs"]["pgn_id"]
-        self.room_group_name = f"analysis_{self.pgn_id}"
+        self.room_group_name = analysis_group(self.pgn_id)
+        self.next_ply = None  # first ply not yet sent, None until subscribed
         
         # Join room group
         await self.channel_layer.group_add(
@@ -32,8 +37,14 @@ class AnalysisConsumer(AsyncJsonWebsocketConsumer):
             "message": "Connected, starting analysis..."
         })
     
+    async def send_json(self, content, close=False):
+        """Send a message to the WebSocket, timing the encoding and send"""
+        with timed("websocket_send"):
+            await super().send_json(content, close=close)
+    
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        # The job keeps running for other clients and is stored when done
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -46,9 +57,19 @@ class AnalysisConsumer(AsyncJsonWebsocketConsumer):
         message_type = content.get("type")
         
         if message_type == "start_analysis":
-            pgn_text = content.get("pgn")
+            # The game is resolved from its ID; a PGN sent by the client is
+            # only used for games not stored yet, and must match the ID
+            pgn_text = await database_sync_to_async(find_pgn)(self.pgn_id)
+            if pgn_text is None:
+                pgn_text = content.get("pgn")
+                if pgn_text and pgn_id(pgn_text) != self.pgn_id:
+                    await self.send_json({
+                        "type": "error",
+                        "message": "PGN does not match the game ID"
+                    })
+                    return
             if pgn_text:
-                await self.start_analysis(pgn_text)
+                await self.start_analysis(pgn_text, content.get("resume_from", 0))
             else:
                 await self.send_json({
                     "type": "error",
@@ -60,44 +81,62 @@ class AnalysisConsumer(AsyncJsonWebsocketConsumer):
                 "message": f"Unknown message type: {message_type}"
             })
     
-    async def start_analysis(self, pgn_text):
-        """Start the analysis process"""
+    async def start_analysis(self, pgn_text, resume_from=0):
+        """
+        Join the shared analysis job for this PGN
+        
+        Plies the job has already finished are sent straight away, starting
+        at *resume_from* for a client reconnecting part-way through; later
+        plies arrive through the room group. A game already analysed at
+        the current engine settings is sent from its snapshot without
+        joining a job.
+        """
         try:
-            # Run analysis in a thread to avoid blocking
-            analysis = await sync_to_async(analyse_pgn)(pgn_text)
-            
-            if not analysis:
-                await self.send_json({
-                    "type": "error",
-                    "message": "Failed to analyze game"
-                })
-                return
-            
-            # Send analysis results
-            for ply, data in enumerate(analysis):
-                await self.send_json({
-                    "type": "analysis",
-                    "ply": ply,
-                    "eval": data.get("eval", {}),
-                    "lines": data.get("lines", [])
-                })
-                
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.1)
-            
-            # Send completion message
-            await self.send_json({
-                "type": "complete",
-                "message": f"Analysis complete - {len(analysis)} positions analyzed"
-            })
-            
+            snapshot = await database_sync_to_async(find_snapshot)(pgn_hash(pgn_text))
+            if snapshot is not None:
+                (results, stats), complete = unpack_snapshot(snapshot.data), True
+            else:
+                stats = None
+                results, complete = await subscribe(pgn_text, self.room_group_name)
         except Exception as e:
             logger.error(f"Error in analysis: {e}")
             await self.send_json({
                 "type": "error",
                 "message": f"Analysis error: {str(e)}"
             })
+            return
+        
+        # Sent by the client, anything but a ply number counts as none seen
+        try:
+            resume_from = max(int(resume_from), 0)
+        except (TypeError, ValueError):
+            resume_from = 0
+        for ply in range(min(resume_from, len(results)), len(results)):
+            await self.send_json(analysis_message(ply, results[ply]))
+        # A client may have seen plies the job has not stored yet
+        self.next_ply = max(resume_from, len(results))
+        
+        if not complete:
+            return
+        if not results:
+            await self.send_json({
+                "type": "error",
+                "message": "Failed to analyze game"
+            })
+            return
+        
+        # Send completion message
+        await self.send_json(complete_message(results, stats))
     
     async def analysis_message(self, event):
-        """Send analysis message to WebSocket"""
-        await self.send_json(event) 
\ No newline at end of file
+        """Forward a message from the analysis job to the WebSocket"""
+        message = event["message"]
+        if self.next_ply is None:
+            return  # this client has not asked for the analysis yet
+        
+        if message["type"] == "analysis":
+            # Skip plies already sent with the job's progress on subscribe
+            if message["ply"] < self.next_ply:
+                return
+            self.next_ply = message["ply"] + 1
+        await self.send_json(message)
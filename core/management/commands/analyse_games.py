@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from core.services.batch import analyse_game, read_pgn_path
+from core.services.chesscom import player_games
+from core.services.jobs import completed_hashes, pgn_hash, save_results
+
+
+class Command(BaseCommand):
+    help = 'Analyse every game of a Chess.com player, a PGN file or a directory of PGN files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Chess.com username, PGN file or directory of .pgn files'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.ENGINE_POOL_SIZE,
+            help='Worker processes, each running its own Stockfish (default: ENGINE_POOL_SIZE)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Number of recent games to analyse for a username (default: 100)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Analyse games again even if a complete analysis is stored'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+
+        games = self.load_games(options['source'], options['limit'])
+
+        # Drop duplicates and, unless forced, games finished by an earlier run
+        pending = {}
+        for pgn_text in games:
+            pending.setdefault(pgn_hash(pgn_text), pgn_text)
+        if not options['force']:
+            hashes = list(pending)
+            for start in range(0, len(hashes), 500):
+                for done in completed_hashes(hashes[start:start + 500]):
+                    del pending[done]
+
+        skipped = len(games) - len(pending)
+        self.stdout.write(
+            f'{len(games)} games found, {skipped} already analysed or duplicated, '
+            f'{len(pending)} to analyse with {workers} worker(s)'
+        )
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        analysed = positions = failed = 0
+        try:
+            for pgn_text, results, seconds in self.run(list(pending.values()), workers):
+                analysed += 1
+                positions += len(results)
+                if not save_results(pgn_text, results):
+                    failed += 1
+                self.stdout.write(
+                    f'[{analysed}/{len(pending)}] {len(results)} positions in {seconds:.1f}s'
+                )
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(
+                'Interrupted, run the command again to resume'
+            ))
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f'Analysed {analysed} games ({failed} failed), {positions} positions in {elapsed:.1f}s: '
+            f'{positions / elapsed:.1f} positions/sec, {analysed * 60 / elapsed:.1f} games/min'
+        ))
+
+    def load_games(self, source, limit):
+        """Read the PGNs to analyse from a file, a directory or a player's games"""
+        if os.path.exists(source):
+            return list(read_pgn_path(source))
+
+        try:
+            games = player_games(source, limit=limit)
+        except ValueError as e:
+            raise CommandError(str(e))
+        return [game['pgn'] for game in games if game.get('pgn')]
+
+    def run(self, pgns, workers):
+        """Analyse games across worker processes, yielding results as games finish"""
+        if workers == 1:
+            yield from map(analyse_game, pgns)
+            return
+
+        # Spawned workers start clean: no inherited database connections or engines
+        context = multiprocessing.get_context('spawn')
+        pool = context.Pool(workers, initializer=django.setup)
+        try:
+            yield from pool.imap_unordered(analyse_game, pgns)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
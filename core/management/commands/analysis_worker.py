@@ -0,0 +1,45 @@
+import asyncio
+import signal
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.worker import serve
+
+
+class Command(BaseCommand):
+    help = 'Run analyses sent by the web processes over the shared channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.ENGINE_POOL_SIZE,
+            help='Games analysed at once (default: ENGINE_POOL_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        channel_layer = get_channel_layer()
+        if channel_layer is None or isinstance(channel_layer, InMemoryChannelLayer):
+            raise CommandError(
+                'Analysis workers need a channel layer shared with the web processes, set CHANNEL_REDIS_URL'
+            )
+
+        self.stdout.write(
+            f'Analysing games from "{settings.ANALYSIS_WORKER_CHANNEL}", '
+            f'{options["concurrency"]} at a time'
+        )
+        asyncio.run(self.run(channel_layer, options['concurrency']))
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
+
+    async def run(self, channel_layer, concurrency):
+        # Finish the games being analysed on SIGTERM/SIGINT; unfinished jobs
+        # would otherwise wait for their lease to expire
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await serve(channel_layer, settings.ANALYSIS_WORKER_CHANNEL, concurrency, stop=stop)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import platform
+from datetime import datetime, timezone
+
+import chess
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench.corpus import CORPUS_PATH, load_corpus
+from core.bench.stages import (
+    bench_analysis,
+    bench_consumer,
+    bench_parse,
+    bench_transform,
+    cold_storage,
+)
+
+STAGES = ('parse', 'transform', 'analyse', 'consumer')
+ENGINE_STAGES = ('analyse', 'consumer')
+
+# Metrics compared against a baseline; True where higher is better
+METRICS = {
+    'positions_per_sec': True,
+    'games_per_sec': True,
+    'ply_p50_ms': False,
+    'ply_p95_ms': False,
+    'process_peak_rss_mb': False,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark parsing, the game list transform, analysis and the WebSocket path on the checked-in corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=None,
+            help='Use only the first N corpus games (default: all of them)'
+        )
+        parser.add_argument(
+            '--depths',
+            default='10',
+            help='Comma separated fixed search depths for the engine stages (default: 10)'
+        )
+        parser.add_argument(
+            '--stages',
+            default=','.join(STAGES),
+            help=f'Comma separated stages to run (default: {",".join(STAGES)})'
+        )
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Write the results to this file'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file of an earlier run to compare against'
+        )
+
+    def handle(self, *args, **options):
+        stages = [stage for stage in options['stages'].split(',') if stage]
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise CommandError(f'Unknown stage(s): {", ".join(sorted(unknown))}')
+        try:
+            depths = [int(depth) for depth in options['depths'].split(',') if depth]
+        except ValueError:
+            raise CommandError('--depths must be comma separated integers')
+        if not depths or min(depths) < 1:
+            raise CommandError('--depths needs at least one depth of 1 or more')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["compare"]}: {e}')
+
+        games = load_corpus(options['games'])
+        if not games:
+            raise CommandError('The corpus has no games')
+        self.stdout.write(f'{len(games)} corpus games, stages: {", ".join(stages)}')
+
+        results = {}
+        for stage in stages:
+            if stage == 'parse':
+                results['parse'] = bench_parse(games)
+            elif stage == 'transform':
+                results['transform'] = bench_transform(games)
+            else:
+                for depth in depths:
+                    results[f'{stage}@{depth}'] = self.engine_stage(stage, games, depth)
+
+        for name, result in results.items():
+            self.write_stage(name, result, (baseline or {}).get('stages', {}).get(name))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump({'meta': self.meta(games, depths), 'stages': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["json_path"]}'))
+
+    def engine_stage(self, stage, games, depth):
+        """One engine stage at one depth, on a throwaway database without cached evaluations"""
+        if not os.path.exists(settings.STOCKFISH_PATH):
+            return {'skipped': f'Stockfish not found at: {settings.STOCKFISH_PATH}'}
+        with cold_storage():
+            if stage == 'analyse':
+                return bench_analysis(games, depth)
+            return bench_consumer(games, depth)
+
+    def write_stage(self, name, result, previous):
+        if 'skipped' in result:
+            self.stdout.write(f'{name:<12} skipped: {result["skipped"]}')
+            return
+        line = (
+            f'{name:<12} {result["positions"]:7d} positions {result["seconds"]:9.3f}s '
+            f'{result["positions_per_sec"]:10.1f} positions/sec'
+        )
+        if 'ply_p50_ms' in result:
+            line += f'  p50 {result["ply_p50_ms"]:.2f}ms p95 {result["ply_p95_ms"]:.2f}ms'
+        line += f'  process peak RSS {result["process_peak_rss_mb"]:.1f}MB'
+        self.stdout.write(line)
+
+        if not previous or 'skipped' in previous:
+            return
+        changes = []
+        for metric, higher_is_better in METRICS.items():
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) * 100 / before
+            better = change > 0 if higher_is_better else change < 0
+            text = f'{metric} {change:+.1f}%'
+            changes.append(self.style.SUCCESS(text) if better else self.style.WARNING(text) if change else text)
+        if changes:
+            self.stdout.write(f'{"":<12} vs baseline: {", ".join(changes)}')
+
+    def meta(self, games, depths):
+        with open(CORPUS_PATH, 'rb') as f:
+            corpus_sha = hashlib.sha256(f.read()).hexdigest()
+        return {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'corpus_games': len(games),
+            'corpus_sha256': corpus_sha,
+            'depths': depths,
+            'engine_multipv': settings.ENGINE_MULTIPV,
+            'engine_threads': settings.ENGINE_THREADS,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'python_chess': chess.__version__,
+        }
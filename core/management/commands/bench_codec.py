@@ -0,0 +1,90 @@
+import gzip
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench.corpus import load_corpus, synthetic_analysis
+from core.utils.evalcodec import decode_analysis, decode_arrays, encode_analysis
+
+
+def dump_json(results) -> bytes:
+    return json.dumps(results).encode("utf-8")
+
+
+class Command(BaseCommand):
+    help = 'Compare size and decode speed of game analyses as JSON and in the binary codec'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=100,
+            help='Number of corpus games to analyse at random (default: 100)'
+        )
+        parser.add_argument(
+            '--multipv',
+            type=int,
+            default=3,
+            help='Engine lines per position (default: 3)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per decoder, the fastest is reported (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        if not 1 <= options['multipv'] <= 255:
+            raise CommandError('--multipv must be between 1 and 255')
+
+        rng = random.Random(0)
+        games = load_corpus(options['games'])
+        if not games:
+            raise CommandError('No games to encode')
+        analyses = [synthetic_analysis(rng, game['pgn'], options['multipv']) for game in games]
+        plies = sum(len(results) for results in analyses)
+        as_json = [dump_json(results) for results in analyses]
+        encoded = [encode_analysis(results, multipv=options['multipv']) for results in analyses]
+        for results, data in zip(analyses, encoded):
+            if decode_analysis(data) != results:
+                raise CommandError('Decoded analysis differs from the original')
+
+        self.stdout.write(f'{len(analyses)} games, {plies} positions, MultiPV {options["multipv"]}')
+        json_size = sum(map(len, as_json))
+        for name, blobs in (
+            ('json', as_json),
+            ('json+gzip', [gzip.compress(data) for data in as_json]),
+            ('codec', encoded),
+            ('codec+gzip', [gzip.compress(data) for data in encoded]),
+        ):
+            size = sum(map(len, blobs))
+            self.stdout.write(
+                f'{name:<12} {size / len(blobs):9.0f} bytes/game {size / plies:7.1f} bytes/ply  '
+                f'x{json_size / max(size, 1):.1f}'
+            )
+
+        baseline = None
+        for name, decode, blobs in (
+            ('json.loads', json.loads, as_json),
+            ('decode_analysis', decode_analysis, encoded),
+            ('decode_arrays', decode_arrays, encoded),
+        ):
+            best = min(self.time(decode, blobs) for _ in range(options['repeat']))
+            per_game = best * 1000 / len(blobs)
+            baseline = baseline or per_game
+            self.stdout.write(
+                f'{name:<16} {per_game * 1000:9.1f} us/game '
+                f'{len(blobs) / max(best, 1e-9):9.0f} games/sec  x{baseline / max(per_game, 1e-9):.1f}'
+            )
+
+    @staticmethod
+    def time(decode, blobs):
+        started = time.perf_counter()
+        for data in blobs:
+            decode(data)
+        return time.perf_counter() - started
@@ -0,0 +1,101 @@
+import os
+import time
+
+import chess
+import chess.engine
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.batch import read_pgn_path
+from core.services.engine import _start_engine, _stop_engine
+from core.utils.pgn import mainline_moves
+
+MODES = ('fen', 'forward', 'backward')
+
+
+class Command(BaseCommand):
+    help = 'Compare engine search time per game with and without reusing the engine session'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='PGN file or directory of .pgn files'
+        )
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=10,
+            help='Number of games to analyse from the source (default: 10)'
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=settings.ENGINE_DEPTH,
+            help='Fixed search depth for every position (default: ENGINE_DEPTH)'
+        )
+        parser.add_argument(
+            '--modes',
+            default=','.join(MODES),
+            help='Comma separated modes to run: fen (a new FEN every ply, the old behaviour), '
+                 'forward and backward (moves from the start in one engine game)'
+        )
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown mode(s): {", ".join(sorted(unknown))}')
+        if not os.path.exists(settings.STOCKFISH_PATH):
+            raise CommandError(f'Stockfish not found at: {settings.STOCKFISH_PATH}')
+
+        games = []
+        for pgn_text in read_pgn_path(options['source']):
+            start, moves, _ = mainline_moves(pgn_text)
+            if moves:
+                games.append((start, moves))
+            if len(games) >= options['games']:
+                break
+        if not games:
+            raise CommandError('No games to analyse')
+
+        positions = sum(1 + len(moves) for _, moves in games)
+        self.stdout.write(
+            f'{len(games)} games, {positions} positions at depth {options["depth"]}, '
+            f'MultiPV {settings.ENGINE_MULTIPV}'
+        )
+
+        baseline = None
+        for mode in modes:
+            seconds, nodes = self.run(mode, games, options['depth'])
+            baseline = baseline or seconds
+            self.stdout.write(
+                f'{mode:<9} {seconds:8.1f}s {positions / seconds:8.1f} positions/sec '
+                f'{nodes / positions:12.0f} nodes/position  x{baseline / seconds:.2f}'
+            )
+
+    def run(self, mode, games, depth):
+        """Analyse every game in one mode on a fresh engine, returning (seconds, nodes searched)"""
+        limit = chess.engine.Limit(depth=depth)
+        engine = _start_engine()
+        seconds = nodes = 0
+        try:
+            for start, moves in games:
+                game = object()
+                plies = range(len(moves), -1, -1) if mode == 'backward' else range(len(moves) + 1)
+                for ply in plies:
+                    # Rebuild the position at this ply with the moves leading to it
+                    position = start.copy()
+                    for move in moves[:ply]:
+                        position.push(move)
+                    if mode == 'fen':
+                        # A new game key every ply, so the engine gets ucinewgame and
+                        # an empty hash table like the old per-FEN searches
+                        position = chess.Board(position.fen(), chess960=position.chess960)
+                        game = object()
+                    started = time.perf_counter()
+                    infos = engine.analyse(position, limit, multipv=settings.ENGINE_MULTIPV, game=game)
+                    seconds += time.perf_counter() - started
+                    nodes += infos[0].get('nodes', 0)
+        finally:
+            _stop_engine(engine)
+        return max(seconds, 1e-9), nodes
@@ -0,0 +1,74 @@
+import io
+import random
+import time
+
+import chess.pgn
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench.corpus import synthetic_game
+from core.services.batch import read_pgn_path
+from core.utils.pgn import mainline_moves, parse_mainline
+
+
+def read_game(pgn_text: str) -> chess.pgn.Game:
+    return chess.pgn.read_game(io.StringIO(pgn_text))
+
+
+class Command(BaseCommand):
+    help = 'Compare PGN parse throughput of chess.pgn.read_game and the mainline parser'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            nargs='?',
+            help='PGN file or directory of .pgn files (default: random Chess.com-style games)'
+        )
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=1000,
+            help='Number of random games to generate when no source is given (default: 1000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per parser, the fastest is reported (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        if options['source']:
+            try:
+                pgns = list(read_pgn_path(options['source']))
+            except OSError as e:
+                raise CommandError(str(e))
+        else:
+            rng = random.Random(0)
+            pgns = [synthetic_game(rng, rng.randint(40, 120)) for _ in range(options['games'])]
+        if not pgns:
+            raise CommandError('No games to parse')
+
+        self.stdout.write(f'Parsing {len(pgns)} games, best of {options["repeat"]} runs')
+        baseline = None
+        for name, parse in (
+            ('chess.pgn.read_game', read_game),
+            ('parse_mainline', parse_mainline),
+            ('mainline_moves', mainline_moves),
+        ):
+            best = min(self.time(parse, pgns) for _ in range(options['repeat']))
+            per_thousand = best * 1000 / len(pgns)
+            baseline = baseline or per_thousand
+            self.stdout.write(
+                f'{name:<20} {per_thousand * 1000:9.1f} ms/1000 games '
+                f'{len(pgns) / max(best, 1e-9):9.0f} games/sec  x{baseline / max(per_thousand, 1e-9):.1f}'
+            )
+
+    @staticmethod
+    def time(parse, pgns):
+        started = time.perf_counter()
+        for pgn_text in pgns:
+            parse(pgn_text)
+        return time.perf_counter() - started
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PositionEval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fen', models.CharField(max_length=100, unique=True)),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('multipv', models.PositiveSmallIntegerField()),
+                ('result', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Player',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=50, unique=True)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='archive',
+            name='games',
+        ),
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField()),
+                ('uuid', models.CharField(blank=True, max_length=64)),
+                ('pgn', models.TextField()),
+                ('white_username', models.CharField(max_length=50)),
+                ('white_rating', models.PositiveSmallIntegerField(null=True)),
+                ('white_result', models.CharField(max_length=30)),
+                ('black_username', models.CharField(max_length=50)),
+                ('black_rating', models.PositiveSmallIntegerField(null=True)),
+                ('black_result', models.CharField(max_length=30)),
+                ('time_class', models.CharField(max_length=20)),
+                ('time_control', models.CharField(blank=True, max_length=20)),
+                ('rules', models.CharField(default='chess', max_length=20)),
+                ('end_time', models.BigIntegerField()),
+                ('player', models.ForeignKey(db_column='username', on_delete=django.db.models.deletion.CASCADE, related_name='games', to='core.player', to_field='username')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['player', 'end_time'], name='game_player_end_idx'), models.Index(fields=['time_class'], name='game_time_class_idx')],
+                'constraints': [models.UniqueConstraint(fields=('player', 'url'), name='unique_player_game')],
+            },
+        ),
+    ]
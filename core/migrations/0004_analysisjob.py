@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_player_remove_archive_games_game'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pgn_hash', models.CharField(max_length=64)),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('multipv', models.PositiveSmallIntegerField()),
+                ('pgn', models.TextField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('complete', 'Complete'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('results', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pgn_hash', 'depth', 'multipv'), name='unique_analysis_job')],
+            },
+        ),
+    ]
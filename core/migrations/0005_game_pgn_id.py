@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+from core.utils.ids import pgn_id
+
+
+def fill_pgn_ids(apps, schema_editor):
+    Game = apps.get_model('core', 'Game')
+    games = Game.objects.only('id', 'pgn')
+    batch = []
+    for game in games.iterator(chunk_size=1000):
+        game.pgn_id = pgn_id(game.pgn)
+        batch.append(game)
+        if len(batch) >= 1000:
+            Game.objects.bulk_update(batch, ['pgn_id'])
+            batch = []
+    if batch:
+        Game.objects.bulk_update(batch, ['pgn_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='pgn_id',
+            field=models.CharField(blank=True, db_index=True, max_length=16),
+        ),
+        migrations.RunPython(fill_pgn_ids, migrations.RunPython.noop),
+    ]
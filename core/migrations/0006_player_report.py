@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.models import eco_code
+
+
+def fill_eco(apps, schema_editor):
+    Game = apps.get_model('core', 'Game')
+    batch = []
+    for game in Game.objects.only('id', 'pgn').iterator(chunk_size=1000):
+        game.eco = eco_code(game.pgn)
+        batch.append(game)
+        if len(batch) >= 1000:
+            Game.objects.bulk_update(batch, ['eco'])
+            batch = []
+    if batch:
+        Game.objects.bulk_update(batch, ['eco'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_game_pgn_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='eco',
+            field=models.CharField(blank=True, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='report_built',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ReportBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=20)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0)),
+                ('accuracy_games', models.PositiveIntegerField(default=0)),
+                ('player', models.ForeignKey(db_column='username', on_delete=django.db.models.deletion.CASCADE, related_name='report_buckets', to='core.player', to_field='username')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('player', 'dimension', 'key'), name='unique_report_bucket')],
+            },
+        ),
+        migrations.RunPython(fill_eco, migrations.RunPython.noop),
+    ]
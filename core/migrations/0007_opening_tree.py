@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_player_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='tree_built',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='OpeningMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('colour', models.CharField(max_length=5)),
+                ('parent', models.BigIntegerField()),
+                ('child', models.BigIntegerField()),
+                ('uci', models.CharField(max_length=5)),
+                ('san', models.CharField(max_length=10)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('player', models.ForeignKey(db_column='username', on_delete=django.db.models.deletion.CASCADE, related_name='opening_moves', to='core.player', to_field='username')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('player', 'colour', 'parent', 'uci'), name='unique_opening_move')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OpeningNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('colour', models.CharField(max_length=5)),
+                ('key', models.BigIntegerField()),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('player', models.ForeignKey(db_column='username', on_delete=django.db.models.deletion.CASCADE, related_name='opening_nodes', to='core.player', to_field='username')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('player', 'colour', 'key'), name='unique_opening_node')],
+            },
+        ),
+    ]
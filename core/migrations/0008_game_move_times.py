@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:51
+
+from django.db import migrations, models
+
+from core.utils.clocks import pgn_move_times
+
+
+def fill_move_times(apps, schema_editor):
+    Game = apps.get_model('core', 'Game')
+    batch = []
+    for game in Game.objects.only('id', 'pgn', 'time_control').iterator(chunk_size=1000):
+        game.move_times = pgn_move_times(game.pgn, game.time_control)
+        batch.append(game)
+        if len(batch) >= 1000:
+            Game.objects.bulk_update(batch, ['move_times'])
+            batch = []
+    if batch:
+        Game.objects.bulk_update(batch, ['move_times'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_opening_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='move_times',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(fill_move_times, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_game_move_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:06
+
+import gzip
+import hashlib
+import json
+
+from django.db import migrations, models
+
+from core.utils.accuracy import game_stats
+
+
+def pack_analysis(results, stats):
+    # The gzip-compressed JSON snapshot of the time, repacked by 0011
+    sources = ['engine']
+    columns = {
+        'cp': [], 'mate': [], 'source': [], 'line_count': [],
+        'line_move': [], 'line_cp': [], 'line_mate': [],
+    }
+    for result in results:
+        score = result.get('eval') or {'type': 'cp', 'value': 0}
+        columns['cp'].append(score['value'] if score['type'] == 'cp' else None)
+        columns['mate'].append(score['value'] if score['type'] == 'mate' else None)
+
+        source = result.get('source', 'engine')
+        if source not in sources:
+            sources.append(source)
+        columns['source'].append(sources.index(source))
+
+        lines = result.get('lines') or []
+        columns['line_count'].append(len(lines))
+        for line in lines:
+            columns['line_move'].append(line['Move'])
+            columns['line_cp'].append(line.get('Centipawn'))
+            columns['line_mate'].append(line.get('Mate'))
+
+    body = {'version': 1, 'plies': len(results), 'sources': sources, **columns, 'stats': stats}
+    return gzip.compress(json.dumps(body, separators=(',', ':')).encode('utf-8'), mtime=0)
+
+
+def snapshot_etag(data):
+    return f'W/"{hashlib.sha256(bytes(data)).hexdigest()[:32]}"'
+
+
+def snapshot_complete_jobs(apps, schema_editor):
+    AnalysisJob = apps.get_model('core', 'AnalysisJob')
+    AnalysisSnapshot = apps.get_model('core', 'AnalysisSnapshot')
+    batch = []
+    for job in AnalysisJob.objects.filter(status='complete').iterator(chunk_size=500):
+        data = pack_analysis(job.results, game_stats(job.results))
+        batch.append(AnalysisSnapshot(
+            pgn_hash=job.pgn_hash, depth=job.depth, multipv=job.multipv, data=data, etag=snapshot_etag(data)
+        ))
+        if len(batch) >= 500:
+            AnalysisSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        AnalysisSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_analysisjob_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pgn_hash', models.CharField(max_length=64)),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('multipv', models.PositiveSmallIntegerField()),
+                ('data', models.BinaryField()),
+                ('etag', models.CharField(max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pgn_hash', 'depth', 'multipv'), name='unique_analysis_snapshot')],
+            },
+        ),
+        migrations.RunPython(snapshot_complete_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import json
+import logging
+import struct
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+# The evalcodec layout of version 1, copied so later codec changes leave this migration alone
+HEADER = struct.Struct('<3sBBBHI')
+PLY = struct.Struct('<hBBB')
+LINE = struct.Struct('<HhB')
+SOURCES = ('engine', 'book', 'tablebase')
+MATE = 1
+NO_SCORE = 2
+SCORE_LIMIT = 32767
+PROMOTIONS = {'n': 2, 'b': 3, 'r': 4, 'q': 5}
+
+
+def square(name):
+    if len(name) != 2 or name[0] not in 'abcdefgh' or name[1] not in '12345678':
+        raise ValueError(f'Not a square: {name!r}')
+    return (int(name[1]) - 1) * 8 + 'abcdefgh'.index(name[0])
+
+
+def move_code(uci):
+    if len(uci) not in (4, 5) or (len(uci) == 5 and uci[4] not in PROMOTIONS):
+        raise ValueError(f'Not a UCI move: {uci!r}')
+    return square(uci[:2]) | square(uci[2:4]) << 6 | PROMOTIONS.get(uci[4:], 0) << 12
+
+
+def score(cp, mate):
+    if mate is not None:
+        return max(-SCORE_LIMIT, min(SCORE_LIMIT, mate)), MATE
+    if cp is None:
+        return 0, NO_SCORE
+    return max(-SCORE_LIMIT, min(SCORE_LIMIT, cp)), 0
+
+
+def repack(data, depth, multipv):
+    # A gzip-compressed JSON snapshot (0010) as evalcodec struct followed by the stats as JSON
+    body = json.loads(gzip.decompress(bytes(data)))
+    if body.get('version') != 1:
+        raise ValueError(f'Unsupported snapshot version: {body.get("version")}')
+
+    plies, lines = [], []
+    for ply in range(body['plies']):
+        source = body['sources'][body['source'][ply]]
+        if source not in SOURCES:
+            raise ValueError(f'Unknown analysis source: {source}')
+        count = body['line_count'][ply]
+        if count > 255:
+            raise ValueError(f'Too many engine lines at ply {ply}: {count}')
+        plies.append(PLY.pack(*score(body['cp'][ply], body['mate'][ply]), SOURCES.index(source), count))
+    for move, cp, mate in zip(body['line_move'], body['line_cp'], body['line_mate']):
+        lines.append(LINE.pack(move_code(move), *score(cp, mate)))
+
+    header = HEADER.pack(b'CAE', 1, depth, multipv, len(plies), len(lines))
+    stats = json.dumps(body['stats'], separators=(',', ':')).encode('utf-8')
+    return header + b''.join(plies) + b''.join(lines) + stats
+
+
+def repack_snapshots(apps, schema_editor):
+    # Snapshots were gzip-compressed JSON. One that cannot be repacked is dropped, as the
+    # new code cannot read it; its job is kept and a finished analysis stores it again
+    AnalysisSnapshot = apps.get_model('core', 'AnalysisSnapshot')
+    ids = list(AnalysisSnapshot.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), 500):
+        repacked, dropped = [], []
+        for snapshot in AnalysisSnapshot.objects.filter(id__in=ids[start:start + 500]):
+            if bytes(snapshot.data[:3]) == b'CAE':
+                continue
+            try:
+                data = repack(snapshot.data, snapshot.depth, snapshot.multipv)
+            except (OSError, EOFError, ValueError, KeyError, IndexError, TypeError, struct.error) as e:
+                logger.warning(f'Dropping analysis snapshot {snapshot.pgn_hash[:12]}: {e}')
+                dropped.append(snapshot.id)
+                continue
+            snapshot.data, snapshot.etag = data, f'W/"{hashlib.sha256(data).hexdigest()[:32]}"'
+            repacked.append(snapshot)
+        AnalysisSnapshot.objects.bulk_update(repacked, ['data', 'etag'])
+        AnalysisSnapshot.objects.filter(id__in=dropped).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_analysissnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(repack_snapshots, migrations.RunPython.noop),
+    ]
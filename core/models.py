@@ -1,3 +1,257 @@
+import re
+
 from django.db import models
 
-# Create your models here.
+from .utils.clocks import pgn_move_times
+from .utils.ids import pgn_id
+
+ECO_HEADER = re.compile(r'^\[ECO "([A-E]\d\d)"\]', re.MULTILINE)
+
+
+class PositionEval(models.Model):
+    """Engine evaluation of a position, shared by every game that reaches it"""
+    fen = models.CharField(max_length=100, unique=True)  # position part of the FEN, no move clocks
+    depth = models.PositiveSmallIntegerField()
+    multipv = models.PositiveSmallIntegerField()
+    result = models.JSONField()  # {"eval": {...}, "lines": [...]} as sent to the client
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.fen} (depth {self.depth}, {self.multipv} lines)"
+
+
+class Archive(models.Model):
+    """A player's monthly game archive from Chess.com with its HTTP validators"""
+    username = models.CharField(max_length=50)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    closed = models.BooleanField(default=False)  # month is over, archive can no longer change
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["username", "year", "month"], name="unique_archive_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.username} {self.year}/{self.month:02d}"
+
+
+class Player(models.Model):
+    """A Chess.com account whose games are stored locally"""
+    username = models.CharField(max_length=50, unique=True)  # lowercase
+    synced_at = models.DateTimeField(null=True, blank=True)
+    report_built = models.BooleanField(default=False)  # ReportBucket rows cover every stored game
+    tree_built = models.BooleanField(default=False)  # OpeningNode/OpeningMove rows cover every stored game
+
+    def __str__(self):
+        return self.username
+
+
+def eco_code(pgn_text: str) -> str:
+    """ECO opening code from a PGN's headers, empty if missing"""
+    match = ECO_HEADER.search(pgn_text)
+    return match.group(1) if match else ""
+
+
+class Game(models.Model):
+    """A finished Chess.com game, stored once per player whose archive it came from"""
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name="games",
+        to_field="username", db_column="username",
+    )
+    url = models.URLField(max_length=200)
+    uuid = models.CharField(max_length=64, blank=True)
+    pgn = models.TextField()
+    pgn_id = models.CharField(max_length=16, blank=True, db_index=True)  # short content hash used in URLs
+    white_username = models.CharField(max_length=50)
+    white_rating = models.PositiveSmallIntegerField(null=True)
+    white_result = models.CharField(max_length=30)
+    black_username = models.CharField(max_length=50)
+    black_rating = models.PositiveSmallIntegerField(null=True)
+    black_result = models.CharField(max_length=30)
+    time_class = models.CharField(max_length=20)
+    time_control = models.CharField(max_length=20, blank=True)
+    rules = models.CharField(max_length=20, default="chess")
+    end_time = models.BigIntegerField()  # Unix timestamp as reported by Chess.com
+    eco = models.CharField(max_length=3, blank=True)  # opening code from the PGN headers
+    accuracy = models.FloatField(null=True, blank=True)  # the player's accuracy once analysed
+    move_times = models.BinaryField(default=b"", blank=True)  # deciseconds spent per ply, see utils.clocks
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["player", "url"], name="unique_player_game"),
+        ]
+        indexes = [
+            models.Index(fields=["player", "end_time"], name="game_player_end_idx"),
+            models.Index(fields=["time_class"], name="game_time_class_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.white_username} vs {self.black_username} ({self.url})"
+
+    @classmethod
+    def from_raw(cls, player: Player, game: dict) -> "Game":
+        """Build an unsaved Game from a raw Chess.com game dict"""
+        return cls(
+            player=player,
+            url=game.get("url", ""),
+            uuid=game.get("uuid", ""),
+            pgn=game.get("pgn", ""),
+            pgn_id=pgn_id(game.get("pgn", "")),
+            white_username=game["white"]["username"],
+            white_rating=game["white"].get("rating"),
+            white_result=game["white"]["result"],
+            black_username=game["black"]["username"],
+            black_rating=game["black"].get("rating"),
+            black_result=game["black"]["result"],
+            time_class=game["time_class"],
+            time_control=game.get("time_control", ""),
+            rules=game.get("rules", "chess"),
+            end_time=game["end_time"],
+            eco=eco_code(game.get("pgn", "")),
+            move_times=pgn_move_times(game.get("pgn", ""), game.get("time_control", "")),
+        )
+
+    def as_raw(self) -> dict:
+        """Rebuild the Chess.com game dict shape used by the transform utils"""
+        return {
+            "url": self.url,
+            "uuid": self.uuid,
+            "pgn": self.pgn,
+            "white": {"username": self.white_username, "rating": self.white_rating, "result": self.white_result},
+            "black": {"username": self.black_username, "rating": self.black_rating, "result": self.black_result},
+            "time_class": self.time_class,
+            "time_control": self.time_control,
+            "rules": self.rules,
+            "end_time": self.end_time,
+        }
+
+
+class AnalysisJob(models.Model):
+    """Full-game analysis shared by every client requesting the same PGN and engine settings"""
+    RUNNING = "running"
+    COMPLETE = "complete"
+    FAILED = "failed"
+    STATUS_CHOICES = [(RUNNING, "Running"), (COMPLETE, "Complete"), (FAILED, "Failed")]
+
+    pgn_hash = models.CharField(max_length=64)  # sha256 of the PGN text
+    depth = models.PositiveSmallIntegerField()
+    multipv = models.PositiveSmallIntegerField()
+    pgn = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING)
+    results = models.JSONField(default=list)  # one {"eval", "lines"} dict per ply
+    lease_until = models.DateTimeField(null=True, blank=True)  # held by the analysis worker running the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["pgn_hash", "depth", "multipv"], name="unique_analysis_job"),
+        ]
+
+    def __str__(self):
+        return f"{self.pgn_hash[:12]} depth {self.depth} ({self.status})"
+
+
+class AnalysisSnapshot(models.Model):
+    """Compact copy of a complete AnalysisJob, served over HTTP instead of a WebSocket"""
+    pgn_hash = models.CharField(max_length=64)  # sha256 of the PGN text
+    depth = models.PositiveSmallIntegerField()
+    multipv = models.PositiveSmallIntegerField()
+    data = models.BinaryField()  # evalcodec struct and game stats, see utils.snapshot
+    etag = models.CharField(max_length=40)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["pgn_hash", "depth", "multipv"], name="unique_analysis_snapshot"),
+        ]
+
+    def __str__(self):
+        return f"{self.pgn_hash[:12]} depth {self.depth} snapshot"
+
+
+class ReportBucket(models.Model):
+    """
+    Running totals of a player's games sharing one report dimension value
+
+    e.g. dimension "time_class" and key "blitz". Rows are updated as games
+    are stored and analysed, so a report never has to scan the games.
+    """
+    COLOUR = "colour"
+    TIME_CLASS = "time_class"
+    ECO = "eco"
+    RATING_BAND = "rating_band"  # opponent's rating, RATING_BAND_WIDTH wide
+    MONTH = "month"
+    RATING_BAND_WIDTH = 100
+
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name="report_buckets",
+        to_field="username", db_column="username",
+    )
+    dimension = models.CharField(max_length=20)
+    key = models.CharField(max_length=20)
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    accuracy_sum = models.FloatField(default=0)
+    accuracy_games = models.PositiveIntegerField(default=0)  # games analysed so far
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["player", "dimension", "key"], name="unique_report_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.player_id} {self.dimension}={self.key} ({self.games} games)"
+
+
+class OpeningNode(models.Model):
+    """How often a position was reached in a player's games with one colour, and the results"""
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name="opening_nodes",
+        to_field="username", db_column="username",
+    )
+    colour = models.CharField(max_length=5)  # "white" or "black", the player's side
+    key = models.BigIntegerField()  # Polyglot Zobrist hash of the position, as a signed 64-bit value
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["player", "colour", "key"], name="unique_opening_node"),
+        ]
+
+    def __str__(self):
+        return f"{self.player_id} {self.colour} {self.key:x} ({self.games} games)"
+
+
+class OpeningMove(models.Model):
+    """A move played from a position in a player's games, with the games that continued with it"""
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name="opening_moves",
+        to_field="username", db_column="username",
+    )
+    colour = models.CharField(max_length=5)
+    parent = models.BigIntegerField()  # OpeningNode.key before the move
+    child = models.BigIntegerField()  # OpeningNode.key after the move
+    uci = models.CharField(max_length=5)
+    san = models.CharField(max_length=10)
+    games = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["player", "colour", "parent", "uci"], name="unique_opening_move"),
+        ]
+
+    def __str__(self):
+        return f"{self.player_id} {self.colour} {self.parent:x} {self.san} ({self.games} games)"
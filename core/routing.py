@@ -1,6 +1,7 @@
 from django.urls import re_path
 from . import consumers
+from .utils.ids import PGN_ID_PATTERN
 
 websocket_urlpatterns = [
-    re_path(r'ws/analysis/(?P<pgn_id>[^/]+)/$', consumers.AnalysisConsumer.as_asgi()),
+    re_path(rf'ws/analysis/(?P<pgn_id>{PGN_ID_PATTERN})/$', consumers.AnalysisConsumer.as_asgi()),
 ] 
\ No newline at end of file
@@ -0,0 +1,84 @@
+import io
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Tuple
+
+import chess.pgn
+
+from .engine import analyse_pgn
+
+logger = logging.getLogger(__name__)
+
+def split_pgn(text: str) -> List[str]:
+    """
+    Split a multi-game PGN into the text of each game
+
+    The original text of every game is kept, so its hash matches the one
+    computed when the same PGN is analysed from the website.
+
+    Args:
+        text: Contents of a PGN file
+
+    Returns:
+        List of PGN strings, one per game
+    """
+    handle = io.StringIO(text)
+    offsets = []
+    while True:
+        offset = handle.tell()
+        if not chess.pgn.skip_game(handle):
+            break
+        offsets.append(offset)
+    offsets.append(len(text))
+
+    games = []
+    for start, end in zip(offsets, offsets[1:]):
+        game = text[start:end].strip()
+        if game:
+            games.append(game)
+    return games
+
+def read_pgn_path(path: str) -> Iterator[str]:
+    """
+    Read every game from a PGN file or a directory of .pgn files
+
+    Args:
+        path: PGN file, or directory searched recursively for *.pgn
+
+    Yields:
+        PGN string of each game
+    """
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+            if name.lower().endswith(".pgn")
+        )
+    else:
+        files = [path]
+
+    for filename in files:
+        with open(filename, encoding="utf-8-sig", errors="replace") as f:
+            yield from split_pgn(f.read())
+
+def analyse_game(pgn_text: str) -> Tuple[str, List[Dict], float]:
+    """
+    Analyse one game, meant to run inside a batch worker process
+
+    Each worker analyses one game at a time, so its engine pool only ever
+    starts a single Stockfish. Position evaluations go to the evaluation
+    cache as they are found, which lets a game interrupted part-way pick up
+    where it stopped. The full-game result is returned rather than stored
+    here so that analysis jobs are written by one process only.
+
+    Args:
+        pgn_text: PGN string of the game
+
+    Returns:
+        Tuple of (PGN text, analysis results, seconds taken)
+    """
+    started = time.perf_counter()
+    results = analyse_pgn(pgn_text)
+    return pgn_text, results, time.perf_counter() - started
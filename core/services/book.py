@@ -0,0 +1,159 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+import chess
+import chess.polyglot
+import chess.syzygy
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Syzygy tables exist for at most this many pieces
+TABLEBASE_PIECES = 7
+
+# Score reported for a tablebase win, kept clear of any engine centipawn score
+TABLEBASE_WIN = 10000
+
+_book = None
+_tablebase = None
+_lock = threading.Lock()
+
+def _open_book() -> Optional[chess.polyglot.MemoryMappedReader]:
+    """Open the Polyglot book from settings once, None if unset or unreadable"""
+    global _book
+    with _lock:
+        if _book is None:
+            _book = False
+            path = settings.OPENING_BOOK_PATH
+            if path:
+                try:
+                    _book = chess.polyglot.open_reader(path)
+                    logger.info(f"Opened opening book {path}")
+                except Exception as e:
+                    logger.error(f"Error opening opening book {path}: {e}")
+        return _book or None
+
+def _open_tablebase() -> Optional[chess.syzygy.Tablebase]:
+    """Open the Syzygy tables from settings once, None if unset or unreadable"""
+    global _tablebase
+    with _lock:
+        if _tablebase is None:
+            _tablebase = False
+            path = settings.SYZYGY_PATH
+            if path:
+                try:
+                    tablebase = chess.syzygy.Tablebase()
+                    for directory in path.split(os.pathsep):
+                        tablebase.add_directory(directory)
+                    _tablebase = tablebase
+                    logger.info(f"Opened Syzygy tablebase {path}")
+                except Exception as e:
+                    logger.error(f"Error opening Syzygy tablebase {path}: {e}")
+        return _tablebase or None
+
+def book_result(board: chess.Board) -> Optional[Dict]:
+    """
+    Look a position up in the opening book
+
+    Book positions get no engine score: the eval is reported as level and
+    the lines are the book moves by weight, without scores.
+
+    Args:
+        board: Position to look up
+
+    Returns:
+        Result dict tagged with source "book", or None if not in the book
+    """
+    book = _open_book()
+    if book is None:
+        return None
+
+    try:
+        entries = sorted(book.find_all(board), key=lambda entry: entry.weight, reverse=True)
+    except Exception as e:
+        logger.error(f"Error reading opening book: {e}")
+        return None
+    if not entries:
+        return None
+
+    lines = [
+        {"Move": entry.move.uci(), "Centipawn": None, "Mate": None}
+        for entry in entries[:settings.ENGINE_MULTIPV]
+    ]
+    return {"eval": {"type": "cp", "value": 0}, "lines": lines, "source": "book"}
+
+def _wdl_score(wdl: int, turn: chess.Color) -> int:
+    """Centipawns from White's point of view for a WDL value of the side to move"""
+    # Cursed wins and blessed losses are draws under the fifty-move rule
+    value = TABLEBASE_WIN if wdl == 2 else -TABLEBASE_WIN if wdl == -2 else 0
+    return value if turn == chess.WHITE else -value
+
+def tablebase_result(board: chess.Board) -> Optional[Dict]:
+    """
+    Look a position up in the Syzygy tablebase
+
+    Moves are ranked like a perfect player would: wins by shortest distance
+    to zeroing, draws, then losses by longest distance to zeroing.
+
+    Args:
+        board: Position to look up
+
+    Returns:
+        Result dict tagged with source "tablebase", or None if not covered
+    """
+    if chess.popcount(board.occupied) > TABLEBASE_PIECES or board.castling_rights:
+        return None
+    tablebase = _open_tablebase()
+    if tablebase is None:
+        return None
+
+    try:
+        wdl = tablebase.get_wdl(board)
+        if wdl is None:
+            return None
+
+        ranked = []
+        for move in board.legal_moves:
+            child = board.copy(stack=False)
+            child.push(move)
+            child_wdl = tablebase.get_wdl(child)
+            child_dtz = tablebase.get_dtz(child)
+            if child_wdl is None or child_dtz is None:
+                return None
+            # Our result is the opposite of the opponent's after the move
+            ours = -child_wdl
+            distance = -abs(child_dtz) if ours > 0 else abs(child_dtz)
+            ranked.append((ours, distance, move))
+    except Exception as e:
+        logger.error(f"Error probing tablebase: {e}")
+        return None
+
+    ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    lines: List[Dict] = [
+        {"Move": move.uci(), "Centipawn": _wdl_score(ours, board.turn), "Mate": None}
+        for ours, _, move in ranked[:settings.ENGINE_MULTIPV]
+    ]
+    return {
+        "eval": {"type": "cp", "value": _wdl_score(wdl, board.turn)},
+        "lines": lines,
+        "source": "tablebase",
+    }
+
+def known_result(board: chess.Board, *, book: bool = True) -> Optional[Dict]:
+    """
+    Answer a position from the opening book or tablebase without the engine
+
+    Args:
+        board: Position to look up
+        book: Whether to consult the opening book
+
+    Returns:
+        Tagged result dict, or None if the position needs a search
+    """
+    if book:
+        result = book_result(board)
+        if result is not None:
+            return result
+    return tablebase_result(board)
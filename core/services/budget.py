@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional
+
+# Never give a single search less than this, however little time is left
+MIN_SEARCH_TIME = 0.05
+
+# A critical position may use this many times its share of the remaining time
+CRITICAL_SHARE = 3
+
+def centipawns(score: Dict, mate_value: int) -> int:
+    """
+    Score dict as centipawns from White's point of view
+
+    Mates count as *mate_value* so they compare against ordinary scores.
+    """
+    if score["type"] == "mate":
+        return mate_value if score["value"] > 0 else -mate_value
+    return score["value"]
+
+class SearchBudget:
+    """
+    Decides how deep to search each position of one game
+
+    Every position is first searched shallowly. The search is only repeated
+    deeper when the position looks critical: the evaluation swung since the
+    previous ply or the best move changed between depths. Forced moves and
+    already decided positions stay shallow. With a game time limit, time not
+    used by quiet positions is left for the critical ones.
+    """
+
+    def __init__(
+        self,
+        positions: int,
+        *,
+        min_depth: int,
+        max_depth: int,
+        game_time: Optional[float] = None,
+        swing: int = 50,
+        decisive: int = 500,
+    ):
+        """
+        Args:
+            positions: Number of positions in the game
+            min_depth: Depth of the first, shallow search
+            max_depth: Deepest search for critical positions
+            game_time: Seconds of search for the whole game, None for no limit
+            swing: Eval change in centipawns that makes a position critical
+            decisive: Eval in centipawns beyond which deeper search is pointless
+        """
+        self.min_depth = min(min_depth, max_depth)
+        self.max_depth = max_depth
+        self.swing = swing
+        self.decisive = decisive
+        self.remaining = game_time
+        self.positions_left = max(1, positions)
+        self.depths: List[int] = sorted({self.min_depth, (self.min_depth + max_depth) // 2, max_depth})
+        self._spent = 0.0
+        self._allowance: Optional[float] = None
+
+    def start_position(self) -> None:
+        """Start timing a new position"""
+        self._spent = 0.0
+        if self.remaining is not None:
+            self._allowance = max(self.remaining, 0.0) / self.positions_left
+
+    def finish_position(self) -> None:
+        """Count a position as done"""
+        self.positions_left = max(1, self.positions_left - 1)
+
+    def spend(self, seconds: float) -> None:
+        """Record time spent searching the current position"""
+        self._spent += seconds
+        if self.remaining is not None:
+            self.remaining -= seconds
+
+    def search_time(self) -> Optional[float]:
+        """Time limit for the next search of the current position, None for no limit"""
+        if self._allowance is None:
+            return None
+        return max(MIN_SEARCH_TIME, self._allowance * CRITICAL_SHARE - self._spent)
+
+    def has_time(self) -> bool:
+        """Check whether the current position may still be searched deeper"""
+        if self._allowance is None:
+            return True
+        return self.remaining > 0 and self._spent < self._allowance * CRITICAL_SHARE
+
+    def decided(self, score: Dict) -> bool:
+        """Check whether a score is a mate or a decisive advantage"""
+        return abs(self._cp(score)) >= self.decisive
+
+    def needs_deeper(self, result: Dict, shallower: Optional[Dict], previous: Optional[Dict]) -> bool:
+        """
+        Check whether the position deserves a deeper search
+
+        After the shallow search a position is critical when the eval swung
+        since the previous ply, unless the game was already decided on both
+        plies. After a deeper one it stays critical only while the search is
+        unstable: the best move changed or the eval moved by a swing between
+        the two depths.
+
+        Args:
+            result: Result of the latest search
+            shallower: Result of the search one depth step earlier, if any
+            previous: Eval of the previous ply, if any
+
+        Returns:
+            True if the position looks critical and time allows
+        """
+        if not result["lines"] or not self.has_time():
+            return False
+
+        if shallower is None:
+            if previous is None or (self.decided(result["eval"]) and self.decided(previous)):
+                return False
+            return abs(self._cp(result["eval"]) - self._cp(previous)) >= self.swing
+
+        if self.decided(result["eval"]):
+            return False
+        if not shallower["lines"]:
+            return True
+        if shallower["lines"][0]["Move"] != result["lines"][0]["Move"]:
+            return True
+        return abs(self._cp(result["eval"]) - self._cp(shallower["eval"])) >= self.swing
+
+    def _cp(self, score: Dict) -> int:
+        return centipawns(score, self.decisive)
@@ -1,20 +1,256 @@
+import asyncio
 import requests
 import logging
-from chessdotcom import get_player_game_archives, get_player_games_by_month, Client
-from datetime import datetime
-from typing import List, Dict, Optional
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from typing import Any, AsyncGenerator, List, Dict, Mapping, NamedTuple, Optional, Tuple
 
-# Configure chessdotcom client with proper User-Agent
-Client.request_config['headers']['User-Agent'] = 'Chess Analysis Tool (github.com/chiedu18/chess-analysis; contact: chiedu@example.com)'
+import aiohttp
+from channels.db import database_sync_to_async
+
+from ..models import Archive, Game, Player
+from .metrics import timed
+from .openings import add_games_to_tree
+from .report import add_games
 
 # User-Agent for direct API calls
 USER_AGENT = "chess-analysis-app/0.3 (github.com/chiedu18)"
 
+API_BASE = "https://api.chess.com/pub"
+
 logger = logging.getLogger(__name__)
 
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+class ApiResponse(NamedTuple):
+    """Status, decoded JSON body (None for a 304) and headers of an API response"""
+    status: int
+    data: Optional[Dict]
+    headers: Mapping[str, str]
+
+class ChessComError(Exception):
+    """Raised by the async client for an error status from Chess.com"""
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"{status} error from {url}")
+        self.status = status
+
+def get_session() -> requests.Session:
+    """
+    Get the shared HTTP session for Chess.com, creating it on first use
+
+    The session keeps connections alive between requests and its pool is
+    sized for the concurrent archive downloads.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json"})
+            adapter = HTTPAdapter(pool_maxsize=settings.CHESSCOM_MAX_CONCURRENCY)
+            _session.mount("https://", adapter)
+        return _session
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than a Retry-After header"""
+    delay = random.uniform(0, settings.CHESSCOM_BACKOFF * 2 ** attempt)
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+async def _close_at_shutdown(session: aiohttp.ClientSession) -> AsyncGenerator[None, None]:
+    """Wait at the yield until the event loop finalizes this generator, then close *session*"""
+    try:
+        yield
+    finally:
+        await session.close()
+
+class AsyncClient:
+    """
+    asyncio Chess.com client for one event loop
+
+    Requests share a keep-alive connection pool, at most
+    CHESSCOM_MAX_CONCURRENCY run at once and each is bounded by
+    CHESSCOM_TIMEOUT. Rate limiting (429), server errors and dropped
+    connections are retried up to CHESSCOM_RETRIES times with jittered
+    exponential backoff.
+    """
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        """
+        Args:
+            session: Session to send requests with, created on first use if omitted
+        """
+        self._session = session
+        self._slots = asyncio.Semaphore(settings.CHESSCOM_MAX_CONCURRENCY)
+        self._lifetime: Optional[AsyncGenerator[None, None]] = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        """
+        The session requests are sent with, created on first use
+
+        A created session is closed when its event loop shuts down: the loop
+        finalizes its async generators before closing (asyncio.run() and
+        asgiref do), which runs the finally of _close_at_shutdown().
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers={"User-Agent": USER_AGENT, "Accept": "application/json"},
+                connector=aiohttp.TCPConnector(limit=settings.CHESSCOM_MAX_CONCURRENCY),
+                timeout=aiohttp.ClientTimeout(total=settings.CHESSCOM_TIMEOUT),
+            )
+            # Kept referenced: the loop only holds its async generators weakly
+            self._lifetime = _close_at_shutdown(self._session)
+            await self._lifetime.__anext__()
+        return self._session
+
+    async def get(self, url: str, *, headers: Optional[Dict[str, str]] = None) -> ApiResponse:
+        """
+        GET a Chess.com API URL
+
+        Args:
+            url: Full API URL
+            headers: Extra request headers, e.g. conditional request validators
+
+        Returns:
+            ApiResponse, with status 304 when a conditional request matched
+        """
+        retries = settings.CHESSCOM_RETRIES
+        for attempt in range(retries + 1):
+            retry_after = None
+            try:
+                async with self._slots:
+                    with timed("chesscom_fetch"):
+                        async with (await self.session()).get(url, headers=headers) as response:
+                            if response.status == 304:
+                                return ApiResponse(304, None, response.headers)
+                            if response.status < 400:
+                                return ApiResponse(response.status, await response.json(content_type=None), response.headers)
+                            if response.status != 429 and response.status < 500:
+                                raise ChessComError(response.status, url)
+                            retry_after = response.headers.get("Retry-After")
+                            error: Exception = ChessComError(response.status, url)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+
+            if attempt == retries:
+                raise error
+            delay = _backoff(attempt, retry_after)
+            logger.warning(f"Retrying {url} in {delay:.1f}s after: {error}")
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_async_client() -> AsyncClient:
+    """
+    Get the Chess.com client of the running event loop, creating it on first use
+
+    aiohttp sessions belong to the loop they were created on, so each loop
+    (normally just the ASGI server's) has its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncClient()
+    return client
+
+def _request(url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    """
+    GET a Chess.com API URL with the shared session
+
+    Rate limiting (429), server errors and dropped connections are retried
+    as AsyncClient.get() does, sleeping in the calling thread.
+
+    Args:
+        url: Full API URL
+        headers: Extra request headers, e.g. conditional request validators
+
+    Returns:
+        Response with a status below 400
+
+    Raises:
+        requests.RequestException: On any other error status, or once retries are used up
+    """
+    retries = settings.CHESSCOM_RETRIES
+    for attempt in range(retries + 1):
+        retry_after = None
+        try:
+            with timed("chesscom_fetch"):
+                response = get_session().get(url, headers=headers, timeout=settings.CHESSCOM_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            error: Exception = e
+        else:
+            if attempt == retries or (response.status_code != 429 and response.status_code < 500):
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get("Retry-After")
+            error = ChessComError(response.status_code, url)
+
+        delay = _backoff(attempt, retry_after)
+        logger.warning(f"Retrying {url} in {delay:.1f}s after: {error}")
+        time.sleep(delay)
+
+def _cache_key(endpoint: str, url: str) -> str:
+    return f"chesscom:{endpoint}:{url}"
+
+def _get_json(endpoint: str, url: str) -> Dict:
+    """
+    GET a Chess.com API URL, answering from the cache for CHESSCOM_CACHE_TTL[endpoint] seconds
+
+    Only does HTTP and cache access so it is safe to run in worker threads.
+    """
+    key = _cache_key(endpoint, url)
+    data = cache.get(key)
+    if data is None:
+        data = _request(url).json()
+        cache.set(key, data, settings.CHESSCOM_CACHE_TTL[endpoint])
+    return data
+
+async def _aget_json(endpoint: str, url: str) -> Dict:
+    """Async version of _get_json()"""
+    key = _cache_key(endpoint, url)
+    data = await cache.aget(key)
+    if data is None:
+        data = (await get_async_client().get(url)).data
+        await cache.aset(key, data, settings.CHESSCOM_CACHE_TTL[endpoint])
+    return data
+
+def _profile_dict(prof: Dict, stats: Dict) -> Dict:
+    blitz_rating = stats.get("chess_blitz", {}).get("last", {}).get("rating")
+
+    return {
+        "username": prof["username"],
+        "title": prof.get("title"),
+        "blitz_rating": blitz_rating
+    }
+
 def player_profile(username: str) -> Dict:
     """
     Fetch player profile and stats from Chess.com API
+
+    Profile and stats are requested concurrently and each is cached for
+    its CHESSCOM_CACHE_TTL entry.
     
     Args:
         username: Chess.com username
@@ -23,38 +259,351 @@ def player_profile(username: str) -> Dict:
         Dict with username, title, and blitz_rating
     """
     try:
-        headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
-        base = f"https://api.chess.com/pub/player/{username.lower()}"
-        
-        # Get profile info
-        prof_response = requests.get(base, headers=headers, timeout=10)
-        prof_response.raise_for_status()
-        prof = prof_response.json()
-        
-        # Get stats
-        stats_response = requests.get(base + "/stats", headers=headers, timeout=10)
-        stats_response.raise_for_status()
-        stats = stats_response.json()
-        
-        blitz_rating = stats.get("chess_blitz", {}).get("last", {}).get("rating")
+        base = f"{API_BASE}/player/{username.lower()}"
         
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            prof = executor.submit(_get_json, "profile", base)
+            stats = executor.submit(_get_json, "stats", base + "/stats")
+            return _profile_dict(prof.result(), stats.result())
+    except Exception as e:
+        logger.error(f"Error fetching profile for {username}: {e}")
+        # Return basic info if profile fetch fails
         return {
-            "username": prof["username"],
-            "title": prof.get("title"),
-            "blitz_rating": blitz_rating
+            "username": username,
+            "title": None,
+            "blitz_rating": None
         }
+
+async def aplayer_profile(username: str) -> Dict:
+    """
+    Async version of player_profile()
+
+    Args:
+        username: Chess.com username
+
+    Returns:
+        Dict with username, title, and blitz_rating
+    """
+    try:
+        base = f"{API_BASE}/player/{username.lower()}"
+        prof, stats = await asyncio.gather(
+            _aget_json("profile", base),
+            _aget_json("stats", base + "/stats"),
+        )
+        return _profile_dict(prof, stats)
     except Exception as e:
         logger.error(f"Error fetching profile for {username}: {e}")
-        # Return basic info if profile fetch fails
         return {
             "username": username,
             "title": None,
             "blitz_rating": None
         }
 
+def _month_closed(year: int, month: int) -> bool:
+    """A month's archive stops changing once the month is over (UTC)"""
+    now = datetime.now(dt_timezone.utc)
+    return (year, month) < (now.year, now.month)
+
+def _month_request(username: str, year: int, month: int, archive: Optional[Archive]) -> Tuple[str, Dict[str, str]]:
+    """URL and conditional headers for one month archive"""
+    headers = {}
+    if archive is not None:
+        if archive.etag:
+            headers["If-None-Match"] = archive.etag
+        if archive.last_modified:
+            headers["If-Modified-Since"] = archive.last_modified
+    return f"{API_BASE}/player/{username}/games/{year}/{month:02d}", headers
+
+def _get_month(username: str, year: int, month: int, archive: Optional[Archive]) -> ApiResponse:
+    """
+    Download one month archive, revalidating it if we hold a stored copy
+
+    Only does HTTP so it is safe to run in worker threads.
+    """
+    url, headers = _month_request(username, year, month, archive)
+    response = _request(url, headers=headers)
+    if response.status_code == 304:
+        return ApiResponse(304, None, response.headers)
+    return ApiResponse(response.status_code, response.json(), response.headers)
+
+async def _aget_month(username: str, year: int, month: int, archive: Optional[Archive]) -> ApiResponse:
+    """Async version of _get_month()"""
+    url, headers = _month_request(username, year, month, archive)
+    return await get_async_client().get(url, headers=headers)
+
+def _pending_months(player: Player, months: List[Tuple[int, int]]) -> List[Tuple[int, int, Optional[Archive]]]:
+    """Months that may have changed since stored, with their stored archive if any"""
+    stored = {
+        (archive.year, archive.month): archive
+        for archive in Archive.objects.filter(username=player.username, year__in={y for y, _ in months})
+    }
+
+    pending = []
+    for year, month in months:
+        archive = stored.get((year, month))
+        if archive is None or not archive.closed:
+            pending.append((year, month, archive))
+    return pending
+
+def _insert_games(games: List[Game]) -> List[Game]:
+    """
+    Insert games, returning the ones this call actually stored
+
+    A sync of the same month running concurrently may store some of them
+    first; those are skipped rather than counted twice in the report and
+    opening tree.
+    """
+    try:
+        with transaction.atomic():
+            Game.objects.bulk_create(games)
+        return games
+    except IntegrityError:
+        pass
+
+    inserted = []
+    for game in games:
+        try:
+            with transaction.atomic():
+                game.save(force_insert=True)
+        except IntegrityError:
+            continue
+        inserted.append(game)
+    return inserted
+
+def _store_month(
+    player: Player,
+    year: int,
+    month: int,
+    archive: Optional[Archive],
+    response: ApiResponse,
+    since: Optional[int],
+) -> int:
+    """Store a downloaded month archive, returning the number of new games"""
+    if response.status == 304:
+        archive.closed = _month_closed(year, month)
+        archive.save(update_fields=["closed", "fetched_at"])
+        return 0
+
+    games = {
+        game.get("url", ""): Game.from_raw(player, game) for game in response.data["games"]
+        if since is None or game["end_time"] > since
+    }
+    # Store the games and the validators together so a closed month is
+    # never marked as fetched without its games
+    with transaction.atomic():
+        stored = set(Game.objects.filter(player=player, url__in=list(games)).values_list("url", flat=True))
+        new_games = _insert_games([game for url, game in games.items() if url not in stored])
+        add_games(player, new_games)
+        add_games_to_tree(player, new_games)
+        added = len(new_games)
+        Archive.objects.update_or_create(
+            username=player.username,
+            year=year,
+            month=month,
+            defaults={
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+                "closed": _month_closed(year, month),
+            },
+        )
+    return added
+
+def sync_months(player: Player, months: List[Tuple[int, int]], *, since: Optional[int] = None) -> int:
+    """
+    Store the games of several month archives, downloading only what may have changed
+
+    Closed months already stored are skipped without a request. The rest are
+    downloaded concurrently (at most CHESSCOM_MAX_CONCURRENCY at a time) with
+    If-None-Match/If-Modified-Since, so an unchanged current month costs a 304.
+
+    Args:
+        player: Player whose archives to sync
+        months: (year, month) pairs to sync
+        since: Only insert games that ended after this Unix timestamp
+
+    Returns:
+        Number of new games stored
+    """
+    pending = _pending_months(player, months)
+    if not pending:
+        return 0
+
+    # Worker threads only do HTTP; database reads and writes stay on this thread
+    workers = min(len(pending), settings.CHESSCOM_MAX_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        responses = list(executor.map(lambda item: _get_month(player.username, *item), pending))
+
+    added = 0
+    for (year, month, archive), response in zip(pending, responses):
+        added += _store_month(player, year, month, archive, response, since)
+    return added
+
+async def async_months(player: Player, months: List[Tuple[int, int]], *, since: Optional[int] = None) -> int:
+    """Async version of sync_months(), downloading on the event loop"""
+    pending = await database_sync_to_async(_pending_months)(player, months)
+    if not pending:
+        return 0
+
+    responses = await asyncio.gather(*[_aget_month(player.username, *item) for item in pending])
+
+    added = 0
+    for (year, month, archive), response in zip(pending, responses):
+        added += await database_sync_to_async(_store_month)(player, year, month, archive, response, since)
+    return added
+
+def _parse_archives(data: Dict) -> List[Tuple[int, int]]:
+    """List archive months from an archives response, most recent first"""
+    # URL format: https://api.chess.com/pub/player/username/games/YYYY/MM
+    months = []
+    for archive_url in reversed(data['archives']):
+        parts = archive_url.split('/')
+        months.append((int(parts[-2]), int(parts[-1])))
+    return months
+
+def _archive_months(username: str) -> List[Tuple[int, int]]:
+    """List a player's archive months, most recent first"""
+    return _parse_archives(_request(f"{API_BASE}/player/{username}/games/archives").json())
+
+async def _aarchive_months(username: str) -> List[Tuple[int, int]]:
+    """Async version of _archive_months()"""
+    response = await get_async_client().get(f"{API_BASE}/player/{username}/games/archives")
+    return _parse_archives(response.data)
+
+def _start_sync(username: str, min_games: Optional[int]) -> Optional[Tuple[Player, int, Optional[int], Any]]:
+    """
+    Load the stored state a sync starts from
+
+    Returns:
+        Tuple of (player, stored game count, newest stored end_time, sync time),
+        or None if the player was synced recently and has enough games
+    """
+    player, _ = Player.objects.get_or_create(username=username)
+    stored_count = player.games.count()
+
+    now = timezone.now()
+    recently_synced = (
+        player.synced_at is not None
+        and (now - player.synced_at).total_seconds() < settings.PLAYER_SYNC_INTERVAL
+    )
+    if recently_synced and min_games is not None and stored_count >= min_games:
+        return None
+
+    latest = player.games.aggregate(latest=Max("end_time"))["latest"]
+    return player, stored_count, latest, now
+
+def _split_months(months: List[Tuple[int, int]], latest: Optional[int]) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """Split months into those that may hold new games and older ones"""
+    if latest is None:
+        return [], months
+    latest_end = datetime.fromtimestamp(latest, dt_timezone.utc)
+    latest_month = (latest_end.year, latest_end.month)
+    return [m for m in months if m >= latest_month], [m for m in months if m < latest_month]
+
+def _backlog(username: str, older: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Older months never downloaded, newest first"""
+    fetched = set(Archive.objects.filter(username=username).values_list("year", "month"))
+    return [m for m in older if m not in fetched]
+
+def _finish_sync(player: Player, synced_at, added: int) -> None:
+    player.synced_at = synced_at
+    player.save(update_fields=["synced_at"])
+    if added:
+        logger.info(f"Stored {added} new games for {player.username}")
+
+def sync_player_games(username: str, *, min_games: Optional[int] = None) -> int:
+    """
+    Bring a player's stored games up to date with Chess.com
+
+    Months from the one holding the newest stored game onwards are checked
+    for new games. Older months are only downloaded while fewer than
+    *min_games* games are stored (all of them when min_games is None). A
+    player synced less than PLAYER_SYNC_INTERVAL seconds ago is skipped.
+
+    Args:
+        username: Chess.com username
+        min_games: Number of games to have stored, or None for full history
+
+    Returns:
+        Number of new games stored
+    """
+    username = username.strip().lower()
+    state = _start_sync(username, min_games)
+    if state is None:
+        return 0
+    player, stored_count, latest, now = state
+
+    recent, older = _split_months(_archive_months(username), latest)
+    added = 0
+    if recent:
+        added += sync_months(player, recent, since=latest)
+
+    # Backfill older months, newest first, until enough games are stored
+    backlog = _backlog(username, older)
+    batch_size = settings.CHESSCOM_MAX_CONCURRENCY
+    for start in range(0, len(backlog), batch_size):
+        if min_games is not None and stored_count + added >= min_games:
+            break
+        added += sync_months(player, backlog[start:start + batch_size])
+
+    _finish_sync(player, now, added)
+    return added
+
+async def async_player_games(username: str, *, min_games: Optional[int] = None) -> int:
+    """Async version of sync_player_games(), with HTTP on the event loop"""
+    username = username.strip().lower()
+    state = await database_sync_to_async(_start_sync)(username, min_games)
+    if state is None:
+        return 0
+    player, stored_count, latest, now = state
+
+    recent, older = _split_months(await _aarchive_months(username), latest)
+    added = 0
+    if recent:
+        added += await async_months(player, recent, since=latest)
+
+    backlog = await database_sync_to_async(_backlog)(username, older)
+    batch_size = settings.CHESSCOM_MAX_CONCURRENCY
+    for start in range(0, len(backlog), batch_size):
+        if min_games is not None and stored_count + added >= min_games:
+            break
+        added += await async_months(player, backlog[start:start + batch_size])
+
+    await database_sync_to_async(_finish_sync)(player, now, added)
+    return added
+
+def stored_games(username: str, *, limit: int = 100) -> List[Dict]:
+    """
+    Get a player's most recent stored games
+
+    Args:
+        username: Chess.com username
+        limit: Maximum number of games to return
+
+    Returns:
+        List of raw game dictionaries, newest first
+    """
+    games = Game.objects.filter(player_id=username.strip().lower()).order_by("-end_time")[:limit]
+    return [game.as_raw() for game in games]
+
+def _games_error(username: str, e: Exception) -> ValueError:
+    """Turn a failed games fetch into a user-facing error"""
+    logger.error(f"Error fetching games for {username}: {e}")
+    error_msg = str(e)
+    if '404' in error_msg or 'not found' in error_msg.lower():
+        return ValueError(f'Username "{username}" not found on Chess.com')
+    elif '403' in error_msg or 'forbidden' in error_msg.lower():
+        return ValueError(f'Username "{username}" not found or account is private. Please check the username and ensure the account is public.')
+    elif '429' in error_msg or 'rate limit' in error_msg.lower():
+        return ValueError('Rate limit exceeded. Please try again in a few minutes.')
+    else:
+        return ValueError(f'Error fetching games: {error_msg}')
+
 def player_games(username: str, *, limit: int = 100) -> List[Dict]:
     """
-    Fetch the last N games from Chess.com API for a given username
+    Fetch the last N games for a given username
+
+    New games are synced from Chess.com into the local store first, then the
+    games are read back with a single indexed query.
     
     Args:
         username: Chess.com username
@@ -67,47 +616,27 @@ def player_games(username: str, *, limit: int = 100) -> List[Dict]:
     username = username.strip().lower()
     
     try:
-        # Get player's game archives using chessdotcom library
-        archives_response = get_player_game_archives(username)
-        archives = archives_response.json['archives']
-        
-        if not archives:
-            return []
-        
-        # Get games from the most recent archives until we have enough games
-        all_games = []
-        for archive_url in reversed(archives):  # Start with most recent
-            if len(all_games) >= limit:
-                break
-                
-            # Extract year and month from archive URL
-            # URL format: https://api.chess.com/pub/player/username/games/YYYY/MM
-            parts = archive_url.split('/')
-            year = int(parts[-2])
-            month = int(parts[-1])
-            
-            # Get games for this month
-            month_response = get_player_games_by_month(username, year, month)
-            games = month_response.json['games']
-            
-            for game in games:
-                if len(all_games) >= limit:
-                    break
-                all_games.append(game)
-        
-        # Sort by newest first before returning
-        all_games.sort(key=lambda g: g["end_time"], reverse=True)
-        
-        return all_games[:limit]
+        sync_player_games(username, min_games=limit)
+        return stored_games(username, limit=limit)
         
     except Exception as e:
-        logger.error(f"Error fetching games for {username}: {e}")
-        error_msg = str(e)
-        if '404' in error_msg or 'not found' in error_msg.lower():
-            raise ValueError(f'Username "{username}" not found on Chess.com')
-        elif '403' in error_msg or 'forbidden' in error_msg.lower():
-            raise ValueError(f'Username "{username}" not found or account is private. Please check the username and ensure the account is public.')
-        elif '429' in error_msg or 'rate limit' in error_msg.lower():
-            raise ValueError('Rate limit exceeded. Please try again in a few minutes.')
-        else:
-            raise ValueError(f'Error fetching games: {error_msg}') 
\ No newline at end of file
+        raise _games_error(username, e)
+
+async def aplayer_games(username: str, *, limit: int = 100) -> List[Dict]:
+    """
+    Async version of player_games() for async views
+
+    Args:
+        username: Chess.com username
+        limit: Maximum number of games to fetch
+
+    Returns:
+        List of raw game dictionaries from Chess.com API
+    """
+    username = username.strip().lower()
+
+    try:
+        await async_player_games(username, min_games=limit)
+        return await database_sync_to_async(stored_games)(username, limit=limit)
+    except Exception as e:
+        raise _games_error(username, e)
@@ -1,104 +1,448 @@
-import io
-import chess.pgn
+import asyncio
+import chess
+import chess.engine
 import itertools
 import json
 import logging
-from stockfish import Stockfish
-from typing import List, Dict, Optional
+import threading
+import time
+from contextlib import closing
+from django.conf import settings
+from typing import AsyncIterator, Iterator, List, Dict, Optional
+
+from ..utils.pgn import mainline_moves
+from .book import book_result, known_result
+from .budget import SearchBudget
+from .evalcache import get_eval_cache
+from .metrics import timed
+from .pool import EnginePool, EnginePoolError
 
 logger = logging.getLogger(__name__)
 
-# Initialize Stockfish engine with optimized parameters
-try:
-    ENGINE = Stockfish(
-        depth=18,  # tune depth vs. speed
-        parameters={
-            "Threads": 2,
-            "MultiPV": 3  # ask for three lines
-        }
-    )
-    logger.info("Stockfish engine initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Stockfish engine: {e}")
-    ENGINE = None
+_pool: Optional[EnginePool] = None
+_pool_lock = threading.Lock()
+
+def _start_engine() -> chess.engine.SimpleEngine:
+    """Start one Stockfish process configured from settings"""
+    engine = chess.engine.SimpleEngine.popen_uci(settings.STOCKFISH_PATH)
+    engine.configure({"Threads": settings.ENGINE_THREADS})
+    return engine
+
+def _engine_alive(engine: chess.engine.SimpleEngine) -> bool:
+    """Check that the Stockfish process answers isready"""
+    engine.ping()
+    return True
+
+def _stop_engine(engine: chess.engine.SimpleEngine) -> None:
+    """Ask Stockfish to quit, killing it if it does not exit promptly"""
+    try:
+        engine.quit()
+    except Exception:
+        engine.close()
+
+def get_pool() -> EnginePool:
+    """
+    Get the shared Stockfish pool, creating it on first use
+
+    Returns:
+        EnginePool sized by settings.ENGINE_POOL_SIZE
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EnginePool(
+                _start_engine,
+                size=settings.ENGINE_POOL_SIZE,
+                is_alive=_engine_alive,
+                close=_stop_engine,
+                checkout_timeout=settings.ENGINE_POOL_TIMEOUT,
+            )
+        return _pool
 
-def _analyse_fen(fen: str) -> dict:
+def analysis_depth() -> int:
+    """
+    Depth every position of a game analysis is searched to at the current settings
+
+    In adaptive mode only critical positions go beyond ENGINE_MIN_DEPTH, so
+    stored analyses are keyed by it rather than by ENGINE_DEPTH.
+    """
+    return settings.ENGINE_MIN_DEPTH if settings.ENGINE_ADAPTIVE else settings.ENGINE_DEPTH
+
+def _empty_result() -> dict:
+    return {"eval": {"type": "cp", "value": 0}, "lines": []}
+
+def _score_dict(score: chess.engine.PovScore) -> dict:
+    """Convert a score to {'type': 'cp'|'mate', 'value': n} from White's point of view"""
+    white = score.white()
+    if white.is_mate():
+        return {"type": "mate", "value": white.mate()}
+    return {"type": "cp", "value": white.score()}
+
+def _line_dict(info: chess.engine.InfoDict) -> dict:
+    """Convert one MultiPV line to the {'Move', 'Centipawn', 'Mate'} shape sent to clients"""
+    score = _score_dict(info["score"])
+    return {
+        "Move": info["pv"][0].uci(),
+        "Centipawn": score["value"] if score["type"] == "cp" else None,
+        "Mate": score["value"] if score["type"] == "mate" else None,
+    }
+
+def _analyse_fen(fen: str, engine: Optional[chess.engine.SimpleEngine] = None) -> dict:
     """
     Analyze a single FEN position
-    
+
     Args:
         fen: FEN string representing the position
-        
+        engine: Checked-out engine to use; one is borrowed from the pool if omitted
+
     Returns:
         Dict with evaluation and top moves
     """
-    if not ENGINE:
-        return {"eval": {"type": "cp", "value": 0}, "lines": []}
-    
+    known = known_result(chess.Board(fen))
+    if known is not None:
+        return known
+
+    cache = get_eval_cache()
+    cached = cache.get(fen, settings.ENGINE_DEPTH, settings.ENGINE_MULTIPV)
+    if cached is not None:
+        return cached
+
+    if engine is None:
+        try:
+            with get_pool().engine() as engine:
+                return _search(fen, engine)
+        except EnginePoolError as e:
+            logger.error(f"No engine available for FEN {fen}: {e}")
+            return _empty_result()
+
+    return _search(fen, engine)
+
+def _search(
+    fen: str,
+    engine: chess.engine.SimpleEngine,
+    *,
+    depth: Optional[int] = None,
+    time_limit: Optional[float] = None,
+    board: Optional[chess.Board] = None,
+    game: object = None,
+) -> dict:
+    """
+    Run one MultiPV search on a position and cache the result
+
+    The evaluation is the score of the first line, so a single search
+    produces both the eval and every engine line.
+
+    Args:
+        fen: FEN string of the position
+        engine: Checked-out engine to search with
+        depth: Search depth (defaults to settings.ENGINE_DEPTH)
+        time_limit: Seconds after which the search stops even if short of depth
+        board: The position with the moves leading to it, sent to the engine
+            as "position startpos moves ..." instead of a bare FEN
+        game: Key of the game the position belongs to; the engine only gets
+            ucinewgame, clearing its hash table, when the key changes
+    """
+    depth = depth or settings.ENGINE_DEPTH
     try:
-        ENGINE.set_fen_position(fen)
-        info = ENGINE.get_top_moves(3)  # [{'Move': 'e4', 'Centipawn': 34, …}]
-        score = ENGINE.get_evaluation()  # {'type': 'cp', 'value': 34}
-        return {"eval": score, "lines": info}
+        with timed("engine_search"):
+            infos = engine.analyse(
+                board if board is not None else chess.Board(fen),
+                chess.engine.Limit(depth=depth, time=time_limit),
+                multipv=settings.ENGINE_MULTIPV,
+                game=game,
+            )
+        lines = [_line_dict(info) for info in infos if info.get("pv")]
+        score = _score_dict(infos[0]["score"])  # {'type': 'cp', 'value': 34}
+        result = {"eval": score, "lines": lines}  # lines: [{'Move': 'e2e4', 'Centipawn': 34, …}]
     except Exception as e:
         logger.error(f"Error analyzing FEN {fen}: {e}")
-        return {"eval": {"type": "cp", "value": 0}, "lines": []}
+        return _empty_result()
+
+    # A time limit may stop the search before the requested depth
+    reached = min(depth, infos[0].get("depth", depth))
+    get_eval_cache().put(fen, reached, settings.ENGINE_MULTIPV, result)
+    return result
+
+def _budgeted_search(
+    board: chess.Board,
+    engine: chess.engine.SimpleEngine,
+    budget: SearchBudget,
+    previous: Optional[dict],
+    game: object = None,
+) -> dict:
+    """
+    Search a position as deep as the budget decides it deserves
 
-def analyse_pgn(pgn_text: str) -> List[Dict]:
+    Args:
+        board: Position to search, with the moves leading to it
+        engine: Checked-out engine to search with
+        budget: Budget of the game being analysed
+        previous: Eval of the neighbouring ply analysed before, None for the first one
+        game: Key of the game being analysed, see _search()
+
+    Returns:
+        Result of the deepest search run
+    """
+    fen = board.fen()
+    forced = board.legal_moves.count() <= 1
+    result = None
+    for depth in budget.depths:
+        started = time.perf_counter()
+        deeper = _search(fen, engine, depth=depth, time_limit=budget.search_time(), board=board, game=game)
+        budget.spend(time.perf_counter() - started)
+
+        shallower, result = result, deeper
+        if forced or not budget.needs_deeper(result, shallower, previous):
+            break
+    return result
+
+def iter_analysis(
+    pgn_text: str,
+    *,
+    adaptive: Optional[bool] = None,
+    backward: Optional[bool] = None,
+    cached: bool = True,
+) -> Iterator[Dict]:
+    """
+    Analyze a complete PGN game, yielding each position as soon as it is done
+
+    Book and tablebase positions, then positions found in the evaluation
+    cache, are answered without the engine. On the first miss one engine
+    is checked out of the pool and kept until the generator finishes or is
+    closed, so concurrent games run on separate Stockfish processes.
+
+    The engine sees every position as the game's moves from the start, in
+    one session per game, so its hash table carries over from ply to ply
+    and repetitions are known to the search.
+
+    In adaptive mode positions are searched to ENGINE_MIN_DEPTH and only
+    critical ones go deeper, up to ENGINE_DEPTH, within ENGINE_GAME_TIME
+    seconds for the whole game (see SearchBudget).
+
+    Backward analysis searches the last position first: what the engine
+    learnt about later positions is still in its hash table when it reaches
+    the moves leading to them. Nothing is yielded until the whole game is
+    done, so it suits batch analysis rather than streaming.
+
+    Args:
+        pgn_text: PGN string of the game
+        adaptive: Budget search depth per position (defaults to settings.ENGINE_ADAPTIVE)
+        backward: Analyse from the last position to the first (defaults to settings.ENGINE_BACKWARD)
+        cached: Answer positions from the evaluation cache
+
+    Yields:
+        Analysis result for the initial position and after each move, in game order
+    """
+    try:
+        # Only the mainline is analysed, so skip building the full game tree
+        with timed("pgn_parse"):
+            start, moves, _ = mainline_moves(pgn_text)
+        if not moves:
+            logger.error("Failed to parse PGN")
+            return
+    except Exception as e:
+        logger.error(f"Error analyzing PGN: {e}")
+        return
+
+    if adaptive is None:
+        adaptive = settings.ENGINE_ADAPTIVE
+    if backward is None:
+        backward = settings.ENGINE_BACKWARD
+    budget = None
+    if adaptive:
+        budget = SearchBudget(
+            1 + len(moves),
+            min_depth=settings.ENGINE_MIN_DEPTH,
+            max_depth=settings.ENGINE_DEPTH,
+            game_time=settings.ENGINE_GAME_TIME,
+        )
+    min_depth = budget.min_depth if budget else settings.ENGINE_DEPTH
+
+    cache = get_eval_cache()
+    pool = get_pool()
+    engine = None
+    engine_unavailable = False
+    previous = None
+    game = object()
+
+    def analyse_current(book: bool) -> dict:
+        nonlocal engine, engine_unavailable
+        known = known_result(board, book=book)
+        if known is not None:
+            return known
+
+        fen = board.fen()
+        cached_result = cache.get(fen, min_depth, settings.ENGINE_MULTIPV) if cached else None
+        if cached_result is not None:
+            return cached_result
+
+        if engine is None and not engine_unavailable:
+            try:
+                with timed("engine_checkout"):
+                    engine = pool.checkout()
+            except EnginePoolError as e:
+                logger.error(f"No engine available for analysis: {e}")
+                engine_unavailable = True
+        if engine is None:
+            return _empty_result()
+
+        if budget is None:
+            result = _search(fen, engine, board=board, game=game)
+        else:
+            budget.start_position()
+            result = _budgeted_search(board, engine, budget, previous, game)
+        if not result["lines"]:
+            # Replace the engine if the search failed because it crashed
+            try:
+                engine = pool.recover(engine)
+            except EnginePoolError as e:
+                logger.error(f"Failed to restart engine: {e}")
+                engine = None
+                engine_unavailable = True
+        return result
+
+    def analyse_next(book: bool) -> dict:
+        nonlocal previous
+        result = analyse_current(book)
+        if budget is not None:
+            budget.finish_position()
+        previous = result["eval"] if result["lines"] else None
+        return result
+
+    board = start
+    try:
+        if backward:
+            # Book positions are a prefix of the game, find where it ends first
+            book_plies = 0
+            while book_plies < len(moves) and book_result(board) is not None:
+                board.push(moves[book_plies])
+                book_plies += 1
+            for move in moves[book_plies:]:
+                board.push(move)
+
+            results = [None] * (1 + len(moves))
+            for ply in range(len(moves), -1, -1):
+                results[ply] = analyse_next(ply <= book_plies)
+                if ply:
+                    board.pop()
+            yield from results
+        else:
+            # Once a game leaves the book it is not looked up there again
+            in_book = True
+            result = analyse_next(in_book)
+            yield result
+            for move in moves:
+                in_book = in_book and result.get("source") == "book"
+                board.push(move)
+                result = analyse_next(in_book)
+                yield result
+
+        logger.info(f"Analyzed {1 + len(moves)} positions")
+    finally:
+        if engine is not None:
+            pool.checkin(engine)
+
+def analyse_pgn(
+    pgn_text: str,
+    *,
+    adaptive: Optional[bool] = None,
+    backward: Optional[bool] = None,
+    cached: bool = True,
+) -> List[Dict]:
     """
     Analyze a complete PGN game
-    
+
     Args:
         pgn_text: PGN string of the game
-        
+        adaptive: Budget search depth per position (defaults to settings.ENGINE_ADAPTIVE)
+        backward: Analyse from the last position to the first (defaults to settings.ENGINE_BACKWARD)
+        cached: Answer positions from the evaluation cache
+
     Returns:
         List of analysis results for each position
     """
     try:
-        game = chess.pgn.read_game(io.StringIO(pgn_text))
-        if not game:
-            logger.error("Failed to parse PGN")
-            return []
-            
-        board = game.board()
-        analysis = []
-        
-        # Analyze initial position
-        analysis.append(_analyse_fen(board.fen()))
-        
-        # Analyze after each move
-        try:
-            for move in game.mainline_moves():
-                board.push(move)
-                analysis.append(_analyse_fen(board.fen()))
-        except Exception as move_error:
-            logger.error(f"Error processing moves: {move_error}")
-            # Return what we have so far
-            pass
-            
-        logger.info(f"Analyzed {len(analysis)} positions")
-        return analysis
-        
+        return list(iter_analysis(pgn_text, adaptive=adaptive, backward=backward, cached=cached))
     except Exception as e:
         logger.error(f"Error analyzing PGN: {e}")
         return []
 
+async def aiter_analysis(pgn_text: str, *, buffer: int = 2) -> AsyncIterator[Dict]:
+    """
+    Async iterator over iter_analysis() running in a worker thread
+
+    The engine thread may run at most *buffer* positions ahead of the caller,
+    so it only waits when the caller stops consuming (for example because a
+    WebSocket send is blocked). Leaving the loop early stops the analysis
+    and returns the engine to the pool.
+
+    Args:
+        pgn_text: PGN string of the game
+        buffer: Number of finished positions allowed to queue up
+
+    Yields:
+        Analysis result for each position
+    """
+    loop = asyncio.get_running_loop()
+    results: asyncio.Queue = asyncio.Queue()
+    credits = threading.Semaphore(buffer)
+    cancelled = threading.Event()
+    done = object()
+
+    def deliver(item) -> None:
+        try:
+            loop.call_soon_threadsafe(results.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed, nobody is listening any more
+            cancelled.set()
+
+    def produce() -> None:
+        try:
+            # Streamed positions must arrive in game order as they finish
+            with closing(iter_analysis(pgn_text, backward=False)) as analysis:
+                for result in analysis:
+                    while not credits.acquire(timeout=0.5):
+                        if cancelled.is_set():
+                            return
+                    if cancelled.is_set():
+                        return
+                    deliver(result)
+        except Exception as e:
+            deliver(e)
+        finally:
+            deliver(done)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await results.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            credits.release()
+    finally:
+        cancelled.set()
+        credits.release()
+
 def get_engine_info() -> Dict:
     """
     Get engine information and status
-    
+
     Returns:
-        Dict with engine status and info
+        Dict with engine settings and pool utilization
     """
-    if not ENGINE:
-        return {"status": "error", "message": "Engine not available"}
-    
     try:
         return {
             "status": "ok",
             "name": "Stockfish",
-            "depth": ENGINE.depth,
-            "parameters": ENGINE.parameters
+            "depth": settings.ENGINE_DEPTH,
+            "parameters": {
+                "Threads": settings.ENGINE_THREADS,
+                "MultiPV": settings.ENGINE_MULTIPV
+            },
+            "pool": get_pool().stats()
         }
     except Exception as e:
-        return {"status": "error", "message": str(e)} 
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
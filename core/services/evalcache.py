@@ -0,0 +1,182 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from ..models import PositionEval
+from .metrics import EVAL_CACHE_LOOKUPS, timed
+
+logger = logging.getLogger(__name__)
+
+_cache: Optional["EvalCache"] = None
+_cache_lock = threading.Lock()
+
+def normalize_fen(fen: str) -> str:
+    """
+    Reduce a FEN to the fields that identify the position
+
+    The halfmove clock and fullmove number do not change the evaluation, so
+    the same position reached at different moves shares a cache entry.
+    """
+    return " ".join(fen.split()[:4])
+
+def _copy_result(result: Dict, multipv: int) -> Dict:
+    """Copy a stored result, keeping only the first *multipv* lines"""
+    return {
+        "eval": dict(result["eval"]),
+        "lines": [dict(line) for line in result["lines"][:multipv]],
+    }
+
+def _covers(entry: Optional[tuple], depth: int, multipv: int) -> bool:
+    """Check whether a cached (depth, multipv, ...) entry answers a request"""
+    return entry is not None and entry[0] >= depth and entry[1] >= multipv
+
+class EvalCache:
+    """
+    Two-tier position evaluation cache
+
+    An in-process LRU sits in front of the PositionEval table. Each position
+    keeps only its best result, and a result searched at least as deep with
+    at least as many lines also answers shallower or narrower requests.
+    """
+
+    def __init__(self, *, max_entries: int, max_rows: int, prune_every: int = 1000):
+        """
+        Args:
+            max_entries: Size of the in-process LRU (0 disables it)
+            max_rows: Rows kept in the PositionEval table (0 disables it)
+            prune_every: Number of stores between table size checks
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stores = 0
+
+    def get(self, fen: str, depth: int, multipv: int) -> Optional[Dict]:
+        """
+        Look up an evaluation at least as deep and as wide as requested
+
+        Args:
+            fen: FEN of the position
+            depth: Minimum search depth required
+            multipv: Number of engine lines required
+
+        Returns:
+            Result dict with eval and lines, or None on a miss
+        """
+        key = normalize_fen(fen)
+
+        with timed("cache_lookup"):
+            with self._lock:
+                entry = self._lru.get(key)
+                if entry is not None:
+                    self._lru.move_to_end(key)
+            tier = "memory"
+
+            if not _covers(entry, depth, multipv) and self.max_rows:
+                try:
+                    row = PositionEval.objects.filter(fen=key).first()
+                except DatabaseError as e:
+                    logger.error(f"Error reading evaluation cache: {e}")
+                    row = None
+                if row is not None:
+                    entry = (row.depth, row.multipv, row.result)
+                    self._remember(key, entry)
+                tier = "database"
+
+        if not _covers(entry, depth, multipv):
+            EVAL_CACHE_LOOKUPS.inc("miss")
+            return None
+        EVAL_CACHE_LOOKUPS.inc(f"{tier}_hit")
+        return _copy_result(entry[2], multipv)
+
+    def put(self, fen: str, depth: int, multipv: int, result: Dict) -> None:
+        """
+        Store an evaluation unless a result covering it is already cached
+
+        Args:
+            fen: FEN of the position
+            depth: Search depth of the result
+            multipv: Number of engine lines searched
+            result: Dict with eval and lines
+        """
+        key = normalize_fen(fen)
+        entry = (depth, multipv, _copy_result(result, multipv))
+
+        with self._lock:
+            current = self._lru.get(key)
+        if _covers(current, depth, multipv):
+            return
+
+        self._remember(key, entry)
+        if self.max_rows:
+            self._store(key, entry)
+
+    def clear(self) -> None:
+        """Empty the in-process tier"""
+        with self._lock:
+            self._lru.clear()
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _store(self, key: str, entry: tuple) -> None:
+        depth, multipv, result = entry
+        try:
+            row, created = PositionEval.objects.get_or_create(
+                fen=key,
+                defaults={"depth": depth, "multipv": multipv, "result": result},
+            )
+            if not created and not _covers((row.depth, row.multipv), depth, multipv):
+                row.depth, row.multipv, row.result = depth, multipv, result
+                row.save(update_fields=["depth", "multipv", "result", "updated_at"])
+
+            self._stores += 1
+            if self._stores % self.prune_every == 0:
+                self.prune()
+        except DatabaseError as e:
+            logger.error(f"Error writing evaluation cache: {e}")
+
+    def prune(self) -> int:
+        """
+        Delete the least recently written rows beyond max_rows
+
+        Returns:
+            Number of rows deleted
+        """
+        excess = PositionEval.objects.count() - self.max_rows
+        if excess <= 0:
+            return 0
+        stale = list(
+            PositionEval.objects.order_by("updated_at", "id").values_list("id", flat=True)[:excess]
+        )
+        deleted, _ = PositionEval.objects.filter(id__in=stale).delete()
+        logger.info(f"Pruned {deleted} cached evaluations")
+        return deleted
+
+def get_eval_cache() -> EvalCache:
+    """
+    Get the shared evaluation cache, creating it on first use
+
+    Returns:
+        EvalCache sized by settings.EVAL_CACHE_SIZE and EVAL_CACHE_MAX_ROWS
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EvalCache(
+                max_entries=settings.EVAL_CACHE_SIZE,
+                max_rows=settings.EVAL_CACHE_MAX_ROWS,
+            )
+        return _cache
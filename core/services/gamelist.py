@@ -0,0 +1,255 @@
+import base64
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Case, F, Q, QuerySet, When
+
+from channels.db import database_sync_to_async
+
+from ..models import AnalysisJob, Game
+from ..utils.ids import PGN_ID_LENGTH, is_hash_prefix
+from .chesscom import _games_error, async_player_games
+
+OUTCOMES = ("win", "loss", "draw")
+
+def _parse_date(value: str, name: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a date like 2024-01-31")
+
+def _parse_rating(value: str, name: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+
+def parse_filters(params: Mapping) -> Dict:
+    """
+    Read game list filters from request parameters
+
+    Args:
+        params: GET parameters or decoded JSON body; unknown keys are ignored
+
+    Returns:
+        Dict with the filters that were given: time_class, outcome, since,
+        until, opponent, min_rating and max_rating
+
+    Raises:
+        ValueError: If a filter value is malformed
+    """
+    filters: Dict = {}
+    for key in ("time_class", "opponent"):
+        value = (params.get(key) or "").strip().lower()
+        if value:
+            filters[key] = value
+
+    outcome = (params.get("outcome") or "").strip().lower()
+    if outcome:
+        if outcome not in OUTCOMES:
+            raise ValueError("outcome must be win, loss or draw")
+        filters["outcome"] = outcome
+
+    for key in ("since", "until"):
+        value = (params.get(key) or "").strip()
+        if value:
+            filters[key] = _parse_date(value, key)
+
+    for key in ("min_rating", "max_rating"):
+        value = params.get(key)
+        if value not in (None, ""):
+            filters[key] = _parse_rating(value, key)
+    return filters
+
+def encode_cursor(game: Game) -> str:
+    """Opaque cursor pointing just past *game* in newest-first order"""
+    return base64.urlsafe_b64encode(f"{game.end_time}:{game.pk}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Read the (end_time, id) position back from a cursor
+
+    Raises:
+        ValueError: If the cursor was not made by encode_cursor()
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        end_time, pk = raw.split(":")
+        return int(end_time), int(pk)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _day_start(day: date) -> int:
+    return int(datetime.combine(day, time.min, tzinfo=dt_timezone.utc).timestamp())
+
+def filter_games(username: str, filters: Optional[Dict] = None) -> QuerySet:
+    """
+    Build the query for a player's stored games matching *filters*
+
+    Outcome, opponent and rating filters are from the player's point of view:
+    the rating range applies to the opponent's rating.
+
+    Args:
+        username: Chess.com username, lowercase
+        filters: Filters as returned by parse_filters()
+
+    Returns:
+        Game queryset, newest first
+    """
+    filters = filters or {}
+    games = Game.objects.filter(player_id=username)
+
+    if "time_class" in filters:
+        games = games.filter(time_class=filters["time_class"])
+    if "since" in filters:
+        games = games.filter(end_time__gte=_day_start(filters["since"]))
+    if "until" in filters:
+        games = games.filter(end_time__lt=_day_start(filters["until"] + timedelta(days=1)))
+
+    # Usernames in games keep Chess.com's capitalisation
+    user_white = Q(white_username__iexact=username)
+    if "opponent" in filters:
+        opponent = filters["opponent"]
+        games = games.filter(
+            (user_white & Q(black_username__iexact=opponent))
+            | (~user_white & Q(white_username__iexact=opponent))
+        )
+
+    if "outcome" in filters:
+        draw = Q(white_result=F("black_result"))
+        white_won = Q(white_result="win")
+        if filters["outcome"] == "draw":
+            games = games.filter(draw)
+        elif filters["outcome"] == "win":
+            games = games.filter(~draw & ((user_white & white_won) | (~user_white & ~white_won)))
+        else:
+            games = games.filter(~draw & ((user_white & ~white_won) | (~user_white & white_won)))
+
+    if "min_rating" in filters or "max_rating" in filters:
+        games = games.annotate(opponent_rating=Case(
+            When(user_white, then=F("black_rating")),
+            default=F("white_rating"),
+        ))
+        if "min_rating" in filters:
+            games = games.filter(opponent_rating__gte=filters["min_rating"])
+        if "max_rating" in filters:
+            games = games.filter(opponent_rating__lte=filters["max_rating"])
+
+    return games.order_by("-end_time", "-id")
+
+def query_games(
+    username: str,
+    *,
+    filters: Optional[Dict] = None,
+    after: Optional[Tuple[int, int]] = None,
+    limit: int,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Read one page of a player's stored games
+
+    Pages are keyed on (end_time, id) rather than offsets, so each page is an
+    indexed range scan and games synced meanwhile do not shift later pages.
+
+    Args:
+        username: Chess.com username, lowercase
+        filters: Filters as returned by parse_filters()
+        after: Position decoded from the previous page's cursor
+        limit: Maximum number of games on the page
+
+    Returns:
+        Tuple of (raw game dicts newest first, cursor for the next page or None)
+    """
+    games = filter_games(username, filters)
+    if after is not None:
+        end_time, pk = after
+        games = games.filter(Q(end_time__lt=end_time) | Q(end_time=end_time, id__lt=pk))
+
+    page = list(games[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return [game.as_raw() for game in page[:limit]], next_cursor
+
+def _games_before(username: str, after: Optional[Tuple[int, int]]) -> int:
+    """Number of stored games on earlier pages, whatever the filters"""
+    if after is None:
+        return 0
+    end_time, pk = after
+    return Game.objects.filter(player_id=username).filter(
+        Q(end_time__gt=end_time) | Q(end_time=end_time, id__gte=pk)
+    ).count()
+
+def find_pgn(pgn_id: str) -> Optional[str]:
+    """
+    Look up the PGN behind a game ID
+
+    Stored games are searched first, then games only known from an analysis
+    job, such as those analysed from PGN files.
+
+    Args:
+        pgn_id: Short ID from core.utils.ids.pgn_id(), or a full PGN hash
+
+    Returns:
+        PGN text, or None if no stored game has this ID
+    """
+    if not is_hash_prefix(pgn_id):
+        return None
+    pgn_text = Game.objects.filter(pgn_id=pgn_id).values_list("pgn", flat=True).first()
+    if pgn_text is None:
+        jobs = AnalysisJob.objects.all()
+        if len(pgn_id) == PGN_ID_LENGTH:
+            jobs = jobs.filter(pgn_hash__startswith=pgn_id)
+        else:
+            jobs = jobs.filter(pgn_hash=pgn_id)
+        pgn_text = jobs.values_list("pgn", flat=True).first()
+    return pgn_text
+
+def page_size(limit: Optional[int]) -> int:
+    """Requested page size, defaulting to and capped by the settings"""
+    if limit is None:
+        return settings.GAMES_PAGE_SIZE
+    return max(1, min(int(limit), settings.GAMES_MAX_PAGE_SIZE))
+
+async def apage_games(
+    username: str,
+    *,
+    filters: Optional[Dict] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch one page of a player's games, filtered on the server
+
+    Only as many months as the page needs are synced from Chess.com. When a
+    filtered page runs short the rest of the history is synced before the
+    page is read again, so filters see every game.
+
+    Args:
+        username: Chess.com username
+        filters: Filters as returned by parse_filters()
+        cursor: next_cursor of the previous page, None for the first page
+        limit: Page size, see page_size()
+
+    Returns:
+        Tuple of (raw game dicts newest first, cursor for the next page or None)
+
+    Raises:
+        ValueError: For an invalid cursor or a failed fetch
+    """
+    username = username.strip().lower()
+    after = decode_cursor(cursor) if cursor else None
+    limit = page_size(limit)
+
+    try:
+        seen = await database_sync_to_async(_games_before)(username, after)
+        await async_player_games(username, min_games=seen + limit)
+        games, next_cursor = await database_sync_to_async(query_games)(
+            username, filters=filters, after=after, limit=limit
+        )
+        if filters and next_cursor is None:
+            if await async_player_games(username):
+                games, next_cursor = await database_sync_to_async(query_games)(
+                    username, filters=filters, after=after, limit=limit
+                )
+        return games, next_cursor
+    except Exception as e:
+        raise _games_error(username, e)
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import AnalysisJob
+from ..utils.accuracy import game_stats
+from ..utils.ids import pgn_hash
+from ..utils.pgn import mainline_moves
+from .engine import aiter_analysis, analysis_depth
+from .report import record_accuracy
+from .snapshots import store_snapshot
+
+logger = logging.getLogger(__name__)
+
+def job_key(pgn_text: str) -> Tuple[str, int, int]:
+    """Identify an analysis by PGN hash and the engine settings it runs with, see analysis_depth()"""
+    return pgn_hash(pgn_text), analysis_depth(), settings.ENGINE_MULTIPV
+
+def analysis_group(game_id: str) -> str:
+    """Channel layer group of the clients following a game's analysis"""
+    return f"analysis_{game_id}"
+
+class AnalysisRun:
+    """An analysis running in this process and the groups following it"""
+
+    def __init__(self, key: Tuple[str, int, int], pgn_text: str, *, leased: bool = False):
+        self.key = key
+        self.pgn_text = pgn_text
+        self.results: List[Dict] = []
+        self.groups = set()
+        self.ready = asyncio.Event()  # set once stored progress has been loaded
+        self.complete = False
+        self.task: Optional[asyncio.Task] = None
+        # Runs claimed by an analysis worker store every ply, which is how
+        # web processes see their progress, and renew the job's lease as they go
+        self.leased = leased
+        self.save_every = 1 if leased else settings.ANALYSIS_SAVE_EVERY
+
+# Analyses currently running in this process, by job key
+_runs: Dict[Tuple[str, int, int], AnalysisRun] = {}
+
+def running_jobs() -> int:
+    """Number of analyses running in this process"""
+    return len(_runs)
+
+def _load_job(key: Tuple[str, int, int]) -> Optional[AnalysisJob]:
+    pgn_hash_, depth, multipv = key
+    return AnalysisJob.objects.filter(pgn_hash=pgn_hash_, depth=depth, multipv=multipv).first()
+
+def _store(
+    key: Tuple[str, int, int],
+    pgn_text: str,
+    status: str,
+    results: List[Dict],
+    lease_until: Optional[datetime] = None,
+) -> None:
+    pgn_hash_, depth, multipv = key
+    AnalysisJob.objects.update_or_create(
+        pgn_hash=pgn_hash_,
+        depth=depth,
+        multipv=multipv,
+        defaults={"pgn": pgn_text, "status": status, "results": results, "lease_until": lease_until},
+    )
+    if status == AnalysisJob.COMPLETE:
+        try:
+            record_accuracy(pgn_hash_, results)
+        except Exception as e:
+            logger.error(f"Error recording accuracy for {pgn_hash_[:12]}: {e}")
+        try:
+            store_snapshot(key, results)
+        except Exception as e:
+            logger.error(f"Error storing analysis snapshot for {pgn_hash_[:12]}: {e}")
+
+def _analysed(result: Dict) -> bool:
+    # Failed searches (no engine, a crash, a pool timeout) leave a zero eval without lines
+    return bool(result.get("lines")) or result.get("source") in ("book", "tablebase")
+
+def _progress(results: List[Dict]) -> List[Dict]:
+    """The leading plies of stored results that hold a real result, to resume after"""
+    done = 0
+    while done < len(results) and _analysed(results[done]):
+        done += 1
+    return list(results[:done])
+
+def _ends_without_moves(pgn_text: str, plies: int) -> bool:
+    # The final position of a mate or stalemate has no line for the engine to give
+    try:
+        board, moves, _ = mainline_moves(pgn_text)
+    except ValueError:
+        return False
+    if plies != 1 + len(moves):
+        return False
+    for move in moves:
+        board.push(move)
+    return not any(board.generate_legal_moves())
+
+def _final_status(pgn_text: str, results: List[Dict]) -> str:
+    """
+    COMPLETE only if every ply has a real result, otherwise FAILED
+
+    An engine crash or pool timeout part-way leaves placeholder plies, and
+    the game must stay open to be analysed again rather than be stored as
+    finished.
+    """
+    if results and all(_analysed(result) for result in results[:-1]):
+        if _analysed(results[-1]) or _ends_without_moves(pgn_text, len(results)):
+            return AnalysisJob.COMPLETE
+    return AnalysisJob.FAILED
+
+def _save_job(run: AnalysisRun, status: str) -> None:
+    lease_until = None
+    if run.leased and status == AnalysisJob.RUNNING:
+        lease_until = timezone.now() + timedelta(seconds=settings.ANALYSIS_LEASE)
+    _store(run.key, run.pgn_text, status, run.results, lease_until)
+
+def _claim(key: Tuple[str, int, int], pgn_text: str) -> Optional[AnalysisJob]:
+    """
+    Take the lease of an unfinished job so that only one worker runs it
+
+    Returns:
+        The job with its stored progress, or None if it is complete or
+        another worker holds an unexpired lease
+    """
+    pgn_hash_, depth, multipv = key
+    job, _ = AnalysisJob.objects.get_or_create(
+        pgn_hash=pgn_hash_, depth=depth, multipv=multipv, defaults={"pgn": pgn_text}
+    )
+    now = timezone.now()
+    claimed = (
+        AnalysisJob.objects.filter(pk=job.pk)
+        .exclude(status=AnalysisJob.COMPLETE)
+        .filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now))
+        .update(lease_until=now + timedelta(seconds=settings.ANALYSIS_LEASE))
+    )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+def _renew_lease(key: Tuple[str, int, int]) -> None:
+    pgn_hash_, depth, multipv = key
+    AnalysisJob.objects.filter(
+        pgn_hash=pgn_hash_, depth=depth, multipv=multipv, status=AnalysisJob.RUNNING
+    ).update(lease_until=timezone.now() + timedelta(seconds=settings.ANALYSIS_LEASE))
+
+def expired_jobs(limit: int) -> List[str]:
+    """
+    Find unfinished jobs at the current settings whose worker stopped renewing the lease
+
+    Args:
+        limit: Most jobs to return
+
+    Returns:
+        PGN text of each job, oldest lease first
+    """
+    return list(
+        AnalysisJob.objects.filter(
+            status=AnalysisJob.RUNNING,
+            depth=analysis_depth(),
+            multipv=settings.ENGINE_MULTIPV,
+            lease_until__lt=timezone.now(),
+        ).order_by("lease_until").values_list("pgn", flat=True)[:limit]
+    )
+
+def save_results(pgn_text: str, results: List[Dict]) -> bool:
+    """
+    Store a full-game analysis computed outside a websocket job
+
+    Args:
+        pgn_text: PGN string of the game
+        results: One analysis result per ply, empty if the analysis failed
+
+    Returns:
+        True if the analysis was stored as complete
+    """
+    status = _final_status(pgn_text, results)
+    _store(job_key(pgn_text), pgn_text, status, results)
+    return status == AnalysisJob.COMPLETE
+
+def completed_hashes(hashes: Iterable[str]) -> Set[str]:
+    """
+    Find which PGN hashes already have a complete analysis at the current settings
+
+    Args:
+        hashes: PGN hashes to check
+
+    Returns:
+        Subset of *hashes* with a stored complete job
+    """
+    return set(
+        AnalysisJob.objects.filter(
+            pgn_hash__in=list(hashes),
+            depth=analysis_depth(),
+            multipv=settings.ENGINE_MULTIPV,
+            status=AnalysisJob.COMPLETE,
+        ).values_list("pgn_hash", flat=True)
+    )
+
+def analysis_message(ply: int, data: Dict) -> Dict:
+    """Build the client message for one analysed ply"""
+    return {
+        "type": "analysis",
+        "ply": ply,
+        "eval": data.get("eval", {}),
+        "lines": data.get("lines", []),
+        "source": data.get("source", "engine")
+    }
+
+def complete_message(results: List[Dict], stats: Optional[Dict] = None) -> Dict:
+    """Build the client message for a finished analysis, with the game's accuracy stats"""
+    return {
+        "type": "complete",
+        "message": f"Analysis complete - {len(results)} positions analyzed",
+        "stats": stats if stats is not None else game_stats(results),
+    }
+
+async def subscribe(pgn_text: str, group: str) -> Tuple[List[Dict], bool]:
+    """
+    Follow the analysis of a PGN, starting it unless it is running or done
+
+    Plies finished after this call are sent to *group* as
+    "analysis.message" events; plies finished before it are returned.
+    A job interrupted part-way (e.g. by a restart) resumes from its stored
+    progress instead of starting over.
+
+    Args:
+        pgn_text: PGN string of the game
+        group: Channel layer group to notify
+
+    Returns:
+        Tuple of (results so far, whether the analysis is complete)
+    """
+    key = job_key(pgn_text)
+
+    if settings.ANALYSIS_WORKERS:
+        return await _request_analysis(key, pgn_text, group)
+
+    run = _runs.get(key)
+    if run is not None:
+        await run.ready.wait()
+        if run.complete:
+            return list(run.results), True
+        run.groups.add(group)
+        return list(run.results), False
+
+    # Register before touching the database so concurrent requests join this run
+    run = AnalysisRun(key, pgn_text)
+    run.groups.add(group)
+    _runs[key] = run
+    try:
+        job = await database_sync_to_async(_load_job)(key)
+    except Exception:
+        _runs.pop(key, None)
+        run.ready.set()
+        raise
+
+    if job is not None and job.status == AnalysisJob.COMPLETE:
+        _runs.pop(key, None)
+        run.ready.set()
+        return list(job.results), True
+
+    # A failed job starts over, its placeholder plies are not progress
+    if job is not None and job.status == AnalysisJob.RUNNING:
+        run.results = _progress(job.results)
+    run.ready.set()
+    run.task = asyncio.create_task(_run(run))
+    logger.info(f"Started analysis job {key[0][:12]} from ply {len(run.results)}")
+    return list(run.results), False
+
+async def _request_analysis(key: Tuple[str, int, int], pgn_text: str, group: str) -> Tuple[List[Dict], bool]:
+    """
+    Hand an analysis to the worker processes, see subscribe()
+
+    Workers store every ply before publishing it to *group*, and the caller
+    joined the group before asking, so stored plies plus later messages
+    cover the whole game.
+    """
+    job = await database_sync_to_async(_load_job)(key)
+    if job is not None and job.status == AnalysisJob.COMPLETE:
+        return list(job.results), True
+
+    # Sent even if a worker already runs the job: its lease makes the others ignore it
+    await get_channel_layer().send(settings.ANALYSIS_WORKER_CHANNEL, {
+        "type": "analysis.start",
+        "pgn": pgn_text,
+        "group": group,
+    })
+    if job is None or job.status != AnalysisJob.RUNNING:
+        return [], False
+    return _progress(job.results), False
+
+async def run_claimed(pgn_text: str, group: str) -> bool:
+    """
+    Run an analysis requested on the worker channel, publishing to *group*
+
+    Args:
+        pgn_text: PGN string of the game
+        group: Channel layer group of the clients following the game
+
+    Returns:
+        True if this worker ran the analysis, False if it was complete or
+        running elsewhere
+    """
+    key = job_key(pgn_text)
+    job = await database_sync_to_async(_claim)(key, pgn_text)
+    if job is None:
+        return False
+
+    run = AnalysisRun(key, pgn_text, leased=True)
+    if job.status == AnalysisJob.RUNNING:
+        run.results = _progress(job.results)
+    run.groups.add(group)
+    run.ready.set()
+    logger.info(f"Worker started analysis job {key[0][:12]} from ply {len(run.results)}")
+    await _run(run)
+    return True
+
+async def _broadcast(run: AnalysisRun, message: Dict) -> None:
+    channel_layer = get_channel_layer()
+    for group in list(run.groups):
+        await channel_layer.group_send(group, {"type": "analysis.message", "message": message})
+
+async def _run(run: AnalysisRun) -> None:
+    """Analyse the game, publishing and periodically storing each new ply"""
+    try:
+        ply = 0
+        renewed = time.monotonic()
+        async for data in aiter_analysis(run.pgn_text):
+            # Plies restored from stored progress come back from the eval cache
+            if ply >= len(run.results):
+                run.results.append(data)
+                # Store before publishing, a client joining in between finds the ply stored
+                if len(run.results) % run.save_every == 0:
+                    await database_sync_to_async(_save_job)(run, AnalysisJob.RUNNING)
+                await _broadcast(run, analysis_message(ply, data))
+            elif run.leased and time.monotonic() - renewed > settings.ANALYSIS_LEASE / 3:
+                # Replayed plies are not stored, keep the lease while they run
+                await database_sync_to_async(_renew_lease)(run.key)
+                renewed = time.monotonic()
+            ply += 1
+
+        status = _final_status(run.pgn_text, run.results)
+        await database_sync_to_async(_save_job)(run, status)
+
+        # From here on new subscribers get the results directly, while the
+        # groups already following the run get the final message
+        run.complete = True
+        _runs.pop(run.key, None)
+        if status == AnalysisJob.COMPLETE:
+            await _broadcast(run, complete_message(run.results))
+        else:
+            await _broadcast(run, {"type": "error", "message": "Failed to analyze game"})
+    except Exception as e:
+        logger.error(f"Error in analysis job {run.key[0][:12]}: {e}")
+        await _broadcast(run, {"type": "error", "message": f"Analysis error: {str(e)}"})
+    finally:
+        _runs.pop(run.key, None)
@@ -0,0 +1,140 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stages of serving an analysis, as timed by timed()
+STAGES = (
+    "pgn_parse",
+    "engine_checkout",
+    "engine_search",
+    "cache_lookup",
+    "chesscom_fetch",
+    "transform",
+    "websocket_send",
+)
+
+# Upper bounds in seconds, from cache hits to deep searches and slow archive downloads
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with one label, in the Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str) -> float:
+        with self._lock:
+            return self._values.get(label_value, 0)
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f'{self.name}{{{self.label}="{_escape(key)}"}} {_number(value)}' for key, value in values]
+        return lines
+
+class Histogram:
+    """Cumulative histogram with one label, in the Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        # label value -> (count per bucket plus overflow, sum)
+        self._series: Dict[str, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(label_value) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._series[label_value] = (counts, total + value)
+
+    def count(self, label_value: str) -> int:
+        with self._lock:
+            series = self._series.get(label_value)
+            return sum(series[0]) if series else 0
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in series:
+            label = f'{self.label}="{_escape(key)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{_number(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_number(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "chess_analysis_stage_seconds", "Time spent in each stage of serving an analysis", "stage", STAGE_BUCKETS
+)
+EVAL_CACHE_LOOKUPS = Counter(
+    "chess_analysis_eval_cache_lookups_total", "Evaluation cache lookups by outcome", "result"
+)
+
+def observe(stage: str, seconds: float) -> None:
+    """Record how long one run of a stage took"""
+    STAGE_SECONDS.observe(stage, seconds)
+    logger.debug(f"{stage} took {seconds * 1000:.2f}ms", extra={"stage": stage, "seconds": seconds})
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as one run of a stage
+
+    Works around awaits too, so it also times async code. The block is
+    recorded even if it raises.
+
+    Args:
+        stage: One of STAGES
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+def render(gauges: Dict[str, Tuple[str, float]]) -> str:
+    """
+    Every metric in the Prometheus text exposition format
+
+    Counters and histograms cover this process since it started. Gauges are
+    read by the caller at scrape time.
+
+    Args:
+        gauges: Metric name -> (help text, current value)
+
+    Returns:
+        Text for a /metrics response
+    """
+    lines = STAGE_SECONDS.lines() + EVAL_CACHE_LOOKUPS.lines()
+    for name, (help_text, value) in sorted(gauges.items()):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,280 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import chess
+import chess.polyglot
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from ..models import Game, OpeningMove, OpeningNode, Player
+from ..utils.pgn import mainline_moves
+from .report import _is_white, _outcome
+
+logger = logging.getLogger(__name__)
+
+# Deepest subtree returned in one request
+MAX_TREE_DEPTH = 4
+
+_RESULT_FIELDS = {"Win": "wins", "Draw": "draws", "Loss": "losses"}
+_COUNT_FIELDS = ("games", "wins", "draws", "losses")
+
+NodeKey = Tuple[str, int]  # (colour, position key)
+MoveKey = Tuple[str, int, str]  # (colour, parent key, uci)
+
+def position_key(board: chess.Board) -> int:
+    """Zobrist hash of a position as a signed 64-bit integer for BigIntegerField"""
+    key = chess.polyglot.zobrist_hash(board)
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+def opening_moves(pgn_text: str, plies: int) -> Tuple[chess.Board, List[chess.Move]]:
+    """The starting position and first *plies* mainline moves of a PGN"""
+    board, moves, _ = mainline_moves(pgn_text)
+    return board, moves[:plies]
+
+class TreeCounts:
+    """Node and move counts collected from games before they are written"""
+
+    def __init__(self):
+        self.nodes: Dict[NodeKey, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(_COUNT_FIELDS, 0))
+        self.moves: Dict[MoveKey, Dict] = {}
+
+    def add_game(self, game: Game, plies: int) -> None:
+        """Count the positions and moves of one game's opening"""
+        if game.rules != "chess":
+            return  # variants have their own trees of positions
+        colour = "white" if _is_white(game) else "black"
+        result = _RESULT_FIELDS[_outcome(game)]
+        try:
+            board, moves = opening_moves(game.pgn, plies)
+            root = position_key(board)
+            path = []
+            for move in moves:
+                san = board.san(move)
+                board.push(move)
+                path.append((move.uci(), san, position_key(board)))
+        except Exception as e:
+            logger.error(f"Error reading opening of {game.url}: {e}")
+            return
+
+        self._count(self.nodes[(colour, root)], result)
+        key = root
+        for uci, san, child in path:
+            edge = self.moves.setdefault(
+                (colour, key, uci),
+                {"child": child, "san": san, **dict.fromkeys(_COUNT_FIELDS, 0)},
+            )
+            self._count(edge, result)
+            self._count(self.nodes[(colour, child)], result)
+            key = child
+
+    @staticmethod
+    def _count(counts: Dict, result: str) -> None:
+        counts["games"] += 1
+        counts[result] += 1
+
+def _in_chunks(queryset, field: str, values: Iterable, size: int = 500) -> List:
+    """Rows of *queryset* whose *field* is in *values*, keeping each IN clause small"""
+    values = list(values)
+    rows = []
+    for start in range(0, len(values), size):
+        rows.extend(queryset.filter(**{f"{field}__in": values[start:start + size]}))
+    return rows
+
+def _add_counts(model, ids: Dict, counts: Dict) -> None:
+    """
+    Add counts to stored rows with F() updates, so concurrent syncs add up instead of overwriting
+
+    Rows getting the same increments (most of them, one game each) share an
+    UPDATE.
+    """
+    by_increment = defaultdict(list)
+    for key, c in counts.items():
+        by_increment[tuple(c[field] for field in _COUNT_FIELDS)].append(ids[key])
+    for increment, pks in by_increment.items():
+        changes = {field: F(field) + value for field, value in zip(_COUNT_FIELDS, increment) if value}
+        for start in range(0, len(pks), 500):
+            model.objects.filter(pk__in=pks[start:start + 500]).update(**changes)
+
+def _merge(username: str, counts: TreeCounts, *, fresh: bool = False) -> None:
+    """
+    Add collected counts to a player's stored tree
+
+    Args:
+        username: Player the counts belong to
+        counts: Counts to add
+        fresh: The player has no stored tree rows, so the counts are written as they are
+    """
+    with transaction.atomic():
+        for colour in ("white", "black"):
+            node_counts = {key: c for (col, key), c in counts.nodes.items() if col == colour}
+            move_counts = {(parent, uci): c for (col, parent, uci), c in counts.moves.items() if col == colour}
+            if fresh:
+                OpeningNode.objects.bulk_create([
+                    OpeningNode(player_id=username, colour=colour, key=key, **c)
+                    for key, c in node_counts.items()
+                ], batch_size=500)
+                OpeningMove.objects.bulk_create([
+                    OpeningMove(player_id=username, colour=colour, parent=parent, uci=uci, **c)
+                    for (parent, uci), c in move_counts.items()
+                ], batch_size=500)
+                continue
+
+            # Create missing rows empty, then add to every row in the database
+            OpeningNode.objects.bulk_create([
+                OpeningNode(player_id=username, colour=colour, key=key) for key in node_counts
+            ], batch_size=500, ignore_conflicts=True)
+            node_ids = {
+                node.key: node.pk for node in _in_chunks(
+                    OpeningNode.objects.filter(player_id=username, colour=colour).only("pk", "key"),
+                    "key", node_counts,
+                )
+            }
+            _add_counts(OpeningNode, node_ids, node_counts)
+
+            OpeningMove.objects.bulk_create([
+                OpeningMove(player_id=username, colour=colour, parent=parent, uci=uci, child=c["child"], san=c["san"])
+                for (parent, uci), c in move_counts.items()
+            ], batch_size=500, ignore_conflicts=True)
+            move_ids = {
+                (move.parent, move.uci): move.pk for move in _in_chunks(
+                    OpeningMove.objects.filter(player_id=username, colour=colour).only("pk", "parent", "uci"),
+                    "parent", {parent for parent, _ in move_counts},
+                ) if (move.parent, move.uci) in move_counts
+            }
+            _add_counts(OpeningMove, move_ids, move_counts)
+
+def add_games_to_tree(player: Player, games: List[Game]) -> None:
+    """
+    Add newly stored games to the player's opening tree
+
+    Like the report, nothing is done until the tree has been built once.
+
+    Args:
+        player: Player the games were stored for
+        games: Games just inserted, not yet counted
+    """
+    if not games:
+        return
+    if not Player.objects.filter(username=player.username, tree_built=True).exists():
+        return
+    counts = TreeCounts()
+    for game in games:
+        counts.add_game(game, settings.OPENING_TREE_PLIES)
+    _merge(player.username, counts)
+
+def rebuild_tree(username: str) -> None:
+    """Rebuild a player's opening tree from every stored game"""
+    counts = TreeCounts()
+    games = Game.objects.filter(player_id=username).only(
+        "player", "url", "pgn", "rules", "white_username", "white_result", "black_username", "black_result"
+    )
+    for game in games.iterator(chunk_size=2000):
+        counts.add_game(game, settings.OPENING_TREE_PLIES)
+
+    with transaction.atomic():
+        OpeningNode.objects.filter(player_id=username).delete()
+        OpeningMove.objects.filter(player_id=username).delete()
+        _merge(username, counts, fresh=True)
+        Player.objects.filter(username=username).update(tree_built=True)
+    logger.info(f"Built opening tree for {username}: {len(counts.nodes)} positions, {len(counts.moves)} moves")
+
+def _stats(games: int, wins: int, draws: int, losses: int) -> Dict:
+    return {
+        "games": games,
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "score": round(100 * (wins + draws / 2) / games, 1) if games else None,
+    }
+
+def _sum_rows(rows: Iterable) -> Dict[str, int]:
+    totals = dict.fromkeys(_COUNT_FIELDS, 0)
+    for row in rows:
+        for field in _COUNT_FIELDS:
+            totals[field] += getattr(row, field)
+    return totals
+
+def _board_from(fen: Optional[str], moves: Sequence[str]) -> chess.Board:
+    try:
+        board = chess.Board(fen) if fen else chess.Board()
+        for uci in moves:
+            board.push_uci(uci)
+    except ValueError as e:
+        raise ValueError(f"Invalid position: {e}")
+    return board
+
+def opening_tree(
+    username: str,
+    *,
+    fen: Optional[str] = None,
+    moves: Sequence[str] = (),
+    colour: Optional[str] = None,
+    depth: int = 1,
+) -> Optional[Dict]:
+    """
+    Read the subtree of a player's openings below a position
+
+    Every level costs one indexed query, whatever the number of games.
+    Transpositions are merged: a position's counts cover every move order
+    that reached it.
+
+    Args:
+        username: Chess.com username
+        fen: Position to start from (default: the initial position)
+        moves: UCI moves played from *fen* to reach the position
+        colour: "white" or "black" for games with that colour only, None for both
+        depth: Levels of moves to return below the position, at most MAX_TREE_DEPTH
+
+    Returns:
+        Dict with "fen", the position's counts and "moves", each move with
+        its counts and, below depth 1, its own "moves"; None for an unknown player
+
+    Raises:
+        ValueError: For an invalid position, move or colour
+    """
+    username = username.strip().lower()
+    if colour not in (None, "white", "black"):
+        raise ValueError("colour must be white or black")
+    board = _board_from(fen, moves)
+    depth = max(1, min(depth, MAX_TREE_DEPTH))
+
+    player = Player.objects.filter(username=username).first()
+    if player is None:
+        return None
+    if not player.tree_built:
+        rebuild_tree(username)
+
+    colours = [colour] if colour else ["white", "black"]
+    key = position_key(board)
+    node = _sum_rows(OpeningNode.objects.filter(player_id=username, colour__in=colours, key=key))
+    tree = {"fen": board.fen(), **_stats(**node), "moves": []}
+
+    # Walk down level by level, one query for all positions of a level. A
+    # position reached by two move orders shares its moves in both places.
+    level: Dict[int, List[Dict]] = {key: [tree]}
+    for _ in range(depth):
+        rows = _in_chunks(OpeningMove.objects.filter(player_id=username, colour__in=colours), "parent", level)
+        grouped: Dict[Tuple[int, str], List[OpeningMove]] = defaultdict(list)
+        for row in rows:
+            grouped[(row.parent, row.uci)].append(row)
+
+        next_level: Dict[int, List[Dict]] = defaultdict(list)
+        for (parent, uci), same_move in grouped.items():
+            entry = {
+                "uci": uci,
+                "san": same_move[0].san,
+                **_stats(**_sum_rows(same_move)),
+                "moves": [],
+            }
+            for parent_entry in level[parent]:
+                parent_entry["moves"].append(entry)
+            next_level[same_move[0].child].append(entry)
+        for entries in level.values():
+            for entry in entries:
+                entry["moves"].sort(key=lambda move: (-move["games"], move["san"]))
+        level = next_level
+        if not level:
+            break
+    return tree
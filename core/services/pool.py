@@ -0,0 +1,205 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EnginePoolError(Exception):
+    """Raised when an engine cannot be checked out of the pool"""
+
+
+class EnginePoolTimeout(EnginePoolError):
+    """Raised when no engine became free within the checkout timeout"""
+
+
+class EnginePool:
+    """
+    Bounded pool of engine processes with checkout/checkin semantics
+
+    Engines are started lazily, so importing the pool never spawns a process.
+    Idle engines are health-checked before being handed out and dead ones are
+    replaced with a fresh process, which is how crashed workers get restarted.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        size: int,
+        is_alive: Callable[[Any], bool],
+        close: Callable[[Any], None],
+        checkout_timeout: Optional[float] = 30.0,
+    ):
+        """
+        Args:
+            factory: Callable starting and returning a new engine
+            size: Maximum number of engines alive at the same time
+            is_alive: Health check returning False for a crashed engine
+            close: Callable shutting an engine down
+            checkout_timeout: Default seconds to wait for a free engine
+        """
+        if size < 1:
+            raise ValueError("Engine pool size must be at least 1")
+
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self._factory = factory
+        self._is_alive = is_alive
+        self._close = close
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()  # reuse warm engines first
+        self._lock = threading.Lock()
+        self._alive = 0
+        self._in_use = 0
+        self._restarts = 0
+        self._waiting = 0
+
+    def checkout(self, timeout: Optional[float] = None) -> Any:
+        """
+        Take an engine out of the pool, starting one if none is idle
+
+        Args:
+            timeout: Seconds to wait for a free slot (defaults to checkout_timeout)
+
+        Returns:
+            A healthy engine owned by the caller until checkin()
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise EnginePoolTimeout(f"No engine available after {timeout}s")
+
+        try:
+            engine = self._take_idle()
+            if engine is None:
+                engine = self._start()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        return engine
+
+    def checkin(self, engine: Any, *, discard: bool = False) -> None:
+        """
+        Return an engine to the pool
+
+        Args:
+            engine: Engine previously obtained from checkout()
+            discard: Shut the engine down instead of keeping it idle
+        """
+        with self._lock:
+            self._in_use -= 1
+
+        if discard:
+            self._stop(engine)
+        else:
+            self._idle.put(engine)
+        self._slots.release()
+
+    def recover(self, engine: Any) -> Any:
+        """
+        Return *engine* if it still responds, otherwise a freshly started one
+
+        A dead engine is checked in (and discarded) before a replacement is
+        checked out, so if the restart fails with EnginePoolError the caller
+        no longer owns any engine.
+        """
+        if self._healthy(engine):
+            return engine
+
+        logger.warning("Engine stopped responding, restarting it")
+        self.checkin(engine, discard=True)
+        with self._lock:
+            self._restarts += 1
+        return self.checkout()
+
+    @contextmanager
+    def engine(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Check out an engine for the duration of a with-block"""
+        engine = self.checkout(timeout)
+        try:
+            yield engine
+        except Exception:
+            self.checkin(engine, discard=not self._healthy(engine))
+            raise
+        else:
+            self.checkin(engine)
+
+    def stats(self) -> Dict:
+        """
+        Get pool utilization counters
+
+        Returns:
+            Dict with size, alive, in_use, idle, restarts and waiting
+            (callers blocked until an engine is free)
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "alive": self._alive,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "restarts": self._restarts,
+                "waiting": self._waiting,
+            }
+
+    def close(self) -> None:
+        """Shut down every idle engine"""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._stop(engine)
+
+    def _take_idle(self) -> Optional[Any]:
+        """Pop idle engines until a healthy one is found"""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+
+            if self._healthy(engine):
+                return engine
+
+            logger.warning("Discarding crashed idle engine")
+            self._stop(engine)
+            with self._lock:
+                self._restarts += 1
+
+    def _healthy(self, engine: Any) -> bool:
+        try:
+            return bool(self._is_alive(engine))
+        except Exception:
+            return False
+
+    def _start(self) -> Any:
+        try:
+            engine = self._factory()
+        except Exception as e:
+            raise EnginePoolError(f"Failed to start engine: {e}") from e
+
+        with self._lock:
+            self._alive += 1
+        logger.info("Started engine process")
+        return engine
+
+    def _stop(self, engine: Any) -> None:
+        with self._lock:
+            self._alive -= 1
+        try:
+            self._close(engine)
+        except Exception as e:
+            logger.error(f"Error shutting down engine: {e}")
@@ -0,0 +1,189 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F
+
+from ..models import Game, Player, ReportBucket
+from ..utils.accuracy import player_stats
+from ..utils.ids import PGN_ID_LENGTH
+from ..utils.outcomes import calculate_outcome
+
+logger = logging.getLogger(__name__)
+
+# Openings listed in a report, most played first
+REPORT_OPENINGS = 10
+
+_OUTCOME_FIELDS = {"Win": "wins", "Draw": "draws", "Loss": "losses"}
+
+Increments = Dict[Tuple[str, str], Dict[str, float]]
+
+def _is_white(game: Game) -> bool:
+    return game.white_username.lower() == game.player_id
+
+def _outcome(game: Game) -> str:
+    """Outcome from the player's point of view without loading the PGN"""
+    return calculate_outcome({
+        "white": {"username": game.white_username, "result": game.white_result},
+        "black": {"username": game.black_username, "result": game.black_result},
+    }, game.player_id)
+
+def game_buckets(game: Game) -> List[Tuple[str, str]]:
+    """The (dimension, key) report buckets a game counts towards"""
+    white = _is_white(game)
+    end = datetime.fromtimestamp(game.end_time, dt_timezone.utc)
+    buckets = [
+        (ReportBucket.COLOUR, "white" if white else "black"),
+        (ReportBucket.TIME_CLASS, game.time_class),
+        (ReportBucket.MONTH, f"{end.year}-{end.month:02d}"),
+    ]
+    if game.eco:
+        buckets.append((ReportBucket.ECO, game.eco))
+    opponent_rating = game.black_rating if white else game.white_rating
+    if opponent_rating is not None:
+        band = opponent_rating // ReportBucket.RATING_BAND_WIDTH * ReportBucket.RATING_BAND_WIDTH
+        buckets.append((ReportBucket.RATING_BAND, str(band)))
+    return buckets
+
+def _count_games(games: Iterable[Game], increments: Increments) -> None:
+    """Add the games' results and known accuracies to *increments*"""
+    for game in games:
+        outcome = _OUTCOME_FIELDS[_outcome(game)]
+        for bucket in game_buckets(game):
+            counts = increments[bucket]
+            counts["games"] = counts.get("games", 0) + 1
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if game.accuracy is not None:
+                counts["accuracy_sum"] = counts.get("accuracy_sum", 0) + game.accuracy
+                counts["accuracy_games"] = counts.get("accuracy_games", 0) + 1
+
+def _apply(username: str, increments: Increments) -> None:
+    """Add increments to a player's buckets, creating missing ones"""
+    if not increments:
+        return
+    with transaction.atomic():
+        existing = set(ReportBucket.objects.filter(player_id=username).values_list("dimension", "key"))
+        ReportBucket.objects.bulk_create(
+            [ReportBucket(player_id=username, dimension=dimension, key=key)
+             for dimension, key in increments if (dimension, key) not in existing],
+            ignore_conflicts=True,
+        )
+        # F() updates so concurrent syncs and analyses add up instead of overwriting
+        for (dimension, key), counts in increments.items():
+            ReportBucket.objects.filter(player_id=username, dimension=dimension, key=key).update(
+                **{field: F(field) + value for field, value in counts.items()}
+            )
+
+def add_games(player: Player, games: List[Game]) -> None:
+    """
+    Count newly stored games in the player's report
+
+    Nothing is done until the report has been built once; building it then
+    counts every stored game.
+
+    Args:
+        player: Player the games were stored for
+        games: Games just inserted, not yet counted
+    """
+    if not games:
+        return
+    # Read the flag from the database: the report may have been built since the sync started
+    if not Player.objects.filter(username=player.username, report_built=True).exists():
+        return
+    increments: Increments = defaultdict(dict)
+    _count_games(games, increments)
+    _apply(player.username, increments)
+
+def rebuild_report(username: str) -> None:
+    """Recount a player's report from every stored game"""
+    increments: Increments = defaultdict(dict)
+    games = Game.objects.filter(player_id=username).defer("pgn", "uuid", "url")
+    with transaction.atomic():
+        _count_games(games.iterator(chunk_size=2000), increments)
+        ReportBucket.objects.filter(player_id=username).delete()
+        ReportBucket.objects.bulk_create([
+            ReportBucket(player_id=username, dimension=dimension, key=key, **counts)
+            for (dimension, key), counts in increments.items()
+        ])
+        Player.objects.filter(username=username).update(report_built=True)
+    logger.info(f"Built report for {username} from {len(increments)} buckets")
+
+def record_accuracy(pgn_hash: str, results: List[Dict]) -> None:
+    """
+    Store each player's accuracy in a newly analysed game and update their reports
+
+    Args:
+        pgn_hash: Full content hash of the analysed PGN
+        results: Per-ply results of the completed analysis
+    """
+    games = Game.objects.filter(pgn_id=pgn_hash[:PGN_ID_LENGTH]).select_related("player").defer("pgn")
+    for game in games:
+        accuracy = player_stats([results], [_is_white(game)])["accuracy"]
+        if accuracy is None or accuracy == game.accuracy:
+            continue
+        previous = game.accuracy
+        game.accuracy = accuracy
+        with transaction.atomic():
+            game.save(update_fields=["accuracy"])
+            if game.player.report_built:
+                counts = {
+                    "accuracy_sum": accuracy - (previous or 0),
+                    "accuracy_games": 0 if previous is not None else 1,
+                }
+                _apply(game.player_id, {bucket: dict(counts) for bucket in game_buckets(game)})
+
+def _row(bucket: ReportBucket) -> Dict:
+    return {
+        "key": bucket.key,
+        "games": bucket.games,
+        "wins": bucket.wins,
+        "draws": bucket.draws,
+        "losses": bucket.losses,
+        "score": round(100 * (bucket.wins + bucket.draws / 2) / bucket.games, 1) if bucket.games else None,
+        "accuracy": round(bucket.accuracy_sum / bucket.accuracy_games, 1) if bucket.accuracy_games else None,
+        "analysed": bucket.accuracy_games,
+    }
+
+def player_report(username: str) -> Optional[Dict]:
+    """
+    Read a player's report from the running totals
+
+    The cost depends on the number of buckets, not on the number of games.
+    A player whose report was never built is counted once first.
+
+    Args:
+        username: Chess.com username
+
+    Returns:
+        Dict with total "games", rows "by_colour", "by_time_class",
+        "openings" (most played first), "rating_bands" (by opponent rating)
+        and "trend" (by month, oldest first), or None for an unknown player.
+        Rows hold games, wins, draws, losses, score % and average accuracy.
+    """
+    username = username.strip().lower()
+    player = Player.objects.filter(username=username).first()
+    if player is None:
+        return None
+    if not player.report_built:
+        rebuild_report(username)
+
+    dimensions = defaultdict(list)
+    for bucket in ReportBucket.objects.filter(player_id=username):
+        dimensions[bucket.dimension].append(bucket)
+
+    def rows(dimension, key):
+        return [_row(bucket) for bucket in sorted(dimensions[dimension], key=key)]
+
+    by_colour = rows(ReportBucket.COLOUR, lambda b: b.key != "white")
+    return {
+        "username": username,
+        "synced_at": player.synced_at,
+        "games": sum(row["games"] for row in by_colour),
+        "by_colour": by_colour,
+        "by_time_class": rows(ReportBucket.TIME_CLASS, lambda b: -b.games),
+        "openings": rows(ReportBucket.ECO, lambda b: (-b.games, b.key))[:REPORT_OPENINGS],
+        "rating_bands": rows(ReportBucket.RATING_BAND, lambda b: int(b.key)),
+        "trend": rows(ReportBucket.MONTH, lambda b: b.key),
+    }
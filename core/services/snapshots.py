@@ -0,0 +1,57 @@
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from ..models import AnalysisSnapshot
+from ..utils.accuracy import game_stats
+from ..utils.ids import PGN_ID_LENGTH, is_hash_prefix
+from ..utils.snapshot import pack_snapshot, snapshot_etag
+from .engine import analysis_depth
+
+def store_snapshot(key: Tuple[str, int, int], results: List[Dict]) -> AnalysisSnapshot:
+    """
+    Keep a compact copy of a complete analysis, with its game stats
+
+    Args:
+        key: Job key (PGN hash, depth, MultiPV) the analysis ran with
+        results: One result per ply
+
+    Returns:
+        The stored snapshot
+    """
+    pgn_hash_, depth, multipv = key
+    data = pack_snapshot(results, game_stats(results), depth=depth, multipv=multipv)
+    snapshot, _ = AnalysisSnapshot.objects.update_or_create(
+        pgn_hash=pgn_hash_,
+        depth=depth,
+        multipv=multipv,
+        defaults={"data": data, "etag": snapshot_etag(data)},
+    )
+    return snapshot
+
+def find_snapshot(
+    pgn_id: str,
+    *,
+    depth: Optional[int] = None,
+    multipv: Optional[int] = None,
+) -> Optional[AnalysisSnapshot]:
+    """
+    Look up the snapshot of a game's analysis at the given engine settings
+
+    Args:
+        pgn_id: Game ID or full PGN hash
+        depth: Search depth (defaults to the current analysis_depth())
+        multipv: Number of engine lines (defaults to settings.ENGINE_MULTIPV)
+
+    Returns:
+        The snapshot, or None if the game has no complete analysis at these settings
+    """
+    if not is_hash_prefix(pgn_id):
+        return None
+    snapshots = AnalysisSnapshot.objects.filter(
+        depth=depth or analysis_depth(),
+        multipv=multipv or settings.ENGINE_MULTIPV,
+    )
+    if len(pgn_id) == PGN_ID_LENGTH:
+        return snapshots.filter(pgn_hash__startswith=pgn_id).first()
+    return snapshots.filter(pgn_hash=pgn_id).first()
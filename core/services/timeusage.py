@@ -0,0 +1,165 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.db.models import QuerySet
+from django.db.models.functions import Substr
+
+from ..models import AnalysisJob, Game, Player
+from ..utils.accuracy import BLUNDER, eval_matrix, move_scores
+from ..utils.clocks import TIME_TROUBLE_FRACTION, clocks_left, parse_time_control, time_matrix
+from ..utils.ids import PGN_ID_LENGTH
+from .report import _is_white, _outcome
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the time-spent buckets, the last one is open
+TIME_BUCKETS = (2, 5, 15, 60)
+
+_SCORES = {"Win": 1.0, "Draw": 0.5, "Loss": 0.0}
+
+def _analyses(pgn_ids: List[str]) -> Dict[str, List[Dict]]:
+    """The deepest complete analysis of each game, by pgn_id"""
+    analyses: Dict[str, List[Dict]] = {}
+    for start in range(0, len(pgn_ids), 500):
+        jobs = (
+            AnalysisJob.objects.filter(status=AnalysisJob.COMPLETE)
+            .annotate(pgn_id=Substr("pgn_hash", 1, PGN_ID_LENGTH))
+            .filter(pgn_id__in=pgn_ids[start:start + 500])
+            .order_by("depth", "multipv")
+            .values_list("pgn_id", "results")
+        )
+        # Later rows are deeper and replace shallower ones
+        analyses.update(jobs)
+    return analyses
+
+def _bucket_label(index: int) -> str:
+    if index == 0:
+        return f"<{TIME_BUCKETS[0]}s"
+    if index == len(TIME_BUCKETS):
+        return f"{TIME_BUCKETS[-1]}s+"
+    return f"{TIME_BUCKETS[index - 1]}-{TIME_BUCKETS[index]}s"
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    return round(float(values.mean()), 1) if values.size else None
+
+def _games_with_clocks(username: str, time_class: Optional[str]) -> QuerySet:
+    games = Game.objects.filter(player_id=username).exclude(move_times=b"").only(
+        "player", "pgn_id", "time_class", "time_control", "move_times",
+        "white_username", "white_result", "black_username", "black_result",
+    )
+    if time_class:
+        games = games.filter(time_class=time_class)
+    return games.order_by("end_time", "id")
+
+def time_usage(username: str, *, time_class: Optional[str] = None) -> Optional[Dict]:
+    """
+    How a player uses their clock over all stored games with clock times
+
+    Works on the move times stored at import and on stored analyses, no PGN
+    is parsed. Every game's moves go into one array, so the cost is a few
+    array operations whatever the number of games.
+
+    Args:
+        username: Chess.com username
+        time_class: Only games of this time class (e.g. "blitz")
+
+    Returns:
+        Dict with the number of "games" and "moves", "average_move_time"
+        in seconds, "time_trouble" (games where the player's clock fell
+        below TIME_TROUBLE_FRACTION of the base time, their score % and
+        losses on time), and, over analysed games, "by_time_spent" rows
+        (moves, average win-% drop and blunder rate per time bucket),
+        "correlation" between time spent and win-% drop and the average
+        drop in and out of time trouble. None for an unknown player.
+    """
+    username = username.strip().lower()
+    if not Player.objects.filter(username=username).exists():
+        return None
+
+    games = list(_games_with_clocks(username, time_class))
+    controls = [parse_time_control(game.time_control) for game in games]
+    games = [game for game, control in zip(games, controls) if control]
+    controls = [control for control in controls if control]
+
+    usage = {
+        "username": username,
+        "games": len(games),
+        "moves": 0,
+        "average_move_time": None,
+        "time_trouble": {"games": 0, "share": None, "score": None, "timeouts": 0},
+        "analysed_games": 0,
+        "by_time_spent": [],
+        "correlation": None,
+        "trouble_drop": None,
+        "calm_drop": None,
+    }
+    if not games:
+        return usage
+
+    spent = time_matrix([game.move_times for game in games])
+    base = np.array([control[0] for control in controls])
+    increment = np.array([control[1] for control in controls])
+    left = clocks_left(spent, base, increment)
+
+    white = np.array([_is_white(game) for game in games])
+    plies = np.arange(spent.shape[1])
+    own = ((plies % 2 == 0)[np.newaxis, :] == white[:, np.newaxis]) & ~np.isnan(spent)
+    with np.errstate(invalid="ignore"):
+        trouble = own & (left < TIME_TROUBLE_FRACTION * base[:, np.newaxis])
+    trouble_games = trouble.any(axis=1)
+
+    outcomes = [_outcome(game) for game in games]
+    timeouts = sum(
+        (game.white_result if is_white else game.black_result) == "timeout"
+        for game, is_white in zip(games, white)
+    )
+    trouble_scores = [_SCORES[outcome] for outcome, hit in zip(outcomes, trouble_games) if hit]
+    usage.update({
+        "moves": int(own.sum()),
+        "average_move_time": _mean(spent[own]),
+        "time_trouble": {
+            "games": int(trouble_games.sum()),
+            "share": round(100 * float(trouble_games.mean()), 1),
+            "score": round(100 * sum(trouble_scores) / len(trouble_scores), 1) if trouble_scores else None,
+            "timeouts": timeouts,
+        },
+    })
+
+    # Win-% drop of each move from the stored analyses, aligned with the move times
+    analyses = _analyses([game.pgn_id for game in games])
+    rows = [index for index, game in enumerate(games) if game.pgn_id in analyses]
+    if not rows:
+        return usage
+    scores = move_scores(eval_matrix([analyses[games[index].pgn_id] for index in rows]))
+    width = min(scores["scored"].shape[1], spent.shape[1])
+    sign = np.where(scores["white"][:, :width], 1.0, -1.0)
+    with np.errstate(invalid="ignore"):
+        drop = np.maximum(sign * (scores["win"][:, :width] - scores["win"][:, 1:width + 1]), 0)
+    scored = own[rows, :width] & scores["scored"][:, :width]
+    move_spent = spent[rows, :width][scored]
+    move_drop = drop[scored]
+    in_trouble = trouble[rows, :width][scored]
+
+    buckets = np.searchsorted(TIME_BUCKETS, move_spent, side="right")
+    by_time_spent = []
+    for index in range(len(TIME_BUCKETS) + 1):
+        bucket = move_drop[buckets == index]
+        by_time_spent.append({
+            "label": _bucket_label(index),
+            "moves": int(bucket.size),
+            "average_drop": _mean(bucket),
+            "blunder_rate": round(100 * float((bucket >= BLUNDER).mean()), 1) if bucket.size else None,
+        })
+
+    correlation = None
+    if move_spent.size > 1 and move_spent.std() > 0 and move_drop.std() > 0:
+        correlation = round(float(np.corrcoef(move_spent, move_drop)[0, 1]), 3)
+    usage.update({
+        "analysed_games": len(rows),
+        "by_time_spent": by_time_spent,
+        "correlation": correlation,
+        "trouble_drop": _mean(move_drop[in_trouble]),
+        "calm_drop": _mean(move_drop[~in_trouble]),
+    })
+    return usage
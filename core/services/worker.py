@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from channels.db import database_sync_to_async
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+from ..utils.ids import pgn_id
+from .jobs import analysis_group, expired_jobs, run_claimed
+
+logger = logging.getLogger(__name__)
+
+async def _handle(message: Dict) -> None:
+    """Run one message taken off the worker channel"""
+    if message.get("type") != "analysis.start":
+        logger.error(f"Unknown analysis worker message: {message.get('type')}")
+        return
+    try:
+        await run_claimed(message["pgn"], message["group"])
+    except Exception as e:
+        logger.error(f"Error running analysis for {message.get('group')}: {e}")
+
+async def serve(
+    channel_layer: BaseChannelLayer,
+    channel: str,
+    concurrency: int,
+    *,
+    stop: Optional[asyncio.Event] = None,
+    resume_every: Optional[float] = None,
+) -> None:
+    """
+    Take analysis jobs off a channel and run them, at most *concurrency* at a time
+
+    A job is only received once a slot is free, so jobs a busy worker cannot
+    start stay on the channel layer for other workers. Results go to the
+    group named in each job, whichever web process its clients are on.
+
+    Jobs whose lease has expired, because the worker running them died, are
+    looked for every *resume_every* seconds and resumed in free slots, so
+    their clients get the rest of the game without asking again.
+
+    Args:
+        channel_layer: Channel layer shared with the web processes
+        channel: Channel the web processes send jobs to
+        concurrency: Games analysed at once, normally the engine pool size
+        stop: Stop taking new jobs once set; running ones are finished
+        resume_every: Seconds between looks for expired jobs (defaults to settings.ANALYSIS_RESUME_EVERY)
+    """
+    slots = asyncio.Semaphore(concurrency)
+    running: Set[asyncio.Task] = set()
+
+    def finished(task: asyncio.Task) -> None:
+        running.discard(task)
+        slots.release()
+
+    def start(message: Dict) -> None:
+        task = asyncio.create_task(_handle(message))
+        running.add(task)
+        task.add_done_callback(finished)
+
+    async def resume_expired() -> None:
+        while True:
+            await asyncio.sleep(resume_every or settings.ANALYSIS_RESUME_EVERY)
+            if slots.locked():
+                continue
+            try:
+                pgns = await database_sync_to_async(expired_jobs)(concurrency)
+            except Exception as e:
+                logger.error(f"Error looking for expired analysis jobs: {e}")
+                continue
+            for pgn_text in pgns:
+                if slots.locked():
+                    break
+                await slots.acquire()
+                start({"type": "analysis.start", "pgn": pgn_text, "group": analysis_group(pgn_id(pgn_text))})
+
+    stopped = asyncio.ensure_future(stop.wait()) if stop is not None else None
+    resumer = asyncio.create_task(resume_expired())
+    try:
+        while stop is None or not stop.is_set():
+            await slots.acquire()
+            receive = asyncio.ensure_future(channel_layer.receive(channel))
+            waits = {receive, stopped} if stopped is not None else {receive}
+            await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+            if not receive.done():
+                receive.cancel()
+                slots.release()
+                break
+
+            start(receive.result())
+
+        resumer.cancel()
+        if running:
+            await asyncio.wait(set(running))
+    finally:
+        resumer.cancel()
+        if stopped is not None:
+            stopped.cancel()
+        for task in running:
+            task.cancel()
@@ -0,0 +1,29 @@
+from core.models import Game
+
+def make_raw(end_time, moves="1. e4 e5 2. Nf3", white="TestUser", black="opponent", white_result="win",
+             black_result="resigned", white_rating=1500, black_rating=1400, time_class="blitz", eco=None,
+             **fields):
+    """Build a game as the Chess.com monthly archives return it, extra *fields* included"""
+    headers = f'[Event "Live Chess"]\n[ECO "{eco}"]' if eco else '[Event "Live Chess"]'
+    return {
+        "url": f"https://chess.com/game/{end_time}",
+        "pgn": f"{headers}\n\n{moves} *",
+        "white": {"username": white, "rating": white_rating, "result": white_result},
+        "black": {"username": black, "rating": black_rating, "result": black_result},
+        "time_class": time_class,
+        "end_time": end_time,
+        **fields,
+    }
+
+def store(player, raws):
+    """Store raw games for a player as a sync would, returning the Game rows"""
+    games = [Game.from_raw(player, raw) for raw in raws]
+    Game.objects.bulk_create(games)
+    return games
+
+def cp(value, lines=True, source=None):
+    """Build an analysed ply with a centipawn eval"""
+    result = {"eval": {"type": "cp", "value": value}, "lines": [{"Move": "e2e4"}] if lines else []}
+    if source:
+        result["source"] = source
+    return result
@@ -0,0 +1,154 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from ..models import AnalysisJob, AnalysisSnapshot
+from ..services.batch import split_pgn
+from ..services.jobs import pgn_hash
+from ..utils.pgn import mainline_moves
+
+GAME_ONE = """[Event "Game One"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0"""
+
+GAME_TWO = """[Event "Game Two"]
+[Result "0-1"]
+
+1. f3 e5 2. g4 Qh4# 0-1"""
+
+def fake_analyse_pgn(pgn_text):
+    return [{"eval": {"type": "cp", "value": 20}, "lines": [{"Move": "e2e4", "Centipawn": 20, "Mate": None}]}] * 3
+
+class TestSplitPgn(TestCase):
+
+    def test_split_keeps_original_text(self):
+        """Test each game keeps its exact text so hashes match the website"""
+        games = split_pgn(GAME_ONE + "\n\n\n" + GAME_TWO + "\n")
+        self.assertEqual(games, [GAME_ONE, GAME_TWO])
+
+    def test_split_empty(self):
+        """Test an empty file has no games"""
+        self.assertEqual(split_pgn(""), [])
+
+class TestAnalyseGamesCommand(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "games.pgn")
+        with open(self.path, "w") as f:
+            f.write(GAME_ONE + "\n\n" + GAME_TWO + "\n")
+
+        patcher = patch('core.services.batch.analyse_pgn', side_effect=fake_analyse_pgn)
+        self.mock_analyse = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('analyse_games', *args, '--workers', '1', stdout=out)
+        return out.getvalue()
+
+    def test_analyse_file(self):
+        """Test every game in a file is analysed and stored"""
+        output = self.run_command(self.path)
+
+        self.assertEqual(self.mock_analyse.call_count, 2)
+        self.assertEqual(AnalysisJob.objects.filter(status=AnalysisJob.COMPLETE).count(), 2)
+        self.assertTrue(AnalysisJob.objects.filter(pgn_hash=pgn_hash(GAME_TWO)).exists())
+        self.assertIn("6 positions", output)
+        self.assertIn("positions/sec", output)
+        self.assertIn("games/min", output)
+
+    def test_analyse_directory(self):
+        """Test .pgn files are found in a directory"""
+        self.run_command(self.directory.name)
+        self.assertEqual(self.mock_analyse.call_count, 2)
+
+    def test_rerun_skips_analysed_games(self):
+        """Test an interrupted or repeated run only analyses unfinished games"""
+        self.run_command(self.path)
+        self.mock_analyse.reset_mock()
+
+        output = self.run_command(self.path)
+
+        self.mock_analyse.assert_not_called()
+        self.assertIn("2 already analysed", output)
+
+    @override_settings(ENGINE_DEPTH=18, ENGINE_MIN_DEPTH=10)
+    def test_adaptive_analyses_kept_apart_from_full_depth(self):
+        """Test games analysed adaptively are analysed again once every position must reach ENGINE_DEPTH"""
+        with override_settings(ENGINE_ADAPTIVE=True):
+            self.run_command(self.path)
+        self.assertEqual(set(AnalysisJob.objects.values_list("depth", flat=True)), {10})
+        self.mock_analyse.reset_mock()
+
+        with override_settings(ENGINE_ADAPTIVE=False):
+            self.run_command(self.path)
+
+        self.assertEqual(self.mock_analyse.call_count, 2)
+        self.assertEqual(AnalysisJob.objects.filter(depth=18, status=AnalysisJob.COMPLETE).count(), 2)
+
+    def test_force_reanalyses(self):
+        """Test --force ignores stored analyses"""
+        self.run_command(self.path)
+        self.mock_analyse.reset_mock()
+
+        self.run_command(self.path, '--force')
+        self.assertEqual(self.mock_analyse.call_count, 2)
+
+    def test_failed_analysis_is_retried(self):
+        """Test a game analysed without an engine is not marked complete"""
+        self.mock_analyse.side_effect = lambda pgn: [{"eval": {"type": "cp", "value": 0}, "lines": []}]
+        output = self.run_command(self.path)
+
+        self.assertIn("(2 failed)", output)
+        self.assertEqual(AnalysisJob.objects.filter(status=AnalysisJob.FAILED).count(), 2)
+
+        self.mock_analyse.side_effect = fake_analyse_pgn
+        self.run_command(self.path)
+        self.assertEqual(AnalysisJob.objects.filter(status=AnalysisJob.COMPLETE).count(), 2)
+
+    def test_partly_failed_analysis_is_retried(self):
+        """Test an engine lost part-way through a game leaves the game open for another run"""
+        analysed = fake_analyse_pgn(GAME_ONE)[0]
+        placeholder = {"eval": {"type": "cp", "value": 0}, "lines": []}
+        self.mock_analyse.side_effect = lambda pgn: [analysed, analysed, placeholder, placeholder]
+        self.run_command(self.path)
+
+        self.assertEqual(AnalysisJob.objects.filter(status=AnalysisJob.FAILED).count(), 2)
+        self.assertFalse(AnalysisSnapshot.objects.exists())
+
+        self.mock_analyse.reset_mock()
+        self.run_command(self.path)
+        self.assertEqual(self.mock_analyse.call_count, 2)
+
+    def test_final_mate_position_needs_no_lines(self):
+        """Test a game ending in mate is complete although its last position has no engine line"""
+        analysed = fake_analyse_pgn(GAME_TWO)[0]
+        mated = {"eval": {"type": "mate", "value": 0}, "lines": []}
+        self.mock_analyse.side_effect = lambda pgn: [analysed] * len(mainline_moves(pgn)[1]) + [mated]
+        self.run_command(self.path)
+
+        self.assertEqual(AnalysisJob.objects.filter(status=AnalysisJob.COMPLETE).count(), 2)
+
+    @patch('core.management.commands.analyse_games.player_games')
+    def test_analyse_username(self, mock_games):
+        """Test a username analyses the player's recent games"""
+        mock_games.return_value = [{"pgn": GAME_ONE}, {"pgn": ""}]
+
+        self.run_command('testuser', '--limit', '10')
+
+        mock_games.assert_called_once_with('testuser', limit=10)
+        self.assertEqual(self.mock_analyse.call_count, 1)
+
+    @patch('core.management.commands.analyse_games.player_games')
+    def test_unknown_username(self, mock_games):
+        """Test an unknown player is reported as a command error"""
+        mock_games.side_effect = ValueError('Username "nobody" not found on Chess.com')
+
+        with self.assertRaises(CommandError):
+            self.run_command('nobody')
@@ -0,0 +1,144 @@
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+from unittest.mock import Mock, patch
+import chess
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from ..bench.corpus import CORPUS_USERNAME, generate_corpus, load_corpus, synthetic_analysis
+from ..models import PositionEval
+from ..services import jobs
+from ..services.evalcache import get_eval_cache, normalize_fen
+from ..utils.pgn import mainline_moves
+from .test_engine import make_infos, make_pool
+
+class TestCorpus(SimpleTestCase):
+
+    def test_checked_in_corpus_is_reproducible(self):
+        """Test the corpus file is what generate_corpus(100, seed=0) produces"""
+        self.assertEqual(load_corpus(), generate_corpus(100, seed=0))
+
+    def test_corpus_games_are_legal_and_clocked(self):
+        """Test every corpus game parses to the end with a clock on every move"""
+        for game in load_corpus(10):
+            _, moves, clocks = mainline_moves(game["pgn"])
+            self.assertGreater(len(moves), 0)
+            self.assertEqual(len(clocks), len(moves))
+            self.assertNotIn(None, clocks)
+            self.assertIn(CORPUS_USERNAME, (game["white"]["username"], game["black"]["username"]))
+
+    def test_synthetic_analysis_shape(self):
+        """Test a made-up analysis has one result per position and legal engine lines"""
+        game = load_corpus(1)[0]
+        board, moves, _ = mainline_moves(game["pgn"])
+        results = synthetic_analysis(random.Random(0), game["pgn"], multipv=3)
+
+        self.assertEqual(len(results), len(moves) + 1)
+        self.assertEqual(results[0], {"eval": {"type": "cp", "value": 20}, "lines": [], "source": "book"})
+        for ply, result in enumerate(results):
+            if ply >= 6:
+                self.assertNotIn("source", result)
+                self.assertEqual(len(result["lines"]), min(3, board.legal_moves.count()))
+            for line in result["lines"]:
+                self.assertTrue(board.is_legal(chess.Move.from_uci(line["Move"])))
+            if ply < len(moves):
+                board.push(moves[ply])
+
+class TestBenchCodecCommand(SimpleTestCase):
+
+    def test_reports_sizes_and_decoders(self):
+        """Test the codec benchmark reports every encoding and decoder"""
+        out = StringIO()
+        call_command('bench_codec', '--games', '2', '--repeat', '1', stdout=out)
+
+        for name in ("json+gzip", "codec+gzip", "json.loads", "decode_analysis", "decode_arrays"):
+            self.assertIn(name, out.getvalue())
+
+class TestBenchCommand(TransactionTestCase):
+
+    def setUp(self):
+        self.engine = Mock()
+        self.searched = []
+
+        def analyse(board, limit, **kwargs):
+            self.searched.append(board.fen())
+            return make_infos(('e2e4', 10), ('d2d4', 5))
+
+        self.engine.analyse.side_effect = analyse
+        patcher = patch('core.services.engine.get_pool', return_value=make_pool(self.engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+
+    def tearDown(self):
+        jobs._runs.clear()
+
+    def bench(self, *args):
+        out = StringIO()
+        call_command('bench', '--games', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_parse_and_transform_written_as_json(self):
+        """Test the CPU stages report throughput and the results file records the corpus"""
+        out = self.bench('--stages', 'parse,transform', '--json', self.output)
+
+        with open(self.output) as f:
+            results = json.load(f)
+        self.assertEqual(results["meta"]["corpus_games"], 2)
+        self.assertEqual(set(results["stages"]), {"parse", "transform"})
+        positions = sum(1 + len(mainline_moves(game["pgn"])[1]) for game in load_corpus(2))
+        self.assertEqual(results["stages"]["parse"]["positions"], positions)
+        self.assertGreater(results["stages"]["parse"]["positions_per_sec"], 0)
+        self.assertIn("process peak RSS", out)
+
+    @override_settings(STOCKFISH_PATH=__file__)
+    def test_engine_stages_per_depth(self):
+        """Test analysis and the WebSocket path run at each depth on a throwaway database, cache off"""
+        board, moves, _ = mainline_moves(load_corpus(1)[0]["pgn"])
+        for move in moves[:20]:
+            board.push(move)
+        stored = {"eval": {"type": "cp", "value": 0}, "lines": []}
+        PositionEval.objects.create(fen=normalize_fen(board.fen()), depth=99, multipv=5, result=stored)
+        shared = get_eval_cache()
+        creation = connection.creation
+
+        with patch.object(creation, 'create_test_db', wraps=creation.create_test_db) as create, \
+                patch.object(creation, 'destroy_test_db', wraps=creation.destroy_test_db) as destroy:
+            self.bench('--stages', 'analyse,consumer', '--depths', '4,6', '--json', self.output)
+
+        with open(self.output) as f:
+            stages = json.load(f)["stages"]
+        self.assertEqual(set(stages), {"analyse@4", "analyse@6", "consumer@4", "consumer@6"})
+        positions = sum(1 + len(mainline_moves(game["pgn"])[1]) for game in load_corpus(2))
+        for result in stages.values():
+            self.assertEqual(result["positions"], positions)
+            self.assertLessEqual(result["ply_p50_ms"], result["ply_p95_ms"])
+        depths = [call.args[1].depth for call in self.engine.analyse.call_args_list]
+        self.assertEqual(sorted(set(depths)), [4, 6])
+        self.assertEqual((create.call_count, destroy.call_count), (4, 4))
+        # The stored evaluation was neither used nor joined by new ones
+        self.assertIn(board.fen(), self.searched)
+        self.assertEqual(PositionEval.objects.get().result, stored)
+        self.assertIs(get_eval_cache(), shared)
+
+    @override_settings(STOCKFISH_PATH='/nonexistent/stockfish')
+    def test_engine_stages_skipped_without_stockfish(self):
+        """Test engine stages are recorded as skipped when Stockfish is missing"""
+        out = self.bench('--stages', 'analyse', '--json', self.output)
+
+        with open(self.output) as f:
+            self.assertIn("skipped", json.load(f)["stages"]["analyse@10"])
+        self.assertIn("skipped", out)
+
+    def test_compare_against_baseline(self):
+        """Test a baseline run is compared metric by metric"""
+        baseline = {"stages": {"parse": {"positions_per_sec": 1.0, "games_per_sec": 1.0, "process_peak_rss_mb": 1.0}}}
+        with open(self.output, 'w') as f:
+            json.dump(baseline, f)
+
+        out = self.bench('--stages', 'parse', '--compare', self.output)
+
+        self.assertIn("vs baseline: positions_per_sec +", out)
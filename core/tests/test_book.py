@@ -0,0 +1,153 @@
+import os
+import struct
+import tempfile
+from unittest.mock import Mock, patch
+import chess
+import chess.polyglot
+from django.test import SimpleTestCase, override_settings
+from ..services import book
+from ..services.engine import analyse_pgn
+from ..services.evalcache import EvalCache
+from .test_engine import make_infos, make_pool
+
+def write_book(path, entries):
+    """Write a Polyglot book from (board, uci, weight) entries"""
+    rows = []
+    for board, uci, weight in entries:
+        move = chess.Move.from_uci(uci)
+        raw = move.to_square | (move.from_square << 6)
+        rows.append((chess.polyglot.zobrist_hash(board), raw, weight))
+    with open(path, "wb") as f:
+        for key, raw, weight in sorted(rows):
+            f.write(struct.pack(">QHHI", key, raw, weight, 0))
+
+def reset_book():
+    book._book = None
+    book._tablebase = None
+
+class TestOpeningBook(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "book.bin")
+
+        start = chess.Board()
+        after_e4 = chess.Board()
+        after_e4.push_uci("e2e4")
+        write_book(self.path, [
+            (start, "e2e4", 10),
+            (start, "d2d4", 20),
+            (after_e4, "e7e5", 5),
+        ])
+
+        reset_book()
+        self.addCleanup(reset_book)
+        settings_patcher = override_settings(OPENING_BOOK_PATH=self.path, SYZYGY_PATH=None, ENGINE_MULTIPV=3)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+    def test_book_moves_by_weight(self):
+        """Test book positions list book moves, most played first"""
+        result = book.book_result(chess.Board())
+
+        self.assertEqual(result["source"], "book")
+        self.assertEqual([line["Move"] for line in result["lines"]], ["d2d4", "e2e4"])
+        self.assertEqual(result["eval"], {"type": "cp", "value": 0})
+
+    def test_position_not_in_book(self):
+        """Test positions outside the book are not answered"""
+        board = chess.Board()
+        board.push_uci("a2a3")
+        self.assertIsNone(book.book_result(board))
+
+    @override_settings(OPENING_BOOK_PATH=None)
+    def test_no_book_configured(self):
+        """Test the lookup is skipped without a book"""
+        self.assertIsNone(book.book_result(chess.Board()))
+
+    @override_settings(OPENING_BOOK_PATH="/missing/book.bin")
+    def test_unreadable_book(self):
+        """Test a missing book file disables the lookup instead of failing"""
+        self.assertIsNone(book.book_result(chess.Board()))
+
+    @patch('core.services.engine.get_pool')
+    def test_book_plies_skip_engine(self, mock_get_pool):
+        """Test the engine only searches once the game leaves the book"""
+        engine = Mock()
+        engine.analyse.return_value = make_infos(('g1f3', 30))
+        mock_get_pool.return_value = make_pool(engine)
+
+        with patch('core.services.engine.get_eval_cache', return_value=EvalCache(max_entries=0, max_rows=0)):
+            results = analyse_pgn("1. e4 e5 2. Nf3 *", adaptive=False)
+
+        self.assertEqual([result.get("source") for result in results], ["book", "book", None, None])
+        self.assertEqual(engine.analyse.call_count, 2)
+
+    @patch('core.services.engine.get_pool')
+    def test_backward_analysis_keeps_book_prefix(self, mock_get_pool):
+        """Test analysing backwards answers the same plies from the book"""
+        engine = Mock()
+        engine.analyse.return_value = make_infos(('g1f3', 30))
+        mock_get_pool.return_value = make_pool(engine)
+
+        with patch('core.services.engine.get_eval_cache', return_value=EvalCache(max_entries=0, max_rows=0)):
+            results = analyse_pgn("1. e4 e5 2. Nf3 *", adaptive=False, backward=True)
+
+        self.assertEqual([result.get("source") for result in results], ["book", "book", None, None])
+        self.assertEqual(engine.analyse.call_count, 2)
+
+class TestTablebase(SimpleTestCase):
+
+    def setUp(self):
+        reset_book()
+        self.addCleanup(reset_book)
+        self.tablebase = Mock()
+        patcher = patch('core.services.book._open_tablebase', return_value=self.tablebase)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # King and rook against king, White to move
+        self.board = chess.Board("8/8/8/8/8/2k5/8/KR6 w - - 0 1")
+
+    @override_settings(ENGINE_MULTIPV=2)
+    def test_winning_moves_ranked_by_distance(self):
+        """Test wins come first, quickest conversion first"""
+        self.tablebase.get_wdl.side_effect = lambda board: 2 if board.turn == chess.WHITE else -2
+        self.tablebase.get_dtz.side_effect = lambda board: -5 if board.piece_at(chess.B2) else -20
+
+        result = book.tablebase_result(self.board)
+
+        self.assertEqual(result["source"], "tablebase")
+        self.assertEqual(result["eval"], {"type": "cp", "value": book.TABLEBASE_WIN})
+        self.assertEqual(result["lines"][0]["Move"], "b1b2")
+        self.assertEqual(result["lines"][0]["Centipawn"], book.TABLEBASE_WIN)
+        self.assertEqual(len(result["lines"]), 2)
+
+    def test_score_from_white_point_of_view(self):
+        """Test a win for Black is reported as a negative score"""
+        board = chess.Board("8/8/8/8/8/2K5/8/kr6 b - - 0 1")
+        self.tablebase.get_wdl.side_effect = lambda b: 2 if b.turn == chess.BLACK else -2
+        self.tablebase.get_dtz.return_value = -10
+
+        result = book.tablebase_result(board)
+
+        self.assertEqual(result["eval"]["value"], -book.TABLEBASE_WIN)
+
+    def test_cursed_win_is_a_draw(self):
+        """Test a win lost to the fifty-move rule scores as a draw"""
+        self.tablebase.get_wdl.side_effect = lambda board: 1 if board.turn == chess.WHITE else -1
+        self.tablebase.get_dtz.return_value = 120
+
+        result = book.tablebase_result(self.board)
+
+        self.assertEqual(result["eval"]["value"], 0)
+
+    def test_too_many_pieces(self):
+        """Test positions beyond the tables are not probed"""
+        self.assertIsNone(book.tablebase_result(chess.Board()))
+        self.tablebase.get_wdl.assert_not_called()
+
+    def test_missing_table(self):
+        """Test a position whose table is not installed needs a search"""
+        self.tablebase.get_wdl.return_value = None
+        self.assertIsNone(book.tablebase_result(self.board))
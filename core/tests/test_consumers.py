@@ -1,16 +1,28 @@
+import asyncio
 import json
 import unittest
 from unittest.mock import Mock, patch, AsyncMock
+from asgiref.sync import sync_to_async
 from channels.testing import WebsocketCommunicator
 from channels.routing import URLRouter
+from django.test import TransactionTestCase
 from django.urls import re_path
 from ..consumers import AnalysisConsumer
+from ..models import AnalysisJob, AnalysisSnapshot, Game, Player
 from ..routing import websocket_urlpatterns
+from ..services import jobs
+from ..services.snapshots import store_snapshot
+from ..utils.ids import pgn_id
 
-class TestAnalysisConsumer(unittest.TestCase):
-    
-    def setUp(self):
-        self.sample_pgn = """[Event "Test Game"]
+def fake_analysis(results, delay=0):
+    """Build a stand-in for aiter_analysis yielding the given results"""
+    async def analysis(pgn_text):
+        for result in results:
+            await asyncio.sleep(delay)
+            yield result
+    return analysis
+
+SAMPLE_PGN = """[Event "Test Game"]
 [Site "Test Site"]
 [Date "2024.01.01"]
 [White "Player1"]
@@ -18,15 +30,34 @@ class TestAnalysisConsumer(unittest.TestCase):
 [Result "1-0"]
 
 1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O O-O 5. d3 d6 6. Nc3 Nf6 7. Bg5 h6 8. Bh4 g5 9. Bg3 Nh5 10. Nxe5 Nxe5 11. d4 Bxd4 12. Qxd4 Nc6 13. Qh4 Nf6 14. Bxf7+ Rxf7 15. Qxf6 Qe7 16. Qxe7+ Nxe7 17. Nxd6 cxd6 18. Rfe1 Be6 19. Rxe6 Nc6 20. Rae1 Rf8 21. Rxc6 bxc6 22. Rxe7 1-0"""
+
+SAMPLE_ID = pgn_id(SAMPLE_PGN)
+
+def connect_client(pgn_id=SAMPLE_ID):
+    """Build a communicator for the analysis consumer"""
+    communicator = WebsocketCommunicator(
+        AnalysisConsumer.as_asgi(),
+        f"/ws/analysis/{pgn_id}/"
+    )
+    communicator.scope["url_route"] = {"kwargs": {"pgn_id": pgn_id}}
+    return communicator
+
+# Jobs are saved from worker threads, so rows must be committed to be seen
+class TestAnalysisConsumer(TransactionTestCase):
+    
+    def tearDown(self):
+        jobs._runs.clear()
+    
+    def setUp(self):
+        self.sample_pgn = SAMPLE_PGN
     
-    @patch('core.consumers.sync_to_async')
-    async def test_connect(self, mock_sync_to_async):
+    async def test_connect(self):
         """Test WebSocket connection"""
         communicator = WebsocketCommunicator(
             AnalysisConsumer.as_asgi(),
-            "/ws/analysis/test-pgn-id/"
+            f"/ws/analysis/{SAMPLE_ID}/"
         )
-        communicator.scope["url_route"] = {"kwargs": {"pgn_id": "test-pgn-id"}}
+        communicator.scope["url_route"] = {"kwargs": {"pgn_id": SAMPLE_ID}}
         
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
@@ -38,24 +69,26 @@ class TestAnalysisConsumer(unittest.TestCase):
         
         await communicator.disconnect()
     
-    @patch('core.consumers.sync_to_async')
-    async def test_start_analysis_success(self, mock_sync_to_async):
+    async def test_start_analysis_success(self):
         """Test successful analysis start"""
         # Mock the analysis result
         mock_analysis = [
             {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e4", "Centipawn": 34}]},
             {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e5", "Centipawn": 12}]}
         ]
-        mock_sync_to_async.return_value = AsyncMock(return_value=mock_analysis)
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis(mock_analysis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
         
         communicator = WebsocketCommunicator(
             AnalysisConsumer.as_asgi(),
-            "/ws/analysis/test-pgn-id/"
+            f"/ws/analysis/{SAMPLE_ID}/"
         )
-        communicator.scope["url_route"] = {"kwargs": {"pgn_id": "test-pgn-id"}}
+        communicator.scope["url_route"] = {"kwargs": {"pgn_id": SAMPLE_ID}}
         
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
+        await communicator.receive_json_from()  # connection status
         
         # Send start analysis message
         await communicator.send_json_to({
@@ -74,20 +107,21 @@ class TestAnalysisConsumer(unittest.TestCase):
         # Check completion message
         response = await communicator.receive_json_from()
         self.assertEqual(response["type"], "complete")
+        self.assertIn("accuracy", response["stats"]["white"])
         
         await communicator.disconnect()
     
-    @patch('core.consumers.sync_to_async')
-    async def test_start_analysis_no_pgn(self, mock_sync_to_async):
+    async def test_start_analysis_no_pgn(self):
         """Test analysis start without PGN"""
         communicator = WebsocketCommunicator(
             AnalysisConsumer.as_asgi(),
-            "/ws/analysis/test-pgn-id/"
+            f"/ws/analysis/{SAMPLE_ID}/"
         )
-        communicator.scope["url_route"] = {"kwargs": {"pgn_id": "test-pgn-id"}}
+        communicator.scope["url_route"] = {"kwargs": {"pgn_id": SAMPLE_ID}}
         
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
+        await communicator.receive_json_from()  # connection status
         
         # Send start analysis message without PGN
         await communicator.send_json_to({
@@ -101,19 +135,21 @@ class TestAnalysisConsumer(unittest.TestCase):
         
         await communicator.disconnect()
     
-    @patch('core.consumers.sync_to_async')
-    async def test_start_analysis_failure(self, mock_sync_to_async):
+    async def test_start_analysis_failure(self):
         """Test analysis start when analysis fails"""
-        mock_sync_to_async.return_value = AsyncMock(return_value=[])
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis([]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
         
         communicator = WebsocketCommunicator(
             AnalysisConsumer.as_asgi(),
-            "/ws/analysis/test-pgn-id/"
+            f"/ws/analysis/{SAMPLE_ID}/"
         )
-        communicator.scope["url_route"] = {"kwargs": {"pgn_id": "test-pgn-id"}}
+        communicator.scope["url_route"] = {"kwargs": {"pgn_id": SAMPLE_ID}}
         
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
+        await communicator.receive_json_from()  # connection status
         
         # Send start analysis message
         await communicator.send_json_to({
@@ -132,12 +168,13 @@ class TestAnalysisConsumer(unittest.TestCase):
         """Test handling of unknown message types"""
         communicator = WebsocketCommunicator(
             AnalysisConsumer.as_asgi(),
-            "/ws/analysis/test-pgn-id/"
+            f"/ws/analysis/{SAMPLE_ID}/"
         )
-        communicator.scope["url_route"] = {"kwargs": {"pgn_id": "test-pgn-id"}}
+        communicator.scope["url_route"] = {"kwargs": {"pgn_id": SAMPLE_ID}}
         
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
+        await communicator.receive_json_from()  # connection status
         
         # Send unknown message type
         await communicator.send_json_to({
@@ -150,6 +187,408 @@ class TestAnalysisConsumer(unittest.TestCase):
         self.assertIn("Unknown message type", response["message"])
         
         await communicator.disconnect()
+    
+    async def test_results_streamed_before_analysis_finishes(self):
+        """Test each ply is pushed as soon as it is ready"""
+        release = asyncio.Event()
+        
+        async def analysis(pgn_text):
+            yield {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]}
+            await release.wait()
+            yield {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e2e4", "Centipawn": 12, "Mate": None}]}
+        
+        patcher = patch('core.services.jobs.aiter_analysis', analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = WebsocketCommunicator(
+            AnalysisConsumer.as_asgi(),
+            f"/ws/analysis/{SAMPLE_ID}/"
+        )
+        communicator.scope["url_route"] = {"kwargs": {"pgn_id": SAMPLE_ID}}
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        
+        # The first ply arrives while the second is still being analysed
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["ply"], 0)
+        self.assertTrue(await communicator.receive_nothing())
+        
+        release.set()
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["ply"], 1)
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        
+        await communicator.disconnect()
+    
+    async def test_disconnect_keeps_job_running(self):
+        """Test closing the socket leaves the job running so it gets stored"""
+        release = asyncio.Event()
+        
+        async def analysis(pgn_text):
+            yield {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]}
+            await release.wait()
+            yield {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e2e4", "Centipawn": 12, "Mate": None}]}
+        
+        patcher = patch('core.services.jobs.aiter_analysis', analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+        
+        run = jobs._runs[jobs.job_key(self.sample_pgn)]
+        release.set()
+        await asyncio.wait_for(run.task, timeout=1)
+        
+        job = await sync_to_async(AnalysisJob.objects.get)(pgn_hash=jobs.pgn_hash(self.sample_pgn))
+        self.assertEqual(job.status, AnalysisJob.COMPLETE)
+        self.assertEqual(len(job.results), 2)
+    
+    async def test_clients_share_one_analysis(self):
+        """Test a second client joins the running job instead of starting another"""
+        release = asyncio.Event()
+        calls = []
+        
+        async def analysis(pgn_text):
+            calls.append(pgn_text)
+            yield {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]}
+            await release.wait()
+            yield {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e2e4", "Centipawn": 12, "Mate": None}]}
+        
+        patcher = patch('core.services.jobs.aiter_analysis', analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        first = connect_client()
+        await first.connect()
+        await first.receive_json_from()  # connection status
+        await first.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        self.assertEqual((await first.receive_json_from())["ply"], 0)
+        
+        # Same room: the second client also hears the job's group messages
+        second = connect_client()
+        await second.connect()
+        await second.receive_json_from()  # connection status
+        await second.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        self.assertEqual((await second.receive_json_from())["ply"], 0)
+        
+        release.set()
+        for communicator in (first, second):
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["ply"], 1)
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["type"], "complete")
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+        
+        self.assertEqual(len(calls), 1)
+    
+    async def test_finished_analysis_served_from_storage(self):
+        """Test a stored job is replayed without running the engine"""
+        results = [
+            {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]},
+            {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e2e4", "Centipawn": 12, "Mate": None}]}
+        ]
+        await sync_to_async(AnalysisJob.objects.create)(
+            pgn_hash=jobs.pgn_hash(self.sample_pgn),
+            depth=jobs.job_key(self.sample_pgn)[1],
+            multipv=jobs.job_key(self.sample_pgn)[2],
+            pgn=self.sample_pgn,
+            status=AnalysisJob.COMPLETE,
+            results=results,
+        )
+        analysis = Mock()
+        patcher = patch('core.services.jobs.aiter_analysis', analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        
+        for ply, result in enumerate(results):
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["ply"], ply)
+            self.assertEqual(response["eval"], result["eval"])
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        analysis.assert_not_called()
+        
+        await communicator.disconnect()
+    
+    async def test_snapshot_served_without_job(self):
+        """Test a game with a snapshot is sent from it without joining or loading a job"""
+        results = [
+            {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]},
+            {"eval": {"type": "mate", "value": -2}, "lines": [{"Move": "d8h4", "Centipawn": None, "Mate": -2}]}
+        ]
+        await sync_to_async(store_snapshot)(jobs.job_key(self.sample_pgn), results)
+        patcher = patch('core.consumers.subscribe', AsyncMock(side_effect=AssertionError("no job expected")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn, "resume_from": 1})
+        
+        response = await communicator.receive_json_from()
+        self.assertEqual((response["ply"], response["eval"], response["lines"]), (1, results[1]["eval"], results[1]["lines"]))
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        self.assertIn("accuracy", response["stats"]["white"])
+        
+        await communicator.disconnect()
+    
+    async def test_finished_job_leaves_snapshot(self):
+        """Test completing an analysis stores its snapshot at the job's settings"""
+        results = [
+            {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]},
+            {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e7e5", "Centipawn": 12, "Mate": None}]}
+        ]
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis(results))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        while (await communicator.receive_json_from())["type"] != "complete":
+            pass
+        await communicator.disconnect()
+        
+        snapshot = await sync_to_async(AnalysisSnapshot.objects.get)()
+        self.assertEqual(
+            (snapshot.pgn_hash, snapshot.depth, snapshot.multipv), jobs.job_key(self.sample_pgn)
+        )
+    
+    async def test_reconnect_resumes_from_ply(self):
+        """Test a reconnecting client only receives plies it has not seen"""
+        mock_analysis = [
+            {"eval": {"type": "cp", "value": value}, "lines": [{"Move": "e2e4", "Centipawn": value, "Mate": None}]}
+            for value in (34, 12, -5)
+        ]
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis(mock_analysis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        for _ in range(len(mock_analysis) + 1):
+            await communicator.receive_json_from()
+        await communicator.disconnect()
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({
+            "type": "start_analysis",
+            "pgn": self.sample_pgn,
+            "resume_from": 2
+        })
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["ply"], 2)
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        
+        await communicator.disconnect()
+
+    async def test_invalid_resume_from_sends_every_ply(self):
+        """Test a resume_from that is not a ply of the results is treated as none seen"""
+        results = [
+            {"eval": {"type": "cp", "value": value}, "lines": [{"Move": "e2e4", "Centipawn": value, "Mate": None}]}
+            for value in (34, 12)
+        ]
+        await sync_to_async(AnalysisJob.objects.create)(
+            pgn_hash=jobs.pgn_hash(self.sample_pgn),
+            depth=jobs.job_key(self.sample_pgn)[1],
+            multipv=jobs.job_key(self.sample_pgn)[2],
+            pgn=self.sample_pgn,
+            status=AnalysisJob.COMPLETE,
+            results=results,
+        )
+        
+        for resume_from, first_ply in (("abc", 0), (None, 0), (-5, 0), ("1", 1), (99, None)):
+            communicator = connect_client()
+            await communicator.connect()
+            await communicator.receive_json_from()  # connection status
+            await communicator.send_json_to({
+                "type": "start_analysis",
+                "pgn": self.sample_pgn,
+                "resume_from": resume_from
+            })
+            response = await communicator.receive_json_from()
+            if first_ply is None:
+                self.assertEqual(response["type"], "complete")
+            else:
+                self.assertEqual(response["ply"], first_ply)
+            await communicator.disconnect()
+
+    async def test_interrupted_job_resumes_from_stored_progress(self):
+        """Test a job stopped part-way continues after its stored plies"""
+        stored = {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]}
+        await sync_to_async(AnalysisJob.objects.create)(
+            pgn_hash=jobs.pgn_hash(self.sample_pgn),
+            depth=jobs.job_key(self.sample_pgn)[1],
+            multipv=jobs.job_key(self.sample_pgn)[2],
+            pgn=self.sample_pgn,
+            status=AnalysisJob.RUNNING,
+            results=[stored],
+        )
+        # The engine replays ply 0 (from the eval cache) before reaching new work
+        mock_analysis = [stored, {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e2e4", "Centipawn": 12, "Mate": None}]}]
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis(mock_analysis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        
+        for ply in range(2):
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["ply"], ply)
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+        
+        job = await sync_to_async(AnalysisJob.objects.get)(pgn_hash=jobs.pgn_hash(self.sample_pgn))
+        self.assertEqual(job.status, AnalysisJob.COMPLETE)
+        self.assertEqual(job.results, mock_analysis)
+    
+    async def test_placeholder_plies_are_not_progress(self):
+        """Test a job resumes after its analysed plies, not after placeholders of failed searches"""
+        stored = {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]}
+        placeholder = {"eval": {"type": "cp", "value": 0}, "lines": []}
+        await sync_to_async(AnalysisJob.objects.create)(
+            pgn_hash=jobs.pgn_hash(self.sample_pgn),
+            depth=jobs.job_key(self.sample_pgn)[1],
+            multipv=jobs.job_key(self.sample_pgn)[2],
+            pgn=self.sample_pgn,
+            status=AnalysisJob.RUNNING,
+            results=[stored, placeholder, placeholder],
+        )
+        analysed = {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e7e5", "Centipawn": 12, "Mate": None}]}
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis([stored, analysed, analysed]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        
+        for ply in range(3):
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["ply"], ply)
+        await communicator.receive_json_from()  # complete
+        await communicator.disconnect()
+        
+        job = await sync_to_async(AnalysisJob.objects.get)(pgn_hash=jobs.pgn_hash(self.sample_pgn))
+        self.assertEqual(job.results, [stored, analysed, analysed])
+    
+    async def test_failed_job_is_analysed_again(self):
+        """Test a job that failed (e.g. without an engine) starts over instead of resuming"""
+        placeholder = {"eval": {"type": "cp", "value": 0}, "lines": []}
+        await sync_to_async(AnalysisJob.objects.create)(
+            pgn_hash=jobs.pgn_hash(self.sample_pgn),
+            depth=jobs.job_key(self.sample_pgn)[1],
+            multipv=jobs.job_key(self.sample_pgn)[2],
+            pgn=self.sample_pgn,
+            status=AnalysisJob.FAILED,
+            results=[placeholder, placeholder],
+        )
+        analysed = {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e2e4", "Centipawn": 12, "Mate": None}]}
+        patcher = patch('core.services.jobs.aiter_analysis', fake_analysis([analysed, analysed]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        
+        for ply in range(2):
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["eval"], analysed["eval"])
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        await communicator.disconnect()
+        
+        job = await sync_to_async(AnalysisJob.objects.get)(pgn_hash=jobs.pgn_hash(self.sample_pgn))
+        self.assertEqual(job.status, AnalysisJob.COMPLETE)
+        self.assertEqual(job.results, [analysed, analysed])
+    
+    async def test_route_needs_full_game_id(self):
+        """Test the WebSocket route only accepts a full hex game ID"""
+        application = URLRouter(websocket_urlpatterns)
+        for path in (f"/ws/analysis/{SAMPLE_ID[:1]}/", f"/ws/analysis/{SAMPLE_ID.upper()}/"):
+            communicator = WebsocketCommunicator(application, path)
+            with self.assertRaises(ValueError):
+                await communicator.connect()
+        
+        communicator = WebsocketCommunicator(application, f"/ws/analysis/{SAMPLE_ID}/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+    
+    async def test_stored_game_resolved_by_id(self):
+        """Test a stored game is analysed from its ID without the client sending the PGN"""
+        player = await sync_to_async(Player.objects.create)(username="player1")
+        await sync_to_async(Game.objects.create)(
+            player=player, url="https://chess.com/game/1", pgn=self.sample_pgn, pgn_id=SAMPLE_ID,
+            white_username="Player1", white_result="win", black_username="Player2",
+            black_result="resigned", time_class="blitz", end_time=1704067200,
+        )
+        mock_analysis = [{"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]}]
+        seen = []
+        
+        async def analysis(pgn_text):
+            seen.append(pgn_text)
+            for result in mock_analysis:
+                yield result
+        
+        patcher = patch('core.services.jobs.aiter_analysis', analysis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis"})
+        
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["ply"], 0)
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "complete")
+        self.assertEqual(seen, [self.sample_pgn])
+        await communicator.disconnect()
+    
+    async def test_pgn_must_match_id(self):
+        """Test a client PGN for another game is refused"""
+        communicator = connect_client("0123456789abcdef")
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": self.sample_pgn})
+        
+        response = await communicator.receive_json_from()
+        self.assertEqual(response["type"], "error")
+        self.assertIn("does not match", response["message"])
+        await communicator.disconnect()
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -1,10 +1,51 @@
+import asyncio
+import os
+import tempfile
+import threading
 import unittest
+from io import StringIO
 from unittest.mock import Mock, patch
-from ..services.engine import _analyse_fen, analyse_pgn, get_engine_info
+import chess
+import chess.engine
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from ..services.budget import SearchBudget
+from ..services.engine import _analyse_fen, aiter_analysis, analyse_pgn, get_engine_info, iter_analysis
+from ..services.evalcache import EvalCache
+from ..services.pool import EnginePool, EnginePoolError, EnginePoolTimeout
+
+def make_infos(*lines, pov=chess.WHITE):
+    """Build the InfoDict list engine.analyse(multipv=...) returns for (uci, score) lines"""
+    infos = []
+    for uci, score in lines:
+        if not isinstance(score, chess.engine.Score):
+            score = chess.engine.Cp(score)
+        infos.append({
+            "score": chess.engine.PovScore(score, pov),
+            "pv": [chess.Move.from_uci(uci)],
+            "depth": 18,
+        })
+    return infos
+
+def make_pool(*engines, size=1, is_alive=None):
+    """Build an EnginePool handing out the given mock engines in order"""
+    factory = Mock(side_effect=list(engines))
+    return EnginePool(
+        factory,
+        size=size,
+        is_alive=is_alive or (lambda engine: True),
+        close=Mock(),
+        checkout_timeout=0.1,
+    )
 
 class TestEngineService(unittest.TestCase):
     
     def setUp(self):
+        # Analyse every position with the mocked engine unless a test opts into caching
+        self.cache = EvalCache(max_entries=0, max_rows=0)
+        cache_patcher = patch('core.services.engine.get_eval_cache', return_value=self.cache)
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
         self.sample_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
         self.sample_pgn = """[Event "Test Game"]
 [Site "Test Site"]
@@ -15,42 +56,63 @@ class TestEngineService(unittest.TestCase):
 
 1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. d3 d6 5. Nc3 Nf6 6. Bg5 h6 7. Bh4 g5 8. Bg3 Nh5 9. Nxe5 Nxe5 10. d4 Bxd4 11. Qxd4 Nc6 12. Qh4 Nf6 13. Bxf7+ Rxf7 14. Qxf6 Qe7 15. Qxe7+ Nxe7 16. Nxd6 cxd6 17. Rfe1 Be6 18. Rxe6 Nc6 19. Rae1 Rf8 20. Rxc6 bxc6 21. Rxe7 1-0"""
     
-    @patch('core.services.engine.ENGINE')
-    def test_analyse_fen_success(self, mock_engine):
+    @patch('core.services.engine.get_pool')
+    def test_analyse_fen_success(self, mock_get_pool):
         """Test successful FEN analysis"""
-        mock_engine.set_fen_position.return_value = None
-        mock_engine.get_top_moves.return_value = [
-            {'Move': 'e4', 'Centipawn': 34},
-            {'Move': 'd4', 'Centipawn': 12}
-        ]
-        mock_engine.get_evaluation.return_value = {'type': 'cp', 'value': 34}
+        mock_engine = Mock()
+        mock_get_pool.return_value = make_pool(mock_engine)
+        mock_engine.analyse.return_value = make_infos(('e2e4', 34), ('d2d4', 12))
         
         result = _analyse_fen(self.sample_fen)
         
         self.assertEqual(result['eval']['type'], 'cp')
         self.assertEqual(result['eval']['value'], 34)
         self.assertEqual(len(result['lines']), 2)
-        self.assertEqual(result['lines'][0]['Move'], 'e4')
+        self.assertEqual(result['lines'][0], {'Move': 'e2e4', 'Centipawn': 34, 'Mate': None})
+        # Score and lines come from a single MultiPV search
+        mock_engine.analyse.assert_called_once()
+        self.assertEqual(mock_engine.analyse.call_args.kwargs['multipv'], 3)
     
-    @patch('core.services.engine.ENGINE')
-    def test_analyse_fen_engine_error(self, mock_engine):
+    def test_analyse_fen_scores_from_white_point_of_view(self):
+        """Test scores relative to the side to move are reported for White"""
+        mock_engine = Mock()
+        mock_engine.analyse.return_value = make_infos(
+            ('e7e5', 20), ('d8h4', chess.engine.Mate(2)), pov=chess.BLACK
+        )
+        fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+        
+        result = _analyse_fen(fen, mock_engine)
+        
+        self.assertEqual(result['eval'], {'type': 'cp', 'value': -20})
+        self.assertEqual(result['lines'][1], {'Move': 'd8h4', 'Centipawn': None, 'Mate': -2})
+    
+    def test_analyse_fen_engine_error(self):
         """Test FEN analysis when engine fails"""
-        mock_engine.set_fen_position.side_effect = Exception("Engine error")
+        mock_engine = Mock()
+        mock_engine.analyse.side_effect = Exception("Engine error")
         
-        result = _analyse_fen(self.sample_fen)
+        result = _analyse_fen(self.sample_fen, mock_engine)
         
         self.assertEqual(result['eval']['type'], 'cp')
         self.assertEqual(result['eval']['value'], 0)
         self.assertEqual(result['lines'], [])
     
-    @patch('core.services.engine.ENGINE')
-    def test_analyse_pgn_success(self, mock_engine):
+    @patch('core.services.engine.get_pool')
+    def test_analyse_fen_no_engine(self, mock_get_pool):
+        """Test FEN analysis when no engine can be started"""
+        mock_get_pool.return_value = make_pool(Exception("stockfish not found"))
+        
+        result = _analyse_fen(self.sample_fen)
+        
+        self.assertEqual(result['eval']['value'], 0)
+        self.assertEqual(result['lines'], [])
+    
+    @patch('core.services.engine.get_pool')
+    def test_analyse_pgn_success(self, mock_get_pool):
         """Test successful PGN analysis"""
-        mock_engine.set_fen_position.return_value = None
-        mock_engine.get_top_moves.return_value = [
-            {'Move': 'e4', 'Centipawn': 34}
-        ]
-        mock_engine.get_evaluation.return_value = {'type': 'cp', 'value': 34}
+        mock_engine = Mock()
+        mock_get_pool.return_value = make_pool(mock_engine)
+        mock_engine.analyse.return_value = make_infos(('e2e4', 34))
         
         result = analyse_pgn(self.sample_pgn)
         
@@ -58,31 +120,409 @@ class TestEngineService(unittest.TestCase):
         self.assertGreater(len(result), 0)
         self.assertEqual(result[0]['eval']['type'], 'cp')
         self.assertEqual(result[0]['eval']['value'], 34)
+        # The engine goes back to the pool once the game is done
+        self.assertEqual(mock_get_pool.return_value.stats()['in_use'], 0)
+        self.assertEqual(mock_get_pool.return_value.stats()['idle'], 1)
+    
+    @patch('core.services.engine.get_pool')
+    def test_analyse_pgn_restarts_crashed_engine(self, mock_get_pool):
+        """Test a crashed engine is replaced in the middle of a game"""
+        crashed = Mock()
+        crashed.analyse.side_effect = [make_infos(('e2e4', 34)), BrokenPipeError("engine died")]
+        fresh = Mock()
+        fresh.analyse.return_value = make_infos(('e7e5', 20))
+        pool = make_pool(crashed, fresh, is_alive=lambda engine: engine is not crashed)
+        mock_get_pool.return_value = pool
+        
+        result = analyse_pgn(self.sample_pgn)
+        
+        self.assertEqual(result[1]['lines'], [])
+        self.assertEqual(result[2]['eval']['value'], 20)
+        self.assertEqual(pool.stats()['restarts'], 1)
+        self.assertEqual(pool.stats()['alive'], 1)
+    
+    @patch('core.services.engine.get_pool')
+    def test_analyse_pgn_cached_positions_skip_engine(self, mock_get_pool):
+        """Test a repeated game is answered from the cache without an engine"""
+        self.cache.max_entries = 1000
+        mock_engine = Mock()
+        mock_engine.analyse.return_value = make_infos(('e2e4', 34))
+        pool = make_pool(mock_engine)
+        mock_get_pool.return_value = pool
+        
+        first = analyse_pgn(self.sample_pgn)
+        searches = mock_engine.analyse.call_count
+        pool.checkout = Mock(side_effect=AssertionError("engine should not be needed"))
+        second = analyse_pgn(self.sample_pgn)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(mock_engine.analyse.call_count, searches)
     
     def test_analyse_pgn_invalid_pgn(self):
         """Test PGN analysis with invalid PGN"""
         result = analyse_pgn("invalid pgn")
         self.assertEqual(result, [])
     
-    @patch('core.services.engine.ENGINE')
-    def test_get_engine_info_success(self, mock_engine):
+    @patch('core.services.engine.get_pool')
+    def test_get_engine_info_success(self, mock_get_pool):
         """Test getting engine info when engine is available"""
-        mock_engine.depth = 18
-        mock_engine.parameters = {'Threads': 2}
+        mock_get_pool.return_value = make_pool(Mock(), size=2)
         
         result = get_engine_info()
         
         self.assertEqual(result['status'], 'ok')
         self.assertEqual(result['name'], 'Stockfish')
         self.assertEqual(result['depth'], 18)
+        self.assertEqual(result['pool']['size'], 2)
     
-    @patch('core.services.engine.ENGINE', None)
-    def test_get_engine_info_no_engine(self):
+    @patch('core.services.engine.get_pool')
+    def test_get_engine_info_no_engine(self, mock_get_pool):
         """Test getting engine info when engine is not available"""
+        mock_get_pool.side_effect = Exception("Engine not available")
+        
         result = get_engine_info()
         
         self.assertEqual(result['status'], 'error')
         self.assertIn('Engine not available', result['message'])
 
+    @patch('core.services.engine.get_pool')
+    def test_iter_analysis_closing_returns_engine(self, mock_get_pool):
+        """Test abandoning the generator mid-game checks the engine back in"""
+        mock_engine = Mock()
+        mock_engine.analyse.return_value = make_infos(('e2e4', 34))
+        pool = make_pool(mock_engine)
+        mock_get_pool.return_value = pool
+        
+        analysis = iter_analysis(self.sample_pgn)
+        next(analysis)
+        self.assertEqual(pool.stats()['in_use'], 1)
+        analysis.close()
+        
+        self.assertEqual(pool.stats()['in_use'], 0)
+        self.assertEqual(mock_engine.analyse.call_count, 1)
+
+def searched_depths(engine):
+    """Depths of every search run on a mock engine, in order"""
+    return [call.args[1].depth for call in engine.analyse.call_args_list]
+
+@override_settings(ENGINE_MIN_DEPTH=10, ENGINE_DEPTH=18, ENGINE_GAME_TIME=None)
+class TestAdaptiveAnalysis(SimpleTestCase):
+    
+    def setUp(self):
+        self.engine = Mock()
+        self.pool = make_pool(self.engine)
+        for target, value in [('get_pool', self.pool),
+                              ('get_eval_cache', EvalCache(max_entries=0, max_rows=0))]:
+            patcher = patch(f'core.services.engine.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_quiet_positions_stay_shallow(self):
+        """Test a game without swings is searched once per position at the minimum depth"""
+        self.engine.analyse.return_value = make_infos(('e2e4', 20))
+        
+        result = analyse_pgn("1. e4 e5 2. Nf3 Nc6 *", adaptive=True)
+        
+        self.assertEqual(len(result), 5)
+        self.assertEqual(searched_depths(self.engine), [10] * 5)
+    
+    def test_fixed_depth_without_adaptive(self):
+        """Test every position gets ENGINE_DEPTH when adaptive mode is off"""
+        self.engine.analyse.return_value = make_infos(('e2e4', 20))
+        
+        analyse_pgn("1. e4 e5 *", adaptive=False)
+        
+        self.assertEqual(searched_depths(self.engine), [18] * 3)
+    
+    def test_eval_swing_deepens(self):
+        """Test a swing since the previous ply deepens until the search is stable"""
+        evals = iter([20, -300, -300, -300])
+        self.engine.analyse.side_effect = lambda *args, **kwargs: make_infos(('e7e5', next(evals)))
+        
+        result = analyse_pgn("1. e4 e5 *", adaptive=True)
+        
+        # Ply 1 swung by 320cp: searched again at 14, stable there
+        self.assertEqual(searched_depths(self.engine), [10, 10, 14, 10])
+        self.assertEqual(result[1]['eval']['value'], -300)
+    
+    def test_best_move_change_deepens(self):
+        """Test a best move changing between depths goes on to full depth"""
+        lines = iter([('e2e4', 20), ('d7d5', -300), ('e7e5', -300), ('e7e5', -300), ('g1f3', -300)])
+        self.engine.analyse.side_effect = lambda *args, **kwargs: make_infos(next(lines))
+        
+        analyse_pgn("1. e4 e5 *", adaptive=True)
+        
+        self.assertEqual(searched_depths(self.engine), [10, 10, 14, 18, 10])
+    
+    def test_decided_game_stays_shallow(self):
+        """Test swings between lost positions are not searched deeper"""
+        evals = iter([900, 1500, chess.engine.Mate(3)])
+        self.engine.analyse.side_effect = lambda *args, **kwargs: make_infos(('e2e4', next(evals)))
+        
+        analyse_pgn("1. e4 e5 *", adaptive=True)
+        
+        self.assertEqual(searched_depths(self.engine), [10, 10, 10])
+    
+    def test_forced_move_searched_once(self):
+        """Test a position with a single legal move is never deepened"""
+        evals = iter([0, 400, 400])
+        self.engine.analyse.side_effect = lambda *args, **kwargs: make_infos(('g8f7', next(evals)))
+        
+        # After 1. Ra8+ Black's only legal move is Kf7
+        analyse_pgn('[FEN "6k1/6pp/8/8/8/8/8/R5K1 w - - 0 1"]\n\n1. Ra8+ Kf7 *', adaptive=True)
+        
+        # The swing on the forced ply would otherwise deepen it
+        self.assertEqual(searched_depths(self.engine), [10, 10, 10])
+
+@override_settings(ENGINE_DEPTH=18)
+class TestGameSession(SimpleTestCase):
+    
+    def setUp(self):
+        self.engine = Mock()
+        self.searches = []
+        
+        def analyse(board, limit, **kwargs):
+            # The board is reused between plies, so record what it held at the call
+            self.searches.append((len(board.move_stack), kwargs['game']))
+            return make_infos(('e2e4', 10 * len(board.move_stack)))
+        
+        self.engine.analyse.side_effect = analyse
+        for target, value in [('get_pool', make_pool(self.engine)),
+                              ('get_eval_cache', EvalCache(max_entries=0, max_rows=0))]:
+            patcher = patch(f'core.services.engine.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_positions_sent_with_moves_in_one_game(self):
+        """Test each ply is searched with the moves leading to it, as one engine game"""
+        analyse_pgn("1. e4 e5 2. Nf3 *", adaptive=False)
+        analyse_pgn("1. d4 *", adaptive=False)
+        
+        self.assertEqual([plies for plies, _ in self.searches], [0, 1, 2, 3, 0, 1])
+        games = [game for _, game in self.searches]
+        self.assertEqual(len(set(games[:4])), 1)
+        self.assertNotIn(games[0], games[4:])
+    
+    def test_backward_analysis(self):
+        """Test backward analysis searches the last ply first and returns game order"""
+        result = analyse_pgn("1. e4 e5 2. Nf3 *", adaptive=False, backward=True)
+        
+        self.assertEqual([plies for plies, _ in self.searches], [3, 2, 1, 0])
+        self.assertEqual([ply['eval']['value'] for ply in result], [0, 10, 20, 30])
+    
+    @override_settings(ENGINE_BACKWARD=True)
+    def test_streaming_stays_forward(self):
+        """Test streamed analysis ignores ENGINE_BACKWARD so plies arrive as they finish"""
+        async def collect():
+            return [result async for result in aiter_analysis("1. e4 e5 *")]
+        
+        asyncio.run(collect())
+        
+        self.assertEqual([plies for plies, _ in self.searches], [0, 1, 2])
+    
+    @override_settings(STOCKFISH_PATH=__file__)
+    def test_bench_command(self):
+        """Test the benchmark runs every mode on its own engine"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.pgn")
+            with open(path, "w") as f:
+                f.write("1. e4 e5 2. Nf3 *\n\n1. d4 *\n")
+            out = StringIO()
+            with patch('core.management.commands.bench_engine._start_engine', return_value=self.engine), \
+                    patch('core.management.commands.bench_engine._stop_engine') as stop:
+                call_command('bench_engine', path, '--depth', '8', stdout=out)
+        
+        self.assertEqual(stop.call_count, 3)
+        # fen, forward then backward: bare FENs first, then the moves from the start
+        self.assertEqual([plies for plies, _ in self.searches], [0] * 6 + [0, 1, 2, 3, 0, 1] + [3, 2, 1, 0, 1, 0])
+        # A new engine game for every FEN, one per game otherwise
+        self.assertEqual(len({id(game) for _, game in self.searches[:6]}), 6)
+        self.assertEqual(len({id(game) for _, game in self.searches[6:10]}), 1)
+        self.assertIn('backward', out.getvalue())
+    
+    def test_cache_can_be_bypassed(self):
+        """Test cached positions are searched again when the cache is not wanted"""
+        cache = EvalCache(max_entries=100, max_rows=0)
+        with patch('core.services.engine.get_eval_cache', return_value=cache):
+            analyse_pgn("1. e4 *", adaptive=False)
+            analyse_pgn("1. e4 *", adaptive=False)
+            analyse_pgn("1. e4 *", adaptive=False, cached=False)
+        
+        self.assertEqual(len(self.searches), 4)
+
+class TestSearchBudget(unittest.TestCase):
+    
+    def test_depth_steps(self):
+        """Test searches step from the minimum depth to the maximum"""
+        budget = SearchBudget(10, min_depth=10, max_depth=18)
+        self.assertEqual(budget.depths, [10, 14, 18])
+        self.assertEqual(SearchBudget(10, min_depth=18, max_depth=18).depths, [18])
+    
+    def test_no_time_limit(self):
+        """Test without a game time every search may run to depth"""
+        budget = SearchBudget(10, min_depth=10, max_depth=18)
+        budget.start_position()
+        budget.spend(100)
+        self.assertIsNone(budget.search_time())
+        self.assertTrue(budget.has_time())
+    
+    def test_game_time_is_shared_between_positions(self):
+        """Test a position's search time comes from the remaining game time"""
+        budget = SearchBudget(10, min_depth=10, max_depth=18, game_time=10)
+        budget.start_position()
+        
+        # One second per position, up to three for a critical one
+        self.assertAlmostEqual(budget.search_time(), 3.0)
+        budget.spend(2.5)
+        self.assertTrue(budget.has_time())
+        self.assertAlmostEqual(budget.search_time(), 0.5)
+        budget.spend(0.5)
+        self.assertFalse(budget.has_time())
+        budget.finish_position()
+        
+        # The next positions share what is left
+        budget.start_position()
+        self.assertAlmostEqual(budget.search_time(), 7 / 9 * 3)
+    
+    def test_time_saved_on_quiet_positions_goes_to_later_ones(self):
+        """Test quick positions leave more time for the rest of the game"""
+        budget = SearchBudget(4, min_depth=10, max_depth=18, game_time=4)
+        for _ in range(3):
+            budget.start_position()
+            budget.spend(0.1)
+            budget.finish_position()
+        
+        budget.start_position()
+        self.assertAlmostEqual(budget.search_time(), 3.7 * 3)
+    
+    def test_exhausted_budget_stops_deepening(self):
+        """Test no deeper search once the game time is used up"""
+        budget = SearchBudget(2, min_depth=10, max_depth=18, game_time=1)
+        budget.start_position()
+        budget.spend(5)
+        result = {"eval": {"type": "cp", "value": -300}, "lines": [{"Move": "e7e5"}]}
+        
+        self.assertFalse(budget.needs_deeper(result, None, {"type": "cp", "value": 20}))
+        self.assertEqual(budget.search_time(), 0.05)
+
+class TestAsyncAnalysis(unittest.IsolatedAsyncioTestCase):
+    
+    def setUp(self):
+        self.sample_pgn = "1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0"
+        self.engine = Mock()
+        self.engine.analyse.return_value = make_infos(('e2e4', 34))
+        self.pool = make_pool(self.engine)
+        for target, value in [('get_pool', self.pool),
+                              ('get_eval_cache', EvalCache(max_entries=0, max_rows=0))]:
+            patcher = patch(f'core.services.engine.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    async def test_aiter_analysis_yields_every_position(self):
+        """Test the async iterator yields the initial position and every move"""
+        results = [result async for result in aiter_analysis(self.sample_pgn)]
+        
+        self.assertEqual(len(results), 7)
+        self.assertEqual(results[0]['eval']['value'], 34)
+    
+    async def test_aiter_analysis_is_bounded_by_consumer(self):
+        """Test the engine thread only runs a few positions ahead of a slow consumer"""
+        async for _ in aiter_analysis(self.sample_pgn, buffer=1):
+            await asyncio.sleep(0.05)
+            # One position delivered, at most one more waiting for credit
+            self.assertLessEqual(self.engine.analyse.call_count, 3)
+            break
+    
+    async def test_aiter_analysis_early_exit_returns_engine(self):
+        """Test leaving the loop early stops the analysis thread"""
+        async for _ in aiter_analysis(self.sample_pgn, buffer=1):
+            break
+        
+        for _ in range(50):
+            if self.pool.stats()['in_use'] == 0:
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+        self.assertLess(self.engine.analyse.call_count, 7)
+
+class TestEnginePool(unittest.TestCase):
+    
+    def test_checkin_reuses_engine(self):
+        """Test a checked-in engine is handed out again instead of a new process"""
+        engine = Mock()
+        pool = make_pool(engine, Mock())
+        
+        with pool.engine() as first:
+            pass
+        with pool.engine() as second:
+            pass
+        
+        self.assertIs(first, engine)
+        self.assertIs(second, engine)
+        self.assertEqual(pool.stats()['alive'], 1)
+    
+    def test_checkout_is_bounded(self):
+        """Test checkout times out when every engine is in use"""
+        pool = make_pool(Mock(), Mock())
+        engine = pool.checkout()
+        
+        with self.assertRaises(EnginePoolTimeout):
+            pool.checkout(timeout=0.01)
+        
+        pool.checkin(engine)
+        self.assertIs(pool.checkout(), engine)
+    
+    def test_crashed_idle_engine_is_replaced(self):
+        """Test a dead idle engine is discarded and a fresh one started"""
+        crashed, fresh = Mock(), Mock()
+        pool = make_pool(crashed, fresh, is_alive=lambda engine: engine is not crashed)
+        pool.checkin(pool.checkout())
+        
+        self.assertIs(pool.checkout(), fresh)
+        self.assertEqual(pool.stats()['restarts'], 1)
+        pool._close.assert_called_once_with(crashed)
+    
+    def test_engine_discarded_after_crash_in_block(self):
+        """Test an engine that dies inside the with-block is not reused"""
+        crashed = Mock()
+        pool = make_pool(crashed, is_alive=lambda engine: False)
+        
+        with self.assertRaises(RuntimeError):
+            with pool.engine():
+                raise RuntimeError("engine died")
+        
+        self.assertEqual(pool.stats(), {'size': 1, 'alive': 0, 'in_use': 0, 'idle': 0, 'restarts': 0, 'waiting': 0})
+    
+    def test_start_failure_releases_slot(self):
+        """Test a failing engine start does not leak a pool slot"""
+        engine = Mock()
+        pool = make_pool(OSError("stockfish not found"), engine)
+        
+        with self.assertRaises(EnginePoolError):
+            pool.checkout()
+        
+        self.assertIs(pool.checkout(), engine)
+    
+    def test_concurrent_checkouts_get_distinct_engines(self):
+        """Test parallel analyses each own a separate engine"""
+        engines = [Mock() for _ in range(3)]
+        pool = make_pool(*engines, size=3)
+        barrier = threading.Barrier(3)
+        seen = []
+        
+        def worker():
+            with pool.engine() as engine:
+                barrier.wait(timeout=1)
+                seen.append(engine)
+        
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(set(map(id, seen))), 3)
+        self.assertEqual(pool.stats()['in_use'], 0)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,92 @@
+from django.test import TestCase
+from core.models import PositionEval
+from core.services.evalcache import EvalCache, normalize_fen
+
+class EvalCacheTestCase(TestCase):
+    
+    def setUp(self):
+        self.fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+        self.result = {
+            "eval": {"type": "cp", "value": 34},
+            "lines": [
+                {"Move": "e7e5", "Centipawn": 34, "Mate": None},
+                {"Move": "c7c5", "Centipawn": 40, "Mate": None},
+                {"Move": "e7e6", "Centipawn": 45, "Mate": None}
+            ]
+        }
+        self.cache = EvalCache(max_entries=100, max_rows=100)
+    
+    def test_normalize_fen_ignores_move_clocks(self):
+        """Test the same position at different move numbers shares a key"""
+        later = self.fen.replace("- 0 1", "- 4 12")
+        self.assertEqual(normalize_fen(self.fen), normalize_fen(later))
+        self.assertEqual(normalize_fen(self.fen), "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq -")
+    
+    def test_get_miss(self):
+        """Test an unknown position is a miss"""
+        self.assertIsNone(self.cache.get(self.fen, 18, 3))
+    
+    def test_put_then_get(self):
+        """Test a stored result is returned for the same settings"""
+        self.cache.put(self.fen, 18, 3, self.result)
+        self.assertEqual(self.cache.get(self.fen, 18, 3), self.result)
+    
+    def test_deeper_result_answers_shallower_request(self):
+        """Test a deeper, wider result is reused and trimmed to the requested lines"""
+        self.cache.put(self.fen, 22, 3, self.result)
+        
+        result = self.cache.get(self.fen, 18, 1)
+        
+        self.assertEqual(result["eval"], self.result["eval"])
+        self.assertEqual(len(result["lines"]), 1)
+        self.assertEqual(result["lines"][0]["Move"], "e7e5")
+    
+    def test_shallower_result_is_a_miss(self):
+        """Test a shallower result does not answer a deeper request"""
+        self.cache.put(self.fen, 12, 3, self.result)
+        self.assertIsNone(self.cache.get(self.fen, 18, 3))
+    
+    def test_persistent_tier_survives_process_cache(self):
+        """Test results come back from the database after the LRU is cleared"""
+        self.cache.put(self.fen, 18, 3, self.result)
+        self.cache.clear()
+        
+        self.assertEqual(self.cache.get(self.fen, 18, 3), self.result)
+        self.assertEqual(PositionEval.objects.count(), 1)
+    
+    def test_shallower_put_does_not_downgrade(self):
+        """Test storing a weaker result keeps the stronger one"""
+        self.cache.put(self.fen, 22, 3, self.result)
+        self.cache.clear()
+        self.cache.put(self.fen, 10, 1, {"eval": {"type": "cp", "value": 0}, "lines": []})
+        
+        row = PositionEval.objects.get()
+        self.assertEqual(row.depth, 22)
+        self.assertEqual(self.cache.get(self.fen, 22, 3), self.result)
+    
+    def test_returned_result_is_a_copy(self):
+        """Test callers cannot mutate cached results"""
+        self.cache.put(self.fen, 18, 3, self.result)
+        self.cache.get(self.fen, 18, 3)["eval"]["value"] = 999
+        
+        self.assertEqual(self.cache.get(self.fen, 18, 3)["eval"]["value"], 34)
+    
+    def test_lru_eviction(self):
+        """Test the in-process tier is bounded"""
+        cache = EvalCache(max_entries=2, max_rows=0)
+        fens = [f"8/8/8/8/8/8/8/K{i}k w - - 0 1" for i in range(1, 4)]
+        for fen in fens:
+            cache.put(fen, 18, 3, self.result)
+        
+        self.assertIsNone(cache.get(fens[0], 18, 3))
+        self.assertIsNotNone(cache.get(fens[2], 18, 3))
+    
+    def test_prune_keeps_most_recent_rows(self):
+        """Test the persistent tier is trimmed to max_rows"""
+        cache = EvalCache(max_entries=0, max_rows=2, prune_every=3)
+        fens = [f"8/8/8/8/8/8/8/K{i}k w - - 0 1" for i in range(1, 4)]
+        for fen in fens:
+            cache.put(fen, 18, 3, self.result)
+        
+        self.assertEqual(PositionEval.objects.count(), 2)
+        self.assertIsNone(cache.get(fens[0], 18, 3))
@@ -0,0 +1,99 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+from django.test import TestCase
+from django.urls import reverse
+from core.services.engine import analyse_pgn
+from core.services.evalcache import EvalCache
+from core.services.metrics import EVAL_CACHE_LOOKUPS, STAGE_SECONDS, Histogram, render, timed
+from .test_engine import make_infos, make_pool
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_cumulative_buckets(self):
+        """Test bucket counts are cumulative and observations above the last bound land in +Inf"""
+        histogram = Histogram("test_seconds", "Test", "stage", (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe("search", value)
+
+        lines = histogram.lines()
+        self.assertIn('test_seconds_bucket{stage="search",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="search",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{stage="search",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{stage="search"} 4', lines)
+        self.assertIn('test_seconds_sum{stage="search"} 3.65', lines)
+        self.assertEqual(lines[1], "# TYPE test_seconds histogram")
+
+    def test_concurrent_observations(self):
+        """Test observations from many threads are all counted"""
+        histogram = Histogram("test_seconds", "Test", "stage", (1.0,))
+        threads = [
+            threading.Thread(target=lambda: [histogram.observe("search", 0.5) for _ in range(1000)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(histogram.count("search"), 4000)
+
+    def test_timed_records_failures(self):
+        """Test a stage that raises is still timed"""
+        before = STAGE_SECONDS.count("pgn_parse")
+        with self.assertRaises(ValueError):
+            with timed("pgn_parse"):
+                raise ValueError("bad PGN")
+        self.assertEqual(STAGE_SECONDS.count("pgn_parse"), before + 1)
+
+    def test_render_gauges(self):
+        """Test gauges are written with their type after the counters and histograms"""
+        text = render({"test_in_use": ("Engines in use", 2)})
+        self.assertIn("# TYPE test_in_use gauge\ntest_in_use 2\n", text)
+        self.assertTrue(text.endswith("\n"))
+
+class MetricsViewTestCase(TestCase):
+
+    def setUp(self):
+        self.engine = Mock()
+        self.engine.analyse.return_value = make_infos(('e2e4', 20))
+        self.pool = make_pool(self.engine, size=2)
+        patcher = patch('core.services.engine.get_pool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        view_patcher = patch('core.views.get_pool', return_value=self.pool)
+        view_patcher.start()
+        self.addCleanup(view_patcher.stop)
+
+    def test_analysis_stages_timed(self):
+        """Test parsing, checkout, search and cache lookups of an analysis are recorded"""
+        stages = ("pgn_parse", "engine_checkout", "engine_search", "cache_lookup")
+        before = {stage: STAGE_SECONDS.count(stage) for stage in stages}
+        misses = EVAL_CACHE_LOOKUPS.value("miss")
+
+        with patch('core.services.engine.get_eval_cache', return_value=EvalCache(max_entries=10, max_rows=0)):
+            analyse_pgn("1. a3 a6 2. h3 *", adaptive=False)
+
+        self.assertEqual(STAGE_SECONDS.count("pgn_parse"), before["pgn_parse"] + 1)
+        self.assertEqual(STAGE_SECONDS.count("engine_checkout"), before["engine_checkout"] + 1)
+        self.assertEqual(STAGE_SECONDS.count("engine_search"), before["engine_search"] + 4)
+        self.assertEqual(STAGE_SECONDS.count("cache_lookup"), before["cache_lookup"] + 4)
+        self.assertEqual(EVAL_CACHE_LOOKUPS.value("miss"), misses + 4)
+
+    def test_metrics_endpoint(self):
+        """Test /metrics serves stage histograms and the engine pool in the Prometheus text format"""
+        self.pool.checkout()
+        with patch('core.services.engine.get_eval_cache', return_value=EvalCache(max_entries=0, max_rows=0)):
+            analyse_pgn("1. a3 *", adaptive=False)
+
+        response = self.client.get(reverse('core:metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE chess_analysis_stage_seconds histogram', text)
+        self.assertIn('chess_analysis_stage_seconds_count{stage="engine_search"}', text)
+        self.assertIn('chess_analysis_eval_cache_lookups_total{result="miss"}', text)
+        self.assertIn('chess_analysis_engine_pool_size 2\n', text)
+        self.assertIn('chess_analysis_engine_pool_in_use 1\n', text)
+        self.assertIn('chess_analysis_engine_pool_waiting 0\n', text)
+        self.assertIn('chess_analysis_jobs_running 0\n', text)
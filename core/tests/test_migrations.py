@@ -0,0 +1,54 @@
+import importlib
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from core.utils.accuracy import game_stats
+from core.utils.snapshot import pack_snapshot, unpack_snapshot
+
+RESULTS = [
+    {"eval": {"type": "cp", "value": 20}, "lines": [], "source": "book"},
+    {"eval": {"type": "cp", "value": 35}, "lines": [
+        {"Move": "e7e5", "Centipawn": 35, "Mate": None},
+        {"Move": "c7c5", "Centipawn": 40000, "Mate": None},
+    ]},
+    {"eval": {"type": "mate", "value": -2}, "lines": [
+        {"Move": "a2a1q", "Centipawn": None, "Mate": -2},
+    ], "source": "tablebase"},
+    {"eval": {"type": "mate", "value": 0}, "lines": []},
+]
+
+class TestSnapshotCodecMigration(TransactionTestCase):
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([("core", target)])
+        return executor.loader.project_state([("core", target)]).apps
+
+    def tearDown(self):
+        self.migrate("0011_analysissnapshot_codec")
+
+    def test_json_snapshots_repacked_in_the_codec(self):
+        """Test 0011 repacks snapshots byte for byte as pack_snapshot() would, dropping unreadable ones"""
+        apps = self.migrate("0010_analysissnapshot")
+        pack_analysis = importlib.import_module("core.migrations.0010_analysissnapshot").pack_analysis
+        AnalysisSnapshot = apps.get_model("core", "AnalysisSnapshot")
+        stats = game_stats(RESULTS)
+        AnalysisSnapshot.objects.create(
+            pgn_hash="a" * 64, depth=14, multipv=3, data=pack_analysis(RESULTS, stats), etag="old"
+        )
+        bad = [{"eval": {"type": "cp", "value": 0}, "lines": [{"Move": "e9e4", "Centipawn": 0, "Mate": None}]}]
+        AnalysisSnapshot.objects.create(
+            pgn_hash="b" * 64, depth=14, multipv=3, data=pack_analysis(bad, None), etag="old"
+        )
+
+        with self.assertLogs("core.migrations.0011_analysissnapshot_codec", "WARNING"):
+            apps = self.migrate("0011_analysissnapshot_codec")
+
+        snapshot = apps.get_model("core", "AnalysisSnapshot").objects.get()
+        self.assertEqual(snapshot.pgn_hash, "a" * 64)
+        self.assertEqual(bytes(snapshot.data), pack_snapshot(RESULTS, stats, depth=14, multipv=3))
+        self.assertNotEqual(snapshot.etag, "old")
+        results, repacked_stats = unpack_snapshot(snapshot.data)
+        self.assertEqual(repacked_stats, stats)
+        self.assertEqual(results[2]["source"], "tablebase")
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Game, OpeningMove, OpeningNode, Player
+from core.services import openings
+from core.services.chesscom import _store_month, ApiResponse
+from .helpers import make_raw, store
+
+class OpeningTreeTestCase(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create(username="testuser")
+        self.raws = [
+            make_raw(1, "1. e4 e5 2. Nf3 Nc6 {[%clk 0:02:58]} 3. Bb5"),
+            make_raw(2, "1. e4 c5 2. Nf3"),
+            make_raw(3, "1. Nf3 e5 2. e4", white_result="agreed", black_result="agreed"),
+            make_raw(4, "1. d4 d5", white="bob", black="TestUser", white_result="win", black_result="resigned"),
+        ]
+
+    def test_root_counts_and_moves(self):
+        """Test the root lists each first move with its games and results"""
+        store(self.player, self.raws)
+
+        tree = openings.opening_tree("testuser", colour="white")
+
+        self.assertEqual(tree["games"], 3)
+        self.assertEqual([(m["san"], m["games"]) for m in tree["moves"]], [("e4", 2), ("Nf3", 1)])
+        self.assertEqual(tree["moves"][0]["wins"], 2)
+        self.assertEqual(tree["moves"][1]["draws"], 1)
+
+    def test_subtree_below_position(self):
+        """Test a subtree can be read from any position, several levels deep"""
+        store(self.player, self.raws)
+
+        tree = openings.opening_tree("testuser", moves=["e2e4"], colour="white", depth=2)
+
+        self.assertEqual([m["san"] for m in tree["moves"]], ["c5", "e5"])
+        self.assertEqual([m["san"] for m in tree["moves"][1]["moves"]], ["Nf3"])
+
+    def test_transpositions_share_a_position(self):
+        """Test positions reached by different move orders count together"""
+        store(self.player, self.raws)
+
+        tree = openings.opening_tree("testuser", moves=["e2e4", "e7e5", "g1f3"], colour="white")
+
+        # 1. e4 e5 2. Nf3 and 1. Nf3 e5 2. e4
+        self.assertEqual(tree["games"], 2)
+        self.assertEqual(tree["wins"], 1)
+        self.assertEqual(tree["draws"], 1)
+
+    def test_colours_combined_by_default(self):
+        """Test both colours are counted unless one is asked for"""
+        store(self.player, self.raws)
+
+        self.assertEqual(openings.opening_tree("testuser")["games"], 4)
+        self.assertEqual(openings.opening_tree("testuser", colour="black")["moves"][0]["san"], "d4")
+
+    def test_synced_games_update_tree(self):
+        """Test games stored by a sync are added to a built tree like a rebuild would count them"""
+        store(self.player, self.raws[:2])
+        openings.opening_tree("testuser")
+
+        _store_month(self.player, 2024, 1, None, ApiResponse(200, {"games": self.raws}, {}), None)
+        incremental = (
+            sorted(OpeningNode.objects.values_list("colour", "key", "games", "wins", "draws", "losses")),
+            sorted(OpeningMove.objects.values_list("colour", "parent", "uci", "child", "games", "wins")),
+        )
+        openings.rebuild_tree("testuser")
+        rebuilt = (
+            sorted(OpeningNode.objects.values_list("colour", "key", "games", "wins", "draws", "losses")),
+            sorted(OpeningMove.objects.values_list("colour", "parent", "uci", "child", "games", "wins")),
+        )
+
+        self.assertEqual(incremental, rebuilt)
+
+    def tree_rows(self):
+        return sorted(OpeningNode.objects.values_list("colour", "key", "games", "wins", "draws", "losses"))
+
+    def test_concurrent_sync_increments_kept(self):
+        """Test counts another sync adds while a merge runs are added to, not overwritten"""
+        store(self.player, self.raws[:2])
+        openings.opening_tree("testuser")
+        in_chunks = openings._in_chunks
+        committed = []
+
+        def other_sync_commits(queryset, field, values, size=500):
+            rows = in_chunks(queryset, field, values, size)
+            if queryset.model is OpeningNode and not committed:
+                committed.append(OpeningNode.objects.filter(player=self.player).update(games=F("games") + 1))
+            return rows
+
+        with patch('core.services.openings._in_chunks', side_effect=other_sync_commits):
+            openings.add_games_to_tree(self.player, store(self.player, self.raws[2:3]))
+        bumped = [(colour, key, games - 1) for colour, key, games, *_ in self.tree_rows()]
+        openings.rebuild_tree("testuser")
+
+        self.assertEqual(bumped, [(colour, key, games) for colour, key, games, *_ in self.tree_rows()])
+
+    def test_games_stored_concurrently_counted_once(self):
+        """Test games another sync stored first are not added to the tree again"""
+        store(self.player, self.raws[:2])
+        openings.opening_tree("testuser")
+
+        # As if another sync stored the games after this one looked for them
+        with patch.object(Game.objects, 'filter', return_value=Game.objects.none()):
+            _store_month(self.player, 2024, 1, None, ApiResponse(200, {"games": self.raws}, {}), None)
+        incremental = self.tree_rows()
+        openings.rebuild_tree("testuser")
+
+        self.assertEqual(incremental, self.tree_rows())
+
+    def test_opening_tree_api(self):
+        """Test the API returns the subtree as JSON"""
+        store(self.player, self.raws)
+
+        response = self.client.get(
+            reverse('core:opening_tree', kwargs={'username': 'testuser'}),
+            {'moves': 'e2e4', 'colour': 'white'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["games"], 2)
+
+    def test_opening_tree_api_errors(self):
+        """Test an illegal move is a bad request and an unknown player is not found"""
+        store(self.player, self.raws)
+        url = reverse('core:opening_tree', kwargs={'username': 'testuser'})
+
+        self.assertEqual(self.client.get(url, {'moves': 'e2e5'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'colour': 'red'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('core:opening_tree', kwargs={'username': 'nobody'})).status_code, 404
+        )
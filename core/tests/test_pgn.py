@@ -0,0 +1,82 @@
+import io
+
+import chess
+import chess.pgn
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from ..utils.pgn import mainline_moves, parse_mainline
+
+CHESSCOM_PGN = """[Event "Live Chess"]
+[Site "Chess.com"]
+[White "alice"]
+[Black "bob \\"the rook\\""]
+[Result "1-0"]
+
+1. e4 {[%clk 0:02:59.9]} 1... e5 {[%clk 0:02:58.1]} 2. Nf3 $1 {[%clk 0:02:57]}
+(2. Qh5 {[%clk 0:01:00]} Nc6 (2... g6) 3. Bc4) 2... Nc6 {[%clk 0:02:55]} ; a line comment 3. Qxe5
+3. Bb5 {a note} a6 4. Ba4 {[%clk 1:00:01]} Nf6 5. O-O Be7 6. Re1 b5 7. Bb3 d6 8. c3 O-O
+9. h3 Na5 10. Bc2 c5 11. d4 Qc7 12. Nbd2 cxd4 13. cxd4 Nc6 14. Nb3 a5 15. Be3 a4 16. Nbd2 Bd7 1-0"""
+
+def read_mainline(pgn_text):
+    game = chess.pgn.read_game(io.StringIO(pgn_text))
+    return game.board(), list(game.mainline_moves())
+
+class MainlinePgnTestCase(SimpleTestCase):
+
+    def test_matches_read_game(self):
+        """Test the mainline matches read_game, skipping variations, NAGs and comments"""
+        start, moves, _ = mainline_moves(CHESSCOM_PGN)
+        expected_start, expected_moves = read_mainline(CHESSCOM_PGN)
+
+        self.assertEqual(moves, expected_moves)
+        self.assertEqual(start, expected_start)
+        self.assertEqual(len(moves), 32)
+
+    def test_headers(self):
+        """Test headers are read with escaped quotes"""
+        headers = parse_mainline(CHESSCOM_PGN).headers
+
+        self.assertEqual(headers["Black"], 'bob "the rook"')
+        self.assertEqual(headers["Result"], "1-0")
+
+    def test_clocks(self):
+        """Test each mainline move gets the clock in its comment, or None"""
+        clocks = parse_mainline(CHESSCOM_PGN).clocks
+
+        self.assertEqual(clocks[:4], [179.9, 178.1, 177.0, 175.0])
+        self.assertIsNone(clocks[4])
+        self.assertEqual(clocks[6], 3601.0)
+        self.assertEqual(len(clocks), 32)
+
+    def test_setup_position_and_promotion(self):
+        """Test games from a FEN header start there, and promotions are read"""
+        pgn_text = """[SetUp "1"]
+[FEN "8/P6k/8/8/8/8/8/K7 w - - 0 1"]
+
+1. a8=Q Kg6 2. Qg8+ *"""
+        start, moves, _ = mainline_moves(pgn_text)
+
+        self.assertEqual(start.fen(), "8/P6k/8/8/8/8/8/K7 w - - 0 1")
+        self.assertEqual(moves, read_mainline(pgn_text)[1])
+        self.assertEqual(moves[0].promotion, chess.QUEEN)
+
+    def test_stops_at_illegal_move(self):
+        """Test moves after an illegal one are dropped along with their clocks"""
+        start, moves, clocks = mainline_moves('1. e4 {[%clk 0:01:00]} e5 2. Ke3 Nc6 *')
+
+        self.assertEqual([move.uci() for move in moves], ["e2e4", "e7e5"])
+        self.assertEqual(clocks, [60.0, None])
+
+    def test_stops_at_result(self):
+        """Test only the first game of the text is read"""
+        sans = parse_mainline('1. e4 e5 1-0\n\n1. d4 d5 0-1').sans
+
+        self.assertEqual(sans, ["e4", "e5"])
+
+    def test_bench_command(self):
+        """Test the benchmark reports every parser"""
+        out = io.StringIO()
+        call_command('bench_pgn', '--games', '5', '--repeat', '1', stdout=out)
+
+        self.assertIn('chess.pgn.read_game', out.getvalue())
+        self.assertIn('mainline_moves', out.getvalue())
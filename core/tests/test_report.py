@@ -0,0 +1,101 @@
+from unittest.mock import patch
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Game, Player, ReportBucket
+from core.services import report
+from core.services.chesscom import _store_month, ApiResponse
+from core.utils.ids import pgn_hash
+from .helpers import cp, make_raw, store
+
+class PlayerReportTestCase(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create(username="testuser")
+        self.raws = [
+            make_raw(1704067200, eco="C50"),  # Jan 2024, win as White
+            make_raw(1704153600, white="bob", black="TestUser", white_result="win",
+                     black_result="checkmated", white_rating=1610, black_rating=1500, eco="B01"),
+            make_raw(1706832000, eco="C50", white_result="agreed", black_result="agreed",
+                     time_class="rapid"),  # Feb 2024, draw
+        ]
+
+    def buckets(self):
+        return {
+            (b.dimension, b.key): (b.games, b.wins, b.draws, b.losses)
+            for b in ReportBucket.objects.filter(player=self.player)
+        }
+
+    def test_report_counts_every_dimension(self):
+        """Test results are split by colour, time class, opening, rating band and month"""
+        store(self.player, self.raws)
+
+        result = report.player_report("TestUser")
+
+        self.assertEqual(result["games"], 3)
+        self.assertEqual([(r["key"], r["wins"], r["draws"], r["losses"]) for r in result["by_colour"]],
+                         [("white", 1, 1, 0), ("black", 0, 0, 1)])
+        self.assertEqual([r["key"] for r in result["by_time_class"]], ["blitz", "rapid"])
+        self.assertEqual(result["openings"][0]["key"], "C50")
+        self.assertEqual([r["key"] for r in result["rating_bands"]], ["1400", "1600"])
+        self.assertEqual([(r["key"], r["games"]) for r in result["trend"]], [("2024-01", 2), ("2024-02", 1)])
+        self.assertEqual(result["by_colour"][0]["score"], 75.0)
+
+    def test_synced_games_update_report(self):
+        """Test games stored by a sync are added to a built report without recounting"""
+        store(self.player, self.raws[:1])
+        report.player_report("testuser")
+
+        response = ApiResponse(200, {"games": self.raws}, {})
+        added = _store_month(self.player, 2024, 1, None, response, None)
+        incremental = self.buckets()
+        report.rebuild_report("testuser")
+
+        self.assertEqual(added, 2)
+        self.assertEqual(incremental, self.buckets())
+        self.assertEqual(incremental[("colour", "white")], (2, 1, 1, 0))
+
+    def test_games_stored_concurrently_counted_once(self):
+        """Test games another sync stored first are not counted again"""
+        store(self.player, self.raws[:2])
+        report.player_report("testuser")
+
+        # As if another sync stored the games after this one looked for them
+        response = ApiResponse(200, {"games": self.raws}, {})
+        with patch.object(Game.objects, 'filter', return_value=Game.objects.none()):
+            added = _store_month(self.player, 2024, 1, None, response, None)
+        incremental = self.buckets()
+        report.rebuild_report("testuser")
+
+        self.assertEqual(added, 1)
+        self.assertEqual(incremental, self.buckets())
+        self.assertEqual(incremental[("colour", "white")], (2, 1, 1, 0))
+
+    def test_accuracy_recorded_once_per_game(self):
+        """Test analysing a game again replaces its accuracy instead of adding it twice"""
+        game, = store(self.player, self.raws[:1])
+        report.player_report("testuser")
+
+        report.record_accuracy(pgn_hash(game.pgn), [cp(20), cp(30), cp(25), cp(-300), cp(-290)])
+        first = Game.objects.get(pk=game.pk).accuracy
+        report.record_accuracy(pgn_hash(game.pgn), [cp(20), cp(30), cp(25), cp(20), cp(25)])
+        second = Game.objects.get(pk=game.pk).accuracy
+
+        bucket = ReportBucket.objects.get(player=self.player, dimension="colour", key="white")
+        self.assertLess(first, second)
+        self.assertEqual(bucket.accuracy_games, 1)
+        self.assertAlmostEqual(bucket.accuracy_sum, second)
+        self.assertEqual(report.player_report("testuser")["trend"][0]["accuracy"], round(second, 1))
+
+    def test_unknown_player(self):
+        """Test players without stored games have no report"""
+        self.assertIsNone(report.player_report("nobody"))
+
+    def test_report_view(self):
+        """Test the report page shows the player's totals"""
+        store(self.player, self.raws)
+
+        response = self.client.get(reverse('core:player_report', kwargs={'username': 'testuser'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '3 games')
+        self.assertContains(response, 'C50')
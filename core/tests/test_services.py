@@ -1,32 +1,94 @@
-from django.test import TestCase
+import asyncio
+import aiohttp
+from datetime import datetime, timezone
+from http import HTTPStatus
+import requests
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from unittest.mock import patch, MagicMock
-from core.services.chesscom import player_profile, player_games
+from core.models import Archive, Game, Player
+from core.services.chesscom import (
+    AsyncClient, ChessComError, aplayer_games, aplayer_profile, player_profile, player_games,
+    stored_games, sync_player_games,
+)
+from core.services.gamelist import apage_games, decode_cursor, parse_filters, query_games
+from core.utils.transform import massage_games
+from .helpers import make_raw
+
+ARCHIVES_URL = "https://api.chess.com/pub/player/testuser/games/archives"
+PROFILE_URL = "https://api.chess.com/pub/player/testuser"
+
+def make_response(payload=None, status=200, headers=None):
+    """Build a fake requests.Response"""
+    response = MagicMock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.json.return_value = payload
+    if status >= 400:
+        kind = "Client" if status < 500 else "Server"
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status} {kind} Error: {HTTPStatus(status).phrase}")
+    return response
+
+class FakeAsyncResponse:
+    """Stand-in for an aiohttp response used as an async context manager"""
+    
+    def __init__(self, payload=None, status=200, headers=None):
+        self.payload = payload
+        self.status = status
+        self.headers = headers or {}
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    async def json(self, content_type=None):
+        return self.payload
+
+class FakeAsyncSession:
+    """Stand-in for aiohttp.ClientSession answering from a URL -> response(s) map"""
+    
+    def __init__(self, responses):
+        self.responses = responses
+        self.requested = []
+    
+    def get(self, url, headers=None):
+        self.requested.append(url)
+        response = self.responses[url]
+        return response.pop(0) if isinstance(response, list) else response
 
 class ChessComServiceTestCase(TestCase):
     
-    @patch('core.services.chesscom.requests.get')
-    def test_player_profile_success(self, mock_get):
+    def setUp(self):
+        cache.clear()
+        self.session = MagicMock()
+        self.responses = {}
+        self.session.get.side_effect = self.respond
+        patcher = patch('core.services.chesscom.get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def respond(self, url, **kwargs):
+        response = self.responses[url]
+        response = response.pop(0) if isinstance(response, list) else response
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    def test_player_profile_success(self):
         """Test successful profile fetch"""
-        # Mock profile response
-        mock_profile_response = MagicMock()
-        mock_profile_response.json.return_value = {
+        self.responses[PROFILE_URL] = make_response({
             "username": "testuser",
             "title": "GM"
-        }
-        mock_profile_response.raise_for_status.return_value = None
-        
-        # Mock stats response
-        mock_stats_response = MagicMock()
-        mock_stats_response.json.return_value = {
+        })
+        self.responses[PROFILE_URL + "/stats"] = make_response({
             "chess_blitz": {
                 "last": {
                     "rating": 2500
                 }
             }
-        }
-        mock_stats_response.raise_for_status.return_value = None
-        
-        mock_get.side_effect = [mock_profile_response, mock_stats_response]
+        })
         
         result = player_profile("testuser")
         
@@ -34,10 +96,9 @@ class ChessComServiceTestCase(TestCase):
         self.assertEqual(result["title"], "GM")
         self.assertEqual(result["blitz_rating"], 2500)
     
-    @patch('core.services.chesscom.requests.get')
-    def test_player_profile_failure(self, mock_get):
+    def test_player_profile_failure(self):
         """Test profile fetch failure"""
-        mock_get.side_effect = Exception("Network error")
+        self.session.get.side_effect = Exception("Network error")
         
         result = player_profile("testuser")
         
@@ -45,38 +106,47 @@ class ChessComServiceTestCase(TestCase):
         self.assertIsNone(result["title"])
         self.assertIsNone(result["blitz_rating"])
     
-    @patch('core.services.chesscom.get_player_game_archives')
-    @patch('core.services.chesscom.get_player_games_by_month')
-    def test_player_games_success(self, mock_get_games, mock_get_archives):
+    def test_player_profile_cached(self):
+        """Test a repeated profile fetch is answered from the cache"""
+        self.responses[PROFILE_URL] = make_response({"username": "testuser"})
+        self.responses[PROFILE_URL + "/stats"] = make_response({})
+        player_profile("testuser")
+        
+        self.session.get.reset_mock()
+        result = player_profile("testuser")
+        
+        self.assertEqual(result["username"], "testuser")
+        self.session.get.assert_not_called()
+    
+    @override_settings(CHESSCOM_CACHE_TTL={"profile": 3600, "stats": 0})
+    def test_profile_cache_ttl_per_endpoint(self):
+        """Test each endpoint expires on its own TTL"""
+        self.responses[PROFILE_URL] = make_response({"username": "testuser"})
+        self.responses[PROFILE_URL + "/stats"] = make_response({})
+        player_profile("testuser")
+        
+        self.session.get.reset_mock()
+        player_profile("testuser")
+        
+        self.assertEqual(self.requested_urls(), [PROFILE_URL + "/stats"])
+    
+    def set_archives(self, *months):
+        urls = [f"https://api.chess.com/pub/player/testuser/games/{y}/{m:02d}" for y, m in months]
+        self.responses[ARCHIVES_URL] = make_response({'archives': urls})
+        return urls
+    
+    def requested_urls(self):
+        return [call.args[0] for call in self.session.get.call_args_list]
+    
+    def test_player_games_success(self):
         """Test successful games fetch"""
-        # Mock archives
-        mock_archives_response = MagicMock()
-        mock_archives_response.json = {'archives': ['https://api.chess.com/pub/player/testuser/games/2024/01']}
-        mock_get_archives.return_value = mock_archives_response
-        
-        # Mock games
-        mock_games_response = MagicMock()
-        mock_games_response.json = {
+        url, = self.set_archives((2024, 1))
+        self.responses[url] = make_response({
             'games': [
-                {
-                    "end_time": 1704067200,  # Jan 1, 2024
-                    "white": {"username": "testuser", "rating": 1500, "result": "win"},
-                    "black": {"username": "opponent", "rating": 1400, "result": "resigned"},
-                    "time_class": "blitz",
-                    "pgn": "1. e4 e5 2. Nf3",
-                    "url": "https://chess.com/game/1"
-                },
-                {
-                    "end_time": 1706745600,  # Jan 30, 2024 (newer)
-                    "white": {"username": "opponent", "rating": 1400, "result": "resigned"},
-                    "black": {"username": "testuser", "rating": 1500, "result": "win"},
-                    "time_class": "blitz",
-                    "pgn": "1. d4 d5 2. c4",
-                    "url": "https://chess.com/game/2"
-                }
+                make_raw(1704067200, "1. e4 e5 2. Nf3"),  # Jan 1, 2024
+                make_raw(1706745600, "1. d4 d5 2. c4")  # Jan 30, 2024 (newer)
             ]
-        }
-        mock_get_games.return_value = mock_games_response
+        })
         
         result = player_games("testuser", limit=2)
         
@@ -85,23 +155,355 @@ class ChessComServiceTestCase(TestCase):
         self.assertEqual(result[0]["end_time"], 1706745600)
         self.assertEqual(result[1]["end_time"], 1704067200)
     
-    @patch('core.services.chesscom.get_player_game_archives')
-    def test_player_games_no_archives(self, mock_get_archives):
+    def test_player_games_no_archives(self):
         """Test games fetch when no archives exist"""
-        mock_archives_response = MagicMock()
-        mock_archives_response.json = {'archives': []}
-        mock_get_archives.return_value = mock_archives_response
+        self.set_archives()
         
         result = player_games("testuser")
         
         self.assertEqual(result, [])
     
-    @patch('core.services.chesscom.get_player_game_archives')
-    def test_player_games_404_error(self, mock_get_archives):
+    def test_player_games_404_error(self):
         """Test games fetch with 404 error"""
-        mock_get_archives.side_effect = Exception("404 not found")
+        self.responses[ARCHIVES_URL] = make_response(status=404)
         
         with self.assertRaises(ValueError) as context:
             player_games("testuser")
         
-        self.assertIn("not found on Chess.com", str(context.exception)) 
\ No newline at end of file
+        self.assertIn("not found on Chess.com", str(context.exception))
+    
+    def test_closed_month_not_refetched(self):
+        """Test a finished month is served from the database on later calls"""
+        url, = self.set_archives((2024, 1))
+        self.responses[url] = make_response({'games': [make_raw(1704067200)]})
+        player_games("testuser")
+        
+        self.session.get.reset_mock()
+        result = player_games("testuser")
+        
+        self.assertEqual(len(result), 1)
+        self.assertEqual(self.requested_urls(), [ARCHIVES_URL])
+        self.assertTrue(Archive.objects.get(year=2024, month=1).closed)
+    
+    def test_current_month_revalidated(self):
+        """Test the current month is revalidated with its ETag and a 304 reuses stored games"""
+        now = datetime.now(timezone.utc)
+        url, = self.set_archives((now.year, now.month))
+        self.responses[url] = make_response(
+            {'games': [make_raw(1704067200)]},
+            headers={'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+        )
+        player_games("testuser")
+        self.assertFalse(Archive.objects.get().closed)
+        
+        self.responses[url] = make_response(status=304)
+        result = player_games("testuser")
+        
+        self.assertEqual(len(result), 1)
+        headers = self.session.get.call_args_list[-1].kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(headers['If-Modified-Since'], 'Mon, 01 Jan 2024 00:00:00 GMT')
+    
+    @override_settings(CHESSCOM_TIMEOUT=3)
+    def test_archive_requests_use_timeout_setting(self):
+        """Test the archive list and month downloads time out after CHESSCOM_TIMEOUT"""
+        url, = self.set_archives((2024, 1))
+        self.responses[url] = make_response({'games': [make_raw(1704067200)]})
+        
+        player_games("testuser")
+        
+        self.assertEqual(self.requested_urls(), [ARCHIVES_URL, url])
+        self.assertEqual([call.kwargs['timeout'] for call in self.session.get.call_args_list], [3, 3])
+    
+    @override_settings(CHESSCOM_RETRIES=2, CHESSCOM_BACKOFF=0)
+    def test_rate_limited_requests_retried(self):
+        """Test the archive list and month downloads are retried after a 429 or a dropped connection"""
+        url, = self.set_archives((2024, 1))
+        self.responses[ARCHIVES_URL] = [
+            make_response(status=429, headers={'Retry-After': '0'}), self.responses[ARCHIVES_URL]
+        ]
+        self.responses[url] = [
+            make_response(status=503), requests.ConnectionError("reset"),
+            make_response({'games': [make_raw(1704067200)]}),
+        ]
+        
+        with self.assertLogs('core.services.chesscom', 'WARNING'):
+            games = player_games("testuser")
+        
+        self.assertEqual(len(games), 1)
+        self.assertEqual(self.requested_urls(), [ARCHIVES_URL, ARCHIVES_URL, url, url, url])
+    
+    @override_settings(CHESSCOM_RETRIES=1, CHESSCOM_BACKOFF=0)
+    def test_rate_limited_requests_give_up(self):
+        """Test a request still rate limited after CHESSCOM_RETRIES retries fails"""
+        self.responses[ARCHIVES_URL] = make_response(status=429)
+        
+        with self.assertLogs('core.services.chesscom', 'WARNING'), \
+                self.assertRaisesMessage(ValueError, 'Rate limit exceeded'):
+            player_games("testuser")
+        
+        self.assertEqual(self.requested_urls(), [ARCHIVES_URL, ARCHIVES_URL])
+    
+    @override_settings(CHESSCOM_MAX_CONCURRENCY=2)
+    def test_only_needed_months_fetched(self):
+        """Test older months are not downloaded once the limit is reached"""
+        urls = self.set_archives((2023, 10), (2023, 11), (2023, 12), (2024, 1))
+        for i, url in enumerate(urls):
+            self.responses[url] = make_response({'games': [make_raw(1700000000 + i)]})
+        
+        result = player_games("testuser", limit=2)
+        
+        self.assertEqual([g["end_time"] for g in result], [1700000003, 1700000002])
+        self.assertCountEqual(self.requested_urls(), [ARCHIVES_URL, urls[3], urls[2]])
+    
+    def test_sync_stores_only_new_games(self):
+        """Test a later sync only inserts games newer than the last stored one"""
+        now = datetime.now(timezone.utc)
+        url, = self.set_archives((now.year, now.month))
+        self.responses[url] = make_response({'games': [make_raw(1704067200)]})
+        self.assertEqual(sync_player_games("testuser"), 1)
+        
+        Player.objects.filter(username="testuser").update(synced_at=None)
+        self.responses[url] = make_response({'games': [make_raw(1704067200), make_raw(1704070800)]})
+        
+        self.assertEqual(sync_player_games("testuser"), 1)
+        self.assertEqual(Game.objects.filter(player_id="testuser").count(), 2)
+    
+    def test_recent_sync_skips_chess_com(self):
+        """Test a player synced moments ago with enough games is read from the database"""
+        url, = self.set_archives((2024, 1))
+        self.responses[url] = make_response({'games': [make_raw(1704067200)]})
+        player_games("testuser", limit=1)
+        
+        self.session.get.reset_mock()
+        result = player_games("testuser", limit=1)
+        
+        self.assertEqual(len(result), 1)
+        self.session.get.assert_not_called()
+    
+    def test_stored_games_keep_raw_shape(self):
+        """Test stored games can be massaged like Chess.com responses"""
+        url, = self.set_archives((2024, 1))
+        game = make_raw(1704067200)
+        self.responses[url] = make_response({'games': [game]})
+        sync_player_games("testuser")
+        
+        result = massage_games(stored_games("testuser"), "testuser")
+        
+        self.assertEqual(result[0]["white"], "TestUser")
+        self.assertEqual(result[0]["white_rating"], 1500)
+        self.assertEqual(result[0]["outcome"], "Win")
+        self.assertEqual(result[0]["pgn"], game["pgn"])
+
+@override_settings(CHESSCOM_RETRIES=2, CHESSCOM_BACKOFF=0)
+class AsyncChessComTestCase(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.responses = {}
+        self.session = FakeAsyncSession(self.responses)
+        patcher = patch(
+            'core.services.chesscom.get_async_client',
+            side_effect=lambda: AsyncClient(session=self.session)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    async def test_rate_limited_request_is_retried(self):
+        """Test a 429 is retried and the later success returned"""
+        self.responses["https://x/"] = [
+            FakeAsyncResponse(status=429, headers={"Retry-After": "0"}),
+            FakeAsyncResponse({"ok": True}),
+        ]
+        
+        response = await AsyncClient(session=self.session).get("https://x/")
+        
+        self.assertEqual(response.data, {"ok": True})
+        self.assertEqual(len(self.session.requested), 2)
+    
+    async def test_retries_give_up(self):
+        """Test persistent rate limiting fails after the configured retries"""
+        self.responses["https://x/"] = [FakeAsyncResponse(status=429) for _ in range(3)]
+        
+        with self.assertRaises(ChessComError) as context:
+            await AsyncClient(session=self.session).get("https://x/")
+        
+        self.assertEqual(context.exception.status, 429)
+        self.assertEqual(len(self.session.requested), 3)
+    
+    async def test_client_error_not_retried(self):
+        """Test a 404 fails at once"""
+        self.responses["https://x/"] = [FakeAsyncResponse(status=404)]
+        
+        with self.assertRaises(ChessComError):
+            await AsyncClient(session=self.session).get("https://x/")
+        self.assertEqual(len(self.session.requested), 1)
+    
+    @patch('core.services.chesscom.asyncio.sleep')
+    async def test_backoff_honours_retry_after(self, mock_sleep):
+        """Test the wait before a retry is at least the Retry-After header"""
+        self.responses["https://x/"] = [
+            FakeAsyncResponse(status=429, headers={"Retry-After": "7"}),
+            FakeAsyncResponse({"ok": True}),
+        ]
+        
+        await AsyncClient(session=self.session).get("https://x/")
+        
+        mock_sleep.assert_awaited_once_with(7.0)
+    
+    def test_session_closed_with_its_loop(self):
+        """Test a session the client created is closed when asyncio.run() shuts its loop down"""
+        client = AsyncClient()
+        
+        async def fetch():
+            await client.get("https://x/")
+            return await client.session()
+        
+        with patch.object(aiohttp.ClientSession, 'get', return_value=FakeAsyncResponse({"ok": True})):
+            session = asyncio.run(fetch())
+        
+        self.assertTrue(session.closed)
+    
+    async def test_aplayer_games_stores_games(self):
+        """Test the async fetch syncs games into the store and reads them back"""
+        month_url = "https://api.chess.com/pub/player/testuser/games/2024/01"
+        self.responses[ARCHIVES_URL] = FakeAsyncResponse({"archives": [month_url]})
+        self.responses[month_url] = FakeAsyncResponse(
+            {"games": [make_raw(1704067200), make_raw(1706745600)]},
+            headers={"ETag": '"abc"'}
+        )
+        
+        result = await aplayer_games("TestUser", limit=2)
+        
+        self.assertEqual([game["end_time"] for game in result], [1706745600, 1704067200])
+        archive = await Archive.objects.aget(year=2024, month=1)
+        self.assertEqual(archive.etag, '"abc"')
+    
+    async def test_aplayer_games_rate_limited(self):
+        """Test exhausted retries surface as the usual rate limit error"""
+        self.responses[ARCHIVES_URL] = [FakeAsyncResponse(status=429) for _ in range(3)]
+        
+        with self.assertRaises(ValueError) as context:
+            await aplayer_games("testuser")
+        
+        self.assertIn("Rate limit", str(context.exception))
+    
+    async def test_aplayer_profile_fetches_concurrently(self):
+        """Test profile and stats are both requested and combined"""
+        base = "https://api.chess.com/pub/player/testuser"
+        self.responses[base] = FakeAsyncResponse({"username": "testuser", "title": "GM"})
+        self.responses[base + "/stats"] = FakeAsyncResponse({"chess_blitz": {"last": {"rating": 2500}}})
+        
+        result = await aplayer_profile("TestUser")
+        
+        self.assertEqual(result, {"username": "testuser", "title": "GM", "blitz_rating": 2500})
+    
+    async def test_aplayer_profile_cached(self):
+        """Test a warm profile is served without any request"""
+        base = "https://api.chess.com/pub/player/testuser"
+        self.responses[base] = FakeAsyncResponse({"username": "testuser"})
+        self.responses[base + "/stats"] = FakeAsyncResponse({})
+        await aplayer_profile("testuser")
+        
+        self.session.requested.clear()
+        result = await aplayer_profile("testuser")
+        
+        self.assertEqual(result["username"], "testuser")
+        self.assertEqual(self.session.requested, [])
+    
+    async def test_aplayer_profile_failure(self):
+        """Test a failed profile fetch falls back to the username"""
+        self.responses["https://api.chess.com/pub/player/testuser"] = FakeAsyncResponse(status=404)
+        self.responses["https://api.chess.com/pub/player/testuser/stats"] = FakeAsyncResponse(status=404)
+        
+        result = await aplayer_profile("testuser")
+        
+        self.assertEqual(result["username"], "testuser")
+        self.assertIsNone(result["blitz_rating"])
+
+
+class GameListTestCase(TestCase):
+    
+    def setUp(self):
+        player = Player.objects.create(username="testuser")
+        rows = [
+            # end_time, white, black, white result, black result, white rating, black rating, time class
+            (1704067200, "TestUser", "alice", "win", "resigned", 1500, 1400, "blitz"),
+            (1704153600, "bob", "TestUser", "win", "checkmated", 1700, 1500, "blitz"),
+            (1704240000, "TestUser", "alice", "agreed", "agreed", 1500, 1450, "rapid"),
+            (1704326400, "carol", "TestUser", "timeout", "win", 1300, 1510, "bullet"),
+            (1704326400, "TestUser", "bob", "resigned", "win", 1510, 1720, "blitz"),
+        ]
+        for end_time, white, black, white_result, black_result, white_rating, black_rating, time_class in rows:
+            Game.objects.create(
+                player=player, url=f"https://chess.com/game/{end_time}/{white}",
+                pgn="1. e4 e5", time_class=time_class, end_time=end_time,
+                white_username=white, white_rating=white_rating, white_result=white_result,
+                black_username=black, black_rating=black_rating, black_result=black_result,
+            )
+    
+    def opponents(self, filters):
+        games, _ = query_games("testuser", filters=parse_filters(filters), limit=10)
+        return [game["white"]["username"] if game["black"]["username"] == "TestUser" else game["black"]["username"]
+                for game in games]
+    
+    def test_pages_follow_cursor(self):
+        """Test pages cover every game once, newest first, including equal end times"""
+        seen = []
+        after = None
+        while True:
+            games, cursor = query_games("testuser", after=after, limit=2)
+            seen.extend(game["url"] for game in games)
+            if cursor is None:
+                break
+            after = decode_cursor(cursor)
+        
+        expected = list(Game.objects.order_by("-end_time", "-id").values_list("url", flat=True))
+        self.assertEqual(seen, expected)
+    
+    def test_outcome_filter_from_player_side(self):
+        """Test wins, losses and draws are judged from the player's colour"""
+        self.assertEqual(self.opponents({"outcome": "win"}), ["carol", "alice"])
+        self.assertEqual(self.opponents({"outcome": "loss"}), ["bob", "bob"])
+        self.assertEqual(self.opponents({"outcome": "draw"}), ["alice"])
+    
+    def test_opponent_rating_and_time_class_filters(self):
+        """Test filters combine and ratings apply to the opponent"""
+        self.assertEqual(self.opponents({"opponent": "ALICE"}), ["alice", "alice"])
+        self.assertEqual(self.opponents({"min_rating": "1450", "max_rating": "1700"}), ["alice", "bob"])
+        self.assertEqual(self.opponents({"time_class": "blitz", "min_rating": "1700"}), ["bob", "bob"])
+    
+    def test_date_range_includes_last_day(self):
+        """Test the until date covers the whole day"""
+        self.assertEqual(self.opponents({"since": "2024-01-02", "until": "2024-01-03"}), ["alice", "bob"])
+    
+    def test_invalid_filters(self):
+        """Test malformed filter values are rejected"""
+        with self.assertRaises(ValueError):
+            parse_filters({"outcome": "resigned"})
+        with self.assertRaises(ValueError):
+            parse_filters({"since": "yesterday"})
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+    
+    @patch('core.services.gamelist.async_player_games')
+    async def test_page_syncs_only_what_it_needs(self, mock_sync):
+        """Test later pages ask the sync for the games seen so far plus one page"""
+        mock_sync.return_value = 0
+        
+        games, cursor = await apage_games("testuser", limit=2)
+        await apage_games("testuser", cursor=cursor, limit=2)
+        
+        self.assertEqual(len(games), 2)
+        self.assertEqual([call.kwargs["min_games"] for call in mock_sync.call_args_list], [2, 4])
+    
+    @patch('core.services.gamelist.async_player_games')
+    async def test_short_filtered_page_syncs_full_history(self, mock_sync):
+        """Test a filtered page that runs out of stored games syncs the rest of the history"""
+        mock_sync.return_value = 0
+        
+        games, cursor = await apage_games("testuser", filters={"outcome": "draw"}, limit=5)
+        
+        self.assertEqual(len(games), 1)
+        self.assertIsNone(cursor)
+        mock_sync.assert_called_with("testuser")
@@ -0,0 +1,80 @@
+from django.test import TestCase
+from django.urls import reverse
+from core.models import AnalysisJob, Game, Player
+from core.services.timeusage import time_usage
+from core.utils.clocks import unpack_times
+from core.utils.ids import pgn_hash
+from .helpers import cp, make_raw, store
+
+def clock(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f"{{[%clk 0:{minutes:02d}:{seconds:02d}]}}"
+
+def clocked_moves(clocks):
+    sans = ["e4", "e5", "Nf3", "Nc6", "Bc4", "Bc5", "c3", "Nf6"]
+    return " ".join(
+        f"{ply // 2 + 1}{'.' if ply % 2 == 0 else '...'} {san} {clock(left)}"
+        for ply, (san, left) in enumerate(zip(sans, clocks))
+    )
+
+class TimeUsageTestCase(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create(username="testuser")
+        self.raws = [
+            # White spends 1, 9, 45 and 2 seconds: under 6s left from the third move
+            make_raw(1, clocked_moves([59, 58, 50, 57, 5, 55, 3, 50]), time_class="bullet", time_control="60"),
+            make_raw(2, clocked_moves([59, 59, 58, 58, 57, 57, 56, 56]), white="bob", black="TestUser",
+                     white_result="timeout", black_result="win", time_class="bullet", time_control="60"),
+            make_raw(3, clocked_moves([59, 59]), time_class="bullet", time_control="1/86400"),
+        ]
+        self.games = store(self.player, self.raws)
+
+    def test_times_stored_at_import(self):
+        """Test the time spent per move is read from the clocks when a game is stored"""
+        game = Game.objects.get(pk=self.games[0].pk)
+
+        self.assertEqual(unpack_times(game.move_times).tolist()[::2], [1.0, 9.0, 45.0, 2.0])
+        self.assertEqual(Game.objects.get(pk=self.games[2].pk).move_times, b"")
+
+    def test_time_trouble(self):
+        """Test games where the player's clock ran low are found from the stored times"""
+        usage = time_usage("TestUser")
+
+        self.assertEqual(usage["games"], 2)
+        self.assertEqual(usage["moves"], 8)
+        self.assertEqual(usage["time_trouble"]["games"], 1)
+        self.assertEqual(usage["time_trouble"]["score"], 100.0)
+        self.assertEqual(usage["time_trouble"]["timeouts"], 0)
+        self.assertEqual(usage["analysed_games"], 0)
+
+    def test_eval_drop_by_time_spent(self):
+        """Test analysed games relate the time spent on each move to the win chance lost"""
+        AnalysisJob.objects.create(
+            pgn_hash=pgn_hash(self.raws[0]["pgn"]), depth=15, multipv=1, pgn=self.raws[0]["pgn"],
+            status=AnalysisJob.COMPLETE,
+            results=[cp(20), cp(30), cp(30), cp(30), cp(30), cp(-400), cp(-400), cp(-400), cp(-400)],
+        )
+
+        usage = time_usage("testuser")
+        buckets = {row["label"]: row for row in usage["by_time_spent"]}
+
+        self.assertEqual(usage["analysed_games"], 1)
+        self.assertEqual(buckets["15-60s"]["blunder_rate"], 100.0)  # 3. Bc4 after 45 seconds
+        self.assertEqual(buckets["<2s"]["moves"], 1)
+        self.assertGreater(usage["correlation"], 0.9)
+        self.assertGreater(usage["trouble_drop"], usage["calm_drop"])
+
+    def test_unknown_player(self):
+        """Test unknown players have no time usage"""
+        self.assertIsNone(time_usage("nobody"))
+
+    def test_time_usage_api(self):
+        """Test the API returns the time usage as JSON"""
+        response = self.client.get(reverse('core:time_usage', kwargs={'username': 'testuser'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["time_trouble"]["games"], 1)
+        self.assertEqual(
+            self.client.get(reverse('core:time_usage', kwargs={'username': 'nobody'})).status_code, 404
+        )
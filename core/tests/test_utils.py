@@ -1,7 +1,15 @@
+import json
 from django.test import TestCase
+import numpy as np
 from datetime import datetime
 from core.utils.outcomes import calculate_outcome, get_outcome_class, calculate_outcome_with_class
+from core.utils.accuracy import EVAL_CLIP, eval_matrix, game_stats, games_stats, player_stats, win_probability
+from core.utils.clocks import clocks_left, move_times, pack_times, parse_time_control, time_matrix, unpack_times
+from core.utils.evalcodec import HEADER, MATE, NO_SCORE, decode_analysis, decode_arrays, encode_analysis, move_code, move_uci
+from core.utils.ids import pgn_id
+from core.utils.snapshot import pack_snapshot, snapshot_etag, snapshot_json, unpack_snapshot
 from core.utils.transform import massage_game, massage_games
+from .helpers import cp
 
 class OutcomesTestCase(TestCase):
     
@@ -92,6 +100,8 @@ class TransformTestCase(TestCase):
         self.assertEqual(result["outcome"], "Win")
         self.assertEqual(result["outcome_class"], "bg-success")
         self.assertIsInstance(result["end"], datetime)
+        self.assertEqual(result["pgn_id"], pgn_id("1. e4 e5 2. Nf3"))
+        self.assertEqual(len(result["pgn_id"]), 16)
     
     def test_massage_games(self):
         """Test massaging multiple games"""
@@ -120,4 +130,192 @@ class TransformTestCase(TestCase):
         self.assertEqual(result[0]["outcome"], "Win")
         self.assertEqual(result[1]["outcome"], "Win")
         self.assertEqual(result[0]["outcome_class"], "bg-success")
-        self.assertEqual(result[1]["outcome_class"], "bg-success") 
\ No newline at end of file
+        self.assertEqual(result[1]["outcome_class"], "bg-success") 
+
+class AccuracyTestCase(TestCase):
+    
+    def test_win_probability(self):
+        """Test the win probability curve is even at 0 and symmetric"""
+        self.assertAlmostEqual(float(win_probability(0)), 50)
+        self.assertAlmostEqual(float(win_probability(300) + win_probability(-300)), 100)
+        self.assertGreater(float(win_probability(300)), 70)
+    
+    def test_blunder_counts_against_mover(self):
+        """Test a collapse in White's eval on White's move is White's blunder"""
+        stats = game_stats([cp(20), cp(30), cp(25), cp(-300), cp(-290)])
+        
+        self.assertEqual(stats["classes"], [None, None, "blunder", None])
+        self.assertEqual(stats["white"]["blunders"], 1)
+        self.assertEqual(stats["black"]["blunders"], 0)
+        self.assertEqual(stats["white"]["acpl"], 162.5)  # (0 + 325) / 2
+        self.assertEqual(stats["black"]["acpl"], 5.0)  # (0 + 10) / 2
+        self.assertLess(stats["white"]["accuracy"], stats["black"]["accuracy"])
+        self.assertGreater(stats["black"]["accuracy"], 95)
+    
+    def test_book_and_failed_plies_not_scored(self):
+        """Test moves next to a book position or a failed search are skipped"""
+        stats = game_stats([cp(0, source="book"), cp(30), cp(0, lines=False), cp(20)])
+        
+        self.assertEqual(stats["win_probability"][0], None)
+        self.assertEqual(stats["win_probability"][2], None)
+        self.assertEqual(stats["white"]["moves"] + stats["black"]["moves"], 0)
+        self.assertIsNone(stats["white"]["accuracy"])
+    
+    def test_mate_on_board(self):
+        """Test a mated position counts against the side to move"""
+        mated = {"eval": {"type": "mate", "value": 0}, "lines": []}
+        matrix = eval_matrix([[cp(0), mated], [cp(0), cp(0), mated]])
+        
+        self.assertEqual(matrix[0, 1], EVAL_CLIP)  # Black to move and mated
+        self.assertEqual(matrix[1, 2], -EVAL_CLIP)  # White to move and mated
+    
+    def test_batch_matches_single_games(self):
+        """Test games of different lengths give the same stats batched or alone"""
+        games = [[cp(20), cp(-200), cp(-150)], [cp(10), cp(15), cp(-40), cp(300), cp(310)]]
+        
+        self.assertEqual(games_stats(games), [game_stats(games[0]), game_stats(games[1])])
+    
+    def test_player_stats_by_colour(self):
+        """Test only the player's own moves are aggregated"""
+        games = [[cp(20), cp(30), cp(25), cp(-300), cp(-290)]] * 2
+        
+        as_white = player_stats(games, [True, True])
+        as_black = player_stats(games, [False, False])
+        
+        self.assertEqual(as_white["games"], 2)
+        self.assertEqual(as_white["blunders"], 2)
+        self.assertEqual(as_black["blunders"], 0)
+        self.assertEqual(as_black["moves"], 4)
+        self.assertEqual(player_stats([], [])["accuracy"], None)
+
+
+class ClocksTestCase(TestCase):
+    
+    def test_parse_time_control(self):
+        """Test live time controls are read and daily ones are not"""
+        self.assertEqual(parse_time_control("180+2"), (180.0, 2.0))
+        self.assertEqual(parse_time_control("600"), (600.0, 0.0))
+        self.assertIsNone(parse_time_control("1/86400"))
+        self.assertIsNone(parse_time_control(""))
+    
+    def test_move_times_include_increment(self):
+        """Test the time spent counts the increment each side got"""
+        # 180+2: White 178, Black 175, White 170, Black 176 (premove gets the increment back)
+        times = move_times([178, 175, 170, 176], "180+2")
+        
+        self.assertEqual(times, [40, 70, 100, 10])
+    
+    def test_move_times_need_every_clock(self):
+        """Test a game with a missing clock or no live time control has no times"""
+        self.assertEqual(move_times([178, None], "180+2"), [])
+        self.assertEqual(move_times([178, 175], "1/86400"), [])
+    
+    def test_pack_round_trip(self):
+        """Test packed times take 4 bytes a move and unpack to seconds"""
+        data = pack_times([40, 70, 36000])
+        
+        self.assertEqual(len(data), 12)
+        self.assertEqual(unpack_times(data).tolist(), [4.0, 7.0, 3600.0])
+    
+    def test_clocks_left(self):
+        """Test clocks are rebuilt per side from the time spent"""
+        spent = time_matrix([pack_times([40, 70, 100, 10]), pack_times([50])])
+        
+        left = clocks_left(spent, np.array([180.0, 60.0]), np.array([2.0, 0.0]))
+        
+        self.assertEqual(left[0].tolist(), [178.0, 175.0, 170.0, 176.0])
+        self.assertEqual(left[1, 0], 55.0)
+        self.assertTrue(np.isnan(left[1, 1]))
+
+class EvalCodecTestCase(TestCase):
+    
+    def setUp(self):
+        self.results = [
+            {"eval": {"type": "cp", "value": 0}, "lines": [
+                {"Move": "e2e4", "Centipawn": None, "Mate": None},
+                {"Move": "d2d4", "Centipawn": None, "Mate": None},
+            ], "source": "book"},
+            {"eval": {"type": "cp", "value": -35}, "lines": [
+                {"Move": "c7c5", "Centipawn": -35, "Mate": None},
+                {"Move": "e7e5", "Centipawn": -20, "Mate": None},
+                {"Move": "d8h4", "Centipawn": None, "Mate": 3},
+            ]},
+            {"eval": {"type": "cp", "value": 10000}, "lines": [
+                {"Move": "a7a8q", "Centipawn": 10000, "Mate": None},
+                {"Move": "a7a8n", "Centipawn": 0, "Mate": None},
+            ], "source": "tablebase"},
+            {"eval": {"type": "mate", "value": 0}, "lines": []},
+        ]
+    
+    def test_round_trip(self):
+        """Test evals, lines, promotions and sources come back unchanged"""
+        self.assertEqual(decode_analysis(encode_analysis(self.results)), self.results)
+    
+    def test_packed_size(self):
+        """Test each ply and each engine line take 5 bytes after the header"""
+        data = encode_analysis(self.results, depth=18, multipv=3)
+        
+        self.assertEqual(len(data), HEADER.size + 4 * 5 + 7 * 5)
+        decoded = decode_arrays(data)
+        self.assertEqual((decoded.depth, decoded.multipv, decoded.size), (18, 3, len(data)))
+        self.assertEqual(decoded.plies["score"].tolist(), [0, -35, 10000, 0])
+        self.assertEqual(decoded.plies["flags"].tolist(), [0, 0, 0, MATE])
+        self.assertEqual(decoded.lines["flags"].tolist()[:3], [NO_SCORE, NO_SCORE, 0])
+    
+    def test_move_codes(self):
+        """Test moves fit 16 bits with the promotion piece in the top bits"""
+        self.assertEqual(move_code("a1a2"), 8 << 6)
+        self.assertEqual(move_uci(move_code("h7h8q")), "h7h8q")
+        self.assertLess(move_code("h7h8q"), 1 << 16)
+    
+    def test_scores_clipped(self):
+        """Test centipawns beyond the int16 range are clipped"""
+        results = decode_analysis(encode_analysis([{"eval": {"type": "cp", "value": 40000}, "lines": []}]))
+        self.assertEqual(results[0]["eval"]["value"], 32767)
+    
+    def test_bad_input(self):
+        """Test unknown sources and foreign bytes are refused"""
+        with self.assertRaises(ValueError):
+            encode_analysis([{"eval": {"type": "cp", "value": 0}, "lines": [], "source": "guess"}])
+        with self.assertRaises(ValueError):
+            decode_arrays(b"not an analysis")
+        with self.assertRaises(ValueError):
+            decode_arrays(encode_analysis(self.results)[:-1])
+
+class SnapshotTestCase(TestCase):
+    
+    def test_round_trip(self):
+        """Test the per-ply results and stats come back unchanged"""
+        results = [
+            {"eval": {"type": "cp", "value": 20}, "lines": [{"Move": "e2e4", "Centipawn": 20, "Mate": None}]},
+            {"eval": {"type": "mate", "value": -2}, "lines": [], "source": "tablebase"},
+        ]
+        stats = {"white": {"accuracy": 91.5}, "classes": [None]}
+        
+        self.assertEqual(unpack_snapshot(pack_snapshot(results, stats)), (results, stats))
+    
+    def test_columnar_json(self):
+        """Test the JSON form holds one array per field with lines flattened"""
+        results = [
+            {"eval": {"type": "cp", "value": 0}, "lines": [{"Move": "e2e4", "Centipawn": None, "Mate": None}], "source": "book"},
+            {"eval": {"type": "mate", "value": 3}, "lines": [
+                {"Move": "d8h4", "Centipawn": None, "Mate": 3},
+                {"Move": "e7e5", "Centipawn": -20, "Mate": None},
+            ]},
+        ]
+        body = json.loads(snapshot_json(pack_snapshot(results, {"white": {}}, depth=18, multipv=3)))
+        
+        self.assertEqual((body["depth"], body["multipv"], body["plies"]), (18, 3, 2))
+        self.assertEqual(body["cp"], [0, None])
+        self.assertEqual(body["mate"], [None, 3])
+        self.assertEqual([body["sources"][code] for code in body["source"]], ["book", "engine"])
+        self.assertEqual(body["line_count"], [1, 2])
+        self.assertEqual(body["line_move"], ["e2e4", "d8h4", "e7e5"])
+        self.assertEqual(body["line_cp"], [None, None, -20])
+        self.assertEqual(body["line_mate"], [None, 3, None])
+        self.assertEqual(body["stats"], {"white": {}})
+    
+    def test_stable_bytes(self):
+        """Test equal analyses give equal bytes and so equal ETags"""
+        results = [{"eval": {"type": "cp", "value": 20}, "lines": []}]
+        self.assertEqual(snapshot_etag(pack_snapshot(results)), snapshot_etag(pack_snapshot(results)))
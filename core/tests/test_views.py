@@ -1,7 +1,15 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from unittest.mock import patch, MagicMock
 from datetime import datetime
+from core.models import AnalysisJob, Game, Player
+from core.services.gamelist import find_pgn
+from core.services.snapshots import find_snapshot, store_snapshot
+from core.utils.ids import pgn_hash, pgn_id
+from core.utils.snapshot import SNAPSHOT_CONTENT_TYPE, unpack_snapshot
 
 class ViewsTestCase(TestCase):
     
@@ -12,8 +20,8 @@ class ViewsTestCase(TestCase):
         self.assertContains(response, 'Chess Analysis Tool')
         self.assertContains(response, 'id_username')
     
-    @patch('core.views.player_games')
-    @patch('core.views.player_profile')
+    @patch('core.views.apage_games')
+    @patch('core.views.aplayer_profile')
     def test_games_list_view_success(self, mock_profile, mock_games):
         """Test games list view with successful data fetch"""
         # Mock profile
@@ -24,7 +32,7 @@ class ViewsTestCase(TestCase):
         }
         
         # Mock games
-        mock_games.return_value = [
+        mock_games.return_value = ([
             {
                 "end_time": 1704067200,
                 "white": {"username": "testuser", "rating": 1500, "result": "win"},
@@ -33,18 +41,30 @@ class ViewsTestCase(TestCase):
                 "pgn": "1. e4 e5 2. Nf3",
                 "url": "https://chess.com/game/1"
             }
-        ]
+        ], "NEXT")
         
-        response = self.client.get(reverse('core:games_list'), {'username': 'testuser'})
+        response = self.client.get(reverse('core:games_list'), {'username': 'testuser', 'outcome': 'win'})
         
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'testuser')
         self.assertContains(response, 'GM')
         self.assertContains(response, '2500')
         self.assertContains(response, 'Win')
+        self.assertContains(response, 'cursor=NEXT')
+        self.assertEqual(mock_games.call_args.kwargs['filters'], {'outcome': 'win'})
     
-    @patch('core.views.player_games')
-    @patch('core.views.player_profile')
+    @patch('core.views.apage_games')
+    @patch('core.views.aplayer_profile')
+    def test_games_list_view_invalid_filter(self, mock_profile, mock_games):
+        """Test a malformed filter is reported without fetching"""
+        response = self.client.get(reverse('core:games_list'), {'username': 'testuser', 'since': 'soon'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'since must be a date')
+        mock_games.assert_not_called()
+    
+    @patch('core.views.apage_games')
+    @patch('core.views.aplayer_profile')
     def test_games_list_view_error(self, mock_profile, mock_games):
         """Test games list view with error"""
         # Mock profile
@@ -62,6 +82,65 @@ class ViewsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'User not found')
     
+    def test_games_list_view_fetches_concurrently(self):
+        """Test profile and games are fetched at the same time"""
+        profile_started = asyncio.Event()
+        games_started = asyncio.Event()
+        
+        async def profile(username):
+            profile_started.set()
+            # Would time out if games were only fetched after the profile
+            await asyncio.wait_for(games_started.wait(), timeout=1)
+            return {"username": username, "title": None, "blitz_rating": None}
+        
+        async def games(username, filters, cursor):
+            games_started.set()
+            await asyncio.wait_for(profile_started.wait(), timeout=1)
+            return [], None
+        
+        with patch('core.views.aplayer_profile', profile), patch('core.views.apage_games', games):
+            response = self.client.get(reverse('core:games_list'), {'username': 'testuser'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'testuser')
+    
+    def test_game_detail_view_by_id(self):
+        """Test the game page finds the PGN of a stored game by its short ID"""
+        pgn_text = '[White "testuser"]\n\n1. e4 e5 2. Nf3 *'
+        game_id = pgn_id(pgn_text)
+        player = Player.objects.create(username="testuser")
+        Game.objects.create(
+            player=player, url="https://chess.com/game/1", pgn=pgn_text, pgn_id=game_id,
+            white_username="testuser", white_result="win", black_username="opponent",
+            black_result="resigned", time_class="blitz", end_time=1704067200,
+        )
+        
+        response = self.client.get(reverse('core:game_detail', kwargs={'pgn_id': game_id}))
+        
+        self.assertEqual(len(game_id), 16)
+        self.assertEqual(response.context['pgn_text'], pgn_text)
+        self.assertContains(response, f'/ws/analysis/{game_id}/')
+    
+    def test_game_detail_view_unknown_id(self):
+        """Test an unknown game ID shows an error"""
+        response = self.client.get(reverse('core:game_detail', kwargs={'pgn_id': '0123456789abcdef'}))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Game not found')
+    
+    def test_game_lookup_needs_full_id(self):
+        """Test a partial game ID matches no game, by URL or by lookup"""
+        pgn_text = '1. e4 e5 2. Nf3 *'
+        AnalysisJob.objects.create(pgn_hash=pgn_hash(pgn_text), depth=18, multipv=3, pgn=pgn_text)
+        
+        response = self.client.get(f'/game/{pgn_id(pgn_text)[:1]}/')
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(find_pgn(pgn_id(pgn_text)[:1]))
+        self.assertIsNone(find_pgn(pgn_hash(pgn_text)[:20]))
+        self.assertEqual(find_pgn(pgn_id(pgn_text)), pgn_text)
+        self.assertEqual(find_pgn(pgn_hash(pgn_text)), pgn_text)
+    
     def test_games_list_view_no_username(self):
         """Test games list view without username"""
         response = self.client.get(reverse('core:games_list'))
@@ -69,10 +148,10 @@ class ViewsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'No games found')
     
-    @patch('core.views.player_games')
+    @patch('core.views.apage_games')
     def test_fetch_games_api_success(self, mock_games):
         """Test fetch games API endpoint success"""
-        mock_games.return_value = [
+        mock_games.return_value = ([
             {
                 "end_time": 1704067200,
                 "white": {"username": "testuser", "rating": 1500, "result": "win"},
@@ -81,11 +160,11 @@ class ViewsTestCase(TestCase):
                 "pgn": "1. e4 e5 2. Nf3",
                 "url": "https://chess.com/game/1"
             }
-        ]
+        ], "NEXT")
         
         response = self.client.post(
             reverse('core:fetch_games'),
-            data='{"username": "testuser"}',
+            data='{"username": "testuser", "time_class": "blitz", "cursor": "PREV", "limit": 20}',
             content_type='application/json'
         )
         
@@ -94,8 +173,11 @@ class ViewsTestCase(TestCase):
         self.assertIn('games', data)
         self.assertEqual(len(data['games']), 1)
         self.assertEqual(data['games'][0]['outcome'], 'Win')
+        self.assertNotIn('pgn', data['games'][0])
+        self.assertEqual(data['next_cursor'], 'NEXT')
+        mock_games.assert_called_once_with('testuser', filters={'time_class': 'blitz'}, cursor='PREV', limit=20)
     
-    @patch('core.views.player_games')
+    @patch('core.views.apage_games')
     def test_fetch_games_api_error(self, mock_games):
         """Test fetch games API endpoint with error"""
         mock_games.side_effect = ValueError("User not found")
@@ -124,7 +206,7 @@ class ViewsTestCase(TestCase):
         self.assertIn('error', data)
         self.assertEqual(data['error'], 'Username is required')
     
-    @patch('core.views.player_games')
+    @patch('core.views.aplayer_games')
     def test_test_api_view_success(self, mock_games):
         """Test API test endpoint success"""
         mock_games.return_value = [
@@ -145,7 +227,7 @@ class ViewsTestCase(TestCase):
         self.assertEqual(data['status'], 'success')
         self.assertIn('API working', data['message'])
     
-    @patch('core.views.player_games')
+    @patch('core.views.aplayer_games')
     def test_test_api_view_error(self, mock_games):
         """Test API test endpoint with error"""
         mock_games.side_effect = Exception("API error")
@@ -155,4 +237,37 @@ class ViewsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertEqual(data['status'], 'error')
-        self.assertIn('API error', data['message']) 
\ No newline at end of file
+        self.assertIn('API error', data['message']) 
+    
+    @override_settings(ENGINE_DEPTH=18, ENGINE_MULTIPV=3, ENGINE_ADAPTIVE=False)
+    def test_analysis_snapshot(self):
+        """Test a finished analysis is served as JSON or binary, gzip-compressed and revalidated by ETag"""
+        pgn_text = "1. e4 e5 *"
+        results = [{"eval": {"type": "cp", "value": value}, "lines": []} for value in (20, 30, 25)]
+        snapshot = store_snapshot((pgn_hash(pgn_text), 18, 3), results)
+        url = reverse('core:analysis_snapshot', kwargs={'pgn_id': pgn_id(pgn_text)})
+        
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], snapshot.etag)
+        self.assertEqual(json.loads(gzip.decompress(response.content))["cp"], [20, 30, 25])
+        
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.json()["plies"], 3)
+        
+        response = self.client.get(url, HTTP_ACCEPT=SNAPSHOT_CONTENT_TYPE)
+        self.assertEqual(response['Content-Type'], SNAPSHOT_CONTENT_TYPE)
+        self.assertEqual(unpack_snapshot(response.content)[0], results)
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=snapshot.etag)
+        self.assertEqual(response.status_code, 304)
+        
+        response = self.client.get(url, {'depth': 20})
+        self.assertEqual(response.status_code, 404)
+        
+        response = self.client.get(f'/api/analysis/{pgn_id(pgn_text)[:1]}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(find_snapshot(pgn_id(pgn_text)[:1]))
+        self.assertEqual(find_snapshot(pgn_hash(pgn_text)), snapshot)
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import unittest
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from ..models import AnalysisJob
+from ..services import jobs
+from ..services.worker import serve
+from .test_consumers import SAMPLE_PGN, connect_client, fake_analysis
+
+try:
+    import channels_redis  # noqa: F401
+    import lupa  # noqa: F401
+    from fakeredis import TcpFakeServer
+except ImportError:
+    TcpFakeServer = None
+
+RESULTS = [
+    {"eval": {"type": "cp", "value": 34}, "lines": [{"Move": "e2e4", "Centipawn": 34, "Mate": None}]},
+    {"eval": {"type": "cp", "value": 12}, "lines": [{"Move": "e7e5", "Centipawn": 12, "Mate": None}]},
+    {"eval": {"type": "cp", "value": 30}, "lines": [{"Move": "g1f3", "Centipawn": 30, "Mate": None}]},
+]
+
+def not_in_web_process(pgn_text):
+    raise AssertionError("the web process must not run the engine")
+
+@override_settings(ANALYSIS_WORKERS=True)
+class TestAnalysisWorker(TransactionTestCase):
+
+    def setUp(self):
+        # A worker channel per test, so no stale receive from an earlier test takes the job
+        self.channel = f"analysis-worker-{uuid.uuid4().hex}"
+        worker_channel = override_settings(ANALYSIS_WORKER_CHANNEL=self.channel)
+        worker_channel.enable()
+        self.addCleanup(worker_channel.disable)
+
+    def tearDown(self):
+        jobs._runs.clear()
+
+    async def run_game(self, analysis):
+        """Follow SAMPLE_PGN as a client while a worker serves the channel"""
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+
+        with patch('core.services.jobs.aiter_analysis', not_in_web_process):
+            await communicator.send_json_to({"type": "start_analysis", "pgn": SAMPLE_PGN})
+            await asyncio.sleep(0.05)
+
+        stop = asyncio.Event()
+        with patch('core.services.jobs.aiter_analysis', analysis):
+            worker = asyncio.create_task(serve(get_channel_layer(), self.channel, 2, stop=stop))
+            messages = []
+            while not messages or messages[-1]["type"] == "analysis":
+                messages.append(await communicator.receive_json_from(timeout=5))
+            stop.set()
+            await worker
+        await communicator.disconnect()
+        return messages
+
+    async def test_worker_runs_job_for_web_client(self):
+        """Test a job sent by the web process is analysed by a worker and streamed to the client"""
+        messages = await self.run_game(fake_analysis(RESULTS))
+
+        self.assertEqual([m["type"] for m in messages], ["analysis"] * 3 + ["complete"])
+        self.assertEqual([m["ply"] for m in messages[:3]], [0, 1, 2])
+        job = await sync_to_async(AnalysisJob.objects.get)()
+        self.assertEqual(job.status, AnalysisJob.COMPLETE)
+        self.assertIsNone(job.lease_until)
+
+    async def test_leased_job_not_run_twice(self):
+        """Test a job another worker holds is skipped until its lease expires"""
+        key = jobs.job_key(SAMPLE_PGN)
+        await sync_to_async(jobs._store)(
+            key, SAMPLE_PGN, AnalysisJob.RUNNING, RESULTS[:1], timezone.now() + timedelta(seconds=60)
+        )
+        group = "analysis_test"
+
+        with patch('core.services.jobs.aiter_analysis', fake_analysis(RESULTS)):
+            self.assertFalse(await jobs.run_claimed(SAMPLE_PGN, group))
+            await sync_to_async(AnalysisJob.objects.update)(lease_until=timezone.now() - timedelta(seconds=1))
+            self.assertTrue(await jobs.run_claimed(SAMPLE_PGN, group))
+            self.assertFalse(await jobs.run_claimed(SAMPLE_PGN, group))  # complete now
+
+        job = await sync_to_async(AnalysisJob.objects.get)()
+        self.assertEqual(job.results, RESULTS)
+
+    @override_settings(ANALYSIS_LEASE=0.15)
+    async def test_lease_renewed_while_replaying(self):
+        """Test a resumed job keeps its lease while stored plies are replayed"""
+        key = jobs.job_key(SAMPLE_PGN)
+        await sync_to_async(jobs._store)(key, SAMPLE_PGN, AnalysisJob.RUNNING, RESULTS[:2])
+
+        with patch('core.services.jobs.aiter_analysis', fake_analysis(RESULTS, delay=0.06)), \
+                patch('core.services.jobs._renew_lease', wraps=jobs._renew_lease) as renew:
+            self.assertTrue(await jobs.run_claimed(SAMPLE_PGN, "analysis_test"))
+
+        renew.assert_called_with(key)
+
+    async def test_client_joining_mid_game_gets_every_ply(self):
+        """Test plies stored by the worker and those published later add up to the whole game"""
+        key = jobs.job_key(SAMPLE_PGN)
+        await sync_to_async(jobs._store)(key, SAMPLE_PGN, AnalysisJob.RUNNING, RESULTS[:2])
+
+        messages = await self.run_game(fake_analysis(RESULTS))
+
+        self.assertEqual([m["ply"] for m in messages[:3]], [0, 1, 2])
+        self.assertEqual(messages[3]["type"], "complete")
+
+    async def test_expired_job_resumed_for_waiting_client(self):
+        """Test a job left by a dead worker is resumed once its lease expires, without the client asking again"""
+        key = jobs.job_key(SAMPLE_PGN)
+        await sync_to_async(jobs._store)(
+            key, SAMPLE_PGN, AnalysisJob.RUNNING, RESULTS[:1], timezone.now() + timedelta(seconds=60)
+        )
+        communicator = connect_client()
+        await communicator.connect()
+        await communicator.receive_json_from()  # connection status
+        await communicator.send_json_to({"type": "start_analysis", "pgn": SAMPLE_PGN})
+        self.assertEqual((await communicator.receive_json_from())["ply"], 0)
+
+        stop = asyncio.Event()
+        with patch('core.services.jobs.aiter_analysis', fake_analysis(RESULTS)):
+            worker = asyncio.create_task(serve(get_channel_layer(), self.channel, 2, stop=stop, resume_every=0.05))
+            # The start request is ignored while the dead worker's lease runs
+            self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+            await sync_to_async(AnalysisJob.objects.update)(lease_until=timezone.now() - timedelta(seconds=1))
+            messages = [await communicator.receive_json_from(timeout=5) for _ in range(3)]
+            stop.set()
+            await worker
+        await communicator.disconnect()
+
+        self.assertEqual([m.get("ply") for m in messages], [1, 2, None])
+        self.assertEqual(messages[2]["type"], "complete")
+
+    def test_worker_command_needs_shared_layer(self):
+        """Test the worker refuses to start on the in-memory channel layer"""
+        with self.assertRaises(CommandError):
+            call_command('analysis_worker')
+
+@unittest.skipIf(TcpFakeServer is None, "channels_redis, lupa and fakeredis are needed for the Redis layer test")
+class TestRedisChannelLayer(TestAnalysisWorker):
+    """The worker tests again, over the Redis channel layer talking to a local Redis stand-in"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+        cls.server.block_on_close = False  # connections may be left in a blocking pop
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        # A layer per test: its connections and receive state belong to the test's event loop
+        super().setUp()
+        host, port = self.server.server_address
+        self.layers = override_settings(CHANNEL_LAYERS={
+            "default": {
+                "BACKEND": "channels_redis.core.RedisChannelLayer",
+                "CONFIG": {"hosts": [f"redis://{host}:{port}/0"]},
+            }
+        })
+        self.layers.enable()
+
+    def tearDown(self):
+        async_to_sync(get_channel_layer().flush)()
+        self.layers.disable()
+        super().tearDown()
+
+    def test_worker_command_needs_shared_layer(self):
+        """Test the worker command accepts the Redis layer"""
+        with patch('core.management.commands.analysis_worker.Command.run') as run:
+            call_command('analysis_worker', '--concurrency', '1')
+        run.assert_called_once()
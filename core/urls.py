@@ -1,11 +1,20 @@
-from django.urls import path
-from .views import HomeView, FetchGamesAPIView, GamesListView, GameDetailView, TestAPIView
+from django.urls import path, re_path
+from .views import (
+    AnalysisSnapshotView, HomeView, FetchGamesAPIView, GamesListView, GameDetailView, MetricsView, OpeningTreeAPIView,
+    PlayerReportView, TestAPIView, TimeUsageAPIView,
+)
+from .utils.ids import PGN_ID_PATTERN
 
 app_name = "core"
 urlpatterns = [
     path("", HomeView.as_view(), name="home"),
     path("api/fetch-games/", FetchGamesAPIView.as_view(), name="fetch_games"),
     path("games/", GamesListView.as_view(), name="games_list"),
-    path("game/<slug:pgn_id>/", GameDetailView.as_view(), name="game_detail"),
+    re_path(rf"^game/(?P<pgn_id>{PGN_ID_PATTERN})/$", GameDetailView.as_view(), name="game_detail"),
+    path("players/<str:username>/report/", PlayerReportView.as_view(), name="player_report"),
+    path("api/players/<str:username>/openings/", OpeningTreeAPIView.as_view(), name="opening_tree"),
+    path("api/players/<str:username>/time/", TimeUsageAPIView.as_view(), name="time_usage"),
+    re_path(rf"^api/analysis/(?P<pgn_id>{PGN_ID_PATTERN})/$", AnalysisSnapshotView.as_view(), name="analysis_snapshot"),
     path("api/test/", TestAPIView.as_view(), name="test_api"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ] 
\ No newline at end of file
@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Evals are clipped to this many centipawns and mates count as the clip value
+EVAL_CLIP = 1000
+
+# Logistic fit of win probability against centipawns from rated games (Lichess)
+WIN_SLOPE = 0.00368208
+
+# Drop in the mover's win probability, in percentage points, for each class
+INACCURACY = 5
+MISTAKE = 10
+BLUNDER = 15
+
+CLASSES = (None, "inaccuracy", "mistake", "blunder")
+_COUNT_KEYS = ("inaccuracies", "mistakes", "blunders")
+_UNSCORED = -1
+
+def eval_matrix(games: Sequence[List[Dict]], white_first: Optional[Sequence[bool]] = None) -> np.ndarray:
+    """
+    Pack the per-ply results of many games into one centipawn array
+
+    Positions without a usable eval are NaN: failed searches (no lines) and
+    book positions, whose level eval is a placeholder. A game-over mate
+    counts against the side to move.
+
+    Args:
+        games: Results of analyse_pgn() per game, ply 0 being the start position
+        white_first: Whether White moves first, per game (default: all True)
+
+    Returns:
+        Float array of shape (games, longest game), White's point of view
+    """
+    width = max((len(results) for results in games), default=0)
+    cp = np.full((len(games), width), np.nan)
+    for row, results in enumerate(games):
+        white_to_move = True if white_first is None else white_first[row]
+        for ply, result in enumerate(results):
+            score = result.get("eval")
+            if score and result.get("source") != "book":
+                if score["type"] == "mate":
+                    # Mate 0 has no sign: the side to move is mated
+                    value = score["value"] or (-1 if white_to_move else 1)
+                    cp[row, ply] = EVAL_CLIP if value > 0 else -EVAL_CLIP
+                elif result.get("lines"):
+                    cp[row, ply] = score["value"]
+            white_to_move = not white_to_move
+    return np.clip(cp, -EVAL_CLIP, EVAL_CLIP)
+
+def win_probability(cp: np.ndarray) -> np.ndarray:
+    """White's chance of winning in percent for White-relative centipawns"""
+    return 100 / (1 + np.exp(-WIN_SLOPE * cp))
+
+def _side_summary(accuracy, loss, classes, scored) -> Dict:
+    """Averages and class counts for one side of one game"""
+    moves = int(scored.sum())
+    summary = {
+        "accuracy": round(float(accuracy[scored].mean()), 1) if moves else None,
+        "acpl": round(float(loss[scored].mean()), 1) if moves else None,
+        "moves": moves,
+    }
+    for code, key in enumerate(_COUNT_KEYS, start=1):
+        summary[key] = int((classes == code).sum())
+    return summary
+
+def move_scores(cp: np.ndarray, white_first: Optional[Sequence[bool]] = None) -> Dict[str, np.ndarray]:
+    """
+    Score every move of every game in one pass
+
+    Args:
+        cp: Centipawn array from eval_matrix()
+        white_first: Whether White moves first, per game (default: all True)
+
+    Returns:
+        Dict of arrays shaped (games, moves): "win" (win probability before
+        and after each move, White's view, shape (games, moves + 1)),
+        "accuracy", "loss" (centipawn loss), "white" (White made the move),
+        "scored" (both evals known) and "classes" (index into CLASSES,
+        -1 when not scored)
+    """
+    games, width = cp.shape
+    moves = max(width - 1, 0)
+    win = win_probability(cp)
+
+    first = np.ones(games, dtype=bool) if white_first is None else np.asarray(white_first, dtype=bool)
+    white = (np.arange(moves) % 2 == 0)[np.newaxis, :] == first[:, np.newaxis]
+    sign = np.where(white, 1.0, -1.0)
+
+    before, after = win[:, :-1], win[:, 1:]
+    scored = ~np.isnan(before) & ~np.isnan(after)
+    with np.errstate(invalid="ignore"):
+        drop = np.where(scored, np.maximum(sign * (before - after), 0), 0)
+        loss = np.where(scored, np.maximum(sign * (cp[:, :-1] - cp[:, 1:]), 0), 0)
+
+    # Per-move accuracy curve fitted by Lichess: 100 for no drop in win chance
+    accuracy = np.clip(103.1668 * np.exp(-0.04354 * drop) - 3.1669, 0, 100)
+    classes = np.select([drop >= BLUNDER, drop >= MISTAKE, drop >= INACCURACY], [3, 2, 1], 0)
+    classes = np.where(scored, classes, _UNSCORED)
+
+    return {
+        "win": win,
+        "accuracy": accuracy,
+        "loss": loss,
+        "white": white,
+        "scored": scored,
+        "classes": classes,
+    }
+
+def games_stats(games: Sequence[List[Dict]], white_first: Optional[Sequence[bool]] = None) -> List[Dict]:
+    """
+    Accuracy, average centipawn loss and move classes for many games
+
+    Args:
+        games: Results of analyse_pgn() per game
+        white_first: Whether White moves first, per game (default: all True)
+
+    Returns:
+        One dict per game with "win_probability" per ply (White's view, None
+        where unknown), "classes" per move (None, "inaccuracy", "mistake",
+        "blunder") and "white"/"black" summaries: accuracy, acpl, moves
+        scored and counts of inaccuracies, mistakes and blunders
+    """
+    cp = eval_matrix(games, white_first)
+    scores = move_scores(cp, white_first)
+
+    stats = []
+    for row, results in enumerate(games):
+        plies = len(results)
+        moves = max(plies - 1, 0)
+        win = scores["win"][row, :plies]
+        classes = scores["classes"][row, :moves]
+        white = scores["white"][row, :moves]
+        scored = scores["scored"][row, :moves]
+        accuracy = scores["accuracy"][row, :moves]
+        loss = scores["loss"][row, :moves]
+        stats.append({
+            "win_probability": [None if np.isnan(p) else round(float(p), 1) for p in win],
+            "classes": [CLASSES[code] if code > 0 else None for code in classes],
+            "white": _side_summary(accuracy[white], loss[white], classes[white], scored[white]),
+            "black": _side_summary(accuracy[~white], loss[~white], classes[~white], scored[~white]),
+        })
+    return stats
+
+def game_stats(results: List[Dict]) -> Dict:
+    """Accuracy, average centipawn loss and move classes for one game, see games_stats()"""
+    return games_stats([results])[0]
+
+def player_stats(games: Sequence[List[Dict]], colours: Sequence[bool]) -> Dict:
+    """
+    Aggregate one player's moves over many games
+
+    Args:
+        games: Results of analyse_pgn() per game
+        colours: True where the player had White, per game
+
+    Returns:
+        Dict with the player's accuracy and acpl over all scored moves, the
+        number of games and moves scored, and class counts
+    """
+    if not games:
+        return {"games": 0, "accuracy": None, "acpl": None, "moves": 0,
+                "inaccuracies": 0, "mistakes": 0, "blunders": 0}
+
+    scores = move_scores(eval_matrix(games))
+    own = scores["white"] == np.asarray(colours, dtype=bool)[:, np.newaxis]
+    summary = _side_summary(
+        scores["accuracy"][own], scores["loss"][own], scores["classes"][own], scores["scored"][own]
+    )
+    summary["games"] = len(games)
+    return summary
@@ -0,0 +1,100 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .pgn import parse_mainline
+
+# Time spent per move is stored as little-endian unsigned deciseconds
+TIME_DTYPE = np.dtype("<u4")
+
+# A player is in time trouble once their clock falls below this share of the base time
+TIME_TROUBLE_FRACTION = 0.1
+
+_TIME_CONTROL = re.compile(r"^(\d+)(?:\+(\d+(?:\.\d+)?))?$")
+
+def parse_time_control(time_control: str) -> Optional[Tuple[float, float]]:
+    """
+    Base time and increment of a Chess.com time control
+
+    Args:
+        time_control: e.g. "180+2" or "600"; daily games ("1/86400") have no clock to track
+
+    Returns:
+        Tuple of (base seconds, increment seconds), or None if not a live time control
+    """
+    match = _TIME_CONTROL.match(time_control or "")
+    if not match:
+        return None
+    return float(match.group(1)), float(match.group(2) or 0)
+
+def move_times(clocks: Sequence[Optional[float]], time_control: str) -> List[int]:
+    """
+    Time spent on each move in deciseconds from the clocks left after each move
+
+    Chess.com clocks include the increment, so a move took the previous
+    clock of that side plus the increment minus the new clock.
+
+    Args:
+        clocks: Seconds left after each ply, from parse_mainline()
+        time_control: Chess.com time control of the game
+
+    Returns:
+        Deciseconds per ply, empty if the game has no live clock or a ply has no clock
+    """
+    control = parse_time_control(time_control)
+    if control is None or not clocks or None in clocks:
+        return []
+    base, increment = control
+    left = np.asarray(clocks, dtype=float)
+    previous = np.empty_like(left)
+    previous[:2] = base
+    previous[2:] = left[:-2]
+    spent = np.maximum(previous + increment - left, 0)
+    return np.rint(spent * 10).astype(int).tolist()
+
+def pack_times(times: Sequence[int]) -> bytes:
+    """Store deciseconds per ply compactly, 4 bytes a move"""
+    return np.asarray(times, dtype=TIME_DTYPE).tobytes()
+
+def unpack_times(data: bytes) -> np.ndarray:
+    """Seconds spent per ply from pack_times() bytes"""
+    return np.frombuffer(bytes(data), dtype=TIME_DTYPE) / 10
+
+def pgn_move_times(pgn_text: str, time_control: str) -> bytes:
+    """Packed time spent per ply read from a PGN's %clk comments, empty without clocks"""
+    return pack_times(move_times(parse_mainline(pgn_text).clocks, time_control))
+
+def time_matrix(packed: Sequence[bytes]) -> np.ndarray:
+    """
+    Unpack many games' move times into one array
+
+    Args:
+        packed: pack_times() bytes per game
+
+    Returns:
+        Float array of seconds, shape (games, longest game), NaN past the end of a game
+    """
+    rows = [unpack_times(data) for data in packed]
+    spent = np.full((len(rows), max((len(row) for row in rows), default=0)), np.nan)
+    for index, row in enumerate(rows):
+        spent[index, :len(row)] = row
+    return spent
+
+def clocks_left(spent: np.ndarray, base: np.ndarray, increment: np.ndarray) -> np.ndarray:
+    """
+    Clock left after each ply, rebuilt from the time spent
+
+    Args:
+        spent: Seconds per ply from time_matrix()
+        base: Base time per game in seconds
+        increment: Increment per game in seconds
+
+    Returns:
+        Array shaped like *spent*, NaN past the end of a game
+    """
+    left = np.full_like(spent, np.nan)
+    for side in (0, 1):
+        used = np.cumsum(np.nan_to_num(spent[:, side::2] - increment[:, np.newaxis]), axis=1)
+        left[:, side::2] = base[:, np.newaxis] - used
+    return np.where(np.isnan(spent), np.nan, left)
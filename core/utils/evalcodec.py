@@ -0,0 +1,162 @@
+import struct
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import chess
+import numpy as np
+
+# Per-game header: magic, version, depth, MultiPV, plies, engine lines in total
+CODEC_MAGIC = b"CAE"
+CODEC_VERSION = 1
+HEADER = struct.Struct("<3sBBBHI")
+
+# One record per ply, then one per engine line, ply by ply
+PLY_DTYPE = np.dtype([("score", "<i2"), ("flags", "u1"), ("source", "u1"), ("lines", "u1")])
+LINE_DTYPE = np.dtype([("move", "<u2"), ("score", "<i2"), ("flags", "u1")])
+
+# Score flags: the score is a mate distance, or there is no score (book moves)
+MATE = 1
+NO_SCORE = 2
+
+# Where a ply's result came from, by code
+SOURCES = ("engine", "book", "tablebase")
+_SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+
+_SCORE_LIMIT = np.iinfo(np.int16).max
+
+class DecodedAnalysis(NamedTuple):
+    """Arrays of an encoded analysis, viewing the encoded bytes without copying them"""
+    depth: int
+    multipv: int
+    plies: np.ndarray  # PLY_DTYPE records
+    lines: np.ndarray  # LINE_DTYPE records
+    size: int  # bytes taken by the analysis, anything after it is not part of it
+
+def move_code(uci: str) -> int:
+    """
+    Pack a UCI move into 16 bits: from square, to square and promotion piece
+
+    Bits 0-5 are the from square, 6-11 the to square and 12-14 the
+    promotion piece type (0 for none), as numbered by python-chess.
+    """
+    move = chess.Move.from_uci(uci)
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+@lru_cache(maxsize=None)
+def move_uci(code: int) -> str:
+    """The UCI move of a move_code()"""
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None).uci()
+
+def _score(value: Optional[int], mate: bool) -> Tuple[int, int]:
+    """Score and flags of one eval or engine line"""
+    if value is None:
+        return 0, NO_SCORE
+    return max(-_SCORE_LIMIT, min(_SCORE_LIMIT, value)), MATE if mate else 0
+
+def encode_analysis(results: List[Dict], *, depth: int = 0, multipv: int = 0) -> bytes:
+    """
+    Encode a game's per-ply results as one packed struct
+
+    Each ply takes 5 bytes (int16 score, flags, source, line count) and each
+    engine line 5 more (16-bit move, int16 score, flags), against roughly
+    60 bytes a line as JSON. Centipawns beyond the int16 range are clipped.
+
+    Args:
+        results: One {"eval", "lines", "source"} dict per ply
+        depth: Search depth the analysis ran at
+        multipv: Number of engine lines searched
+
+    Returns:
+        Header, ply records and line records, little-endian
+
+    Raises:
+        ValueError: For an unknown source or more than 255 lines at one ply
+    """
+    plies = np.zeros(len(results), dtype=PLY_DTYPE)
+    lines = []
+    for ply, result in enumerate(results):
+        score = result.get("eval") or {"type": "cp", "value": 0}
+        source = result.get("source", "engine")
+        if source not in _SOURCE_CODES:
+            raise ValueError(f"Unknown analysis source: {source}")
+        ply_lines = result.get("lines") or []
+        if len(ply_lines) > 255:
+            raise ValueError(f"Too many engine lines at ply {ply}: {len(ply_lines)}")
+
+        plies[ply] = (*_score(score["value"], score["type"] == "mate"), _SOURCE_CODES[source], len(ply_lines))
+        for line in ply_lines:
+            mate = line.get("Mate")
+            lines.append((
+                move_code(line["Move"]),
+                *_score(mate if mate is not None else line.get("Centipawn"), mate is not None),
+            ))
+
+    header = HEADER.pack(CODEC_MAGIC, CODEC_VERSION, depth, multipv, len(results), len(lines))
+    return header + plies.tobytes() + np.array(lines, dtype=LINE_DTYPE).tobytes()
+
+def decode_arrays(data: bytes) -> DecodedAnalysis:
+    """
+    Read an encode_analysis() struct as arrays, without building any dicts
+
+    Args:
+        data: Bytes starting with an encoded analysis
+
+    Returns:
+        DecodedAnalysis with the ply and line records
+
+    Raises:
+        ValueError: If the bytes are not an analysis of this codec version
+    """
+    buffer = memoryview(data)
+    if len(buffer) < HEADER.size:
+        raise ValueError("Encoded analysis is truncated")
+    magic, version, depth, multipv, ply_count, line_count = HEADER.unpack_from(buffer)
+    if magic != CODEC_MAGIC or version != CODEC_VERSION:
+        raise ValueError(f"Not an encoded analysis of version {CODEC_VERSION}")
+
+    lines_at = HEADER.size + ply_count * PLY_DTYPE.itemsize
+    size = lines_at + line_count * LINE_DTYPE.itemsize
+    if len(buffer) < size:
+        raise ValueError("Encoded analysis is truncated")
+    plies = np.frombuffer(buffer, dtype=PLY_DTYPE, count=ply_count, offset=HEADER.size)
+    lines = np.frombuffer(buffer, dtype=LINE_DTYPE, count=line_count, offset=lines_at)
+    return DecodedAnalysis(depth, multipv, plies, lines, size)
+
+def decode_analysis(data: bytes) -> List[Dict]:
+    """
+    Rebuild the per-ply results of an encode_analysis() struct
+
+    Args:
+        data: Bytes starting with an encoded analysis
+
+    Returns:
+        One {"eval", "lines"} dict per ply, tagged with its source unless it
+        came from the engine
+    """
+    decoded = decode_arrays(data)
+    line_moves = decoded.lines["move"].tolist()
+    line_scores = decoded.lines["score"].tolist()
+    line_flags = decoded.lines["flags"].tolist()
+
+    results = []
+    line = 0
+    for score, flags, source, count in decoded.plies.tolist():
+        lines = []
+        for i in range(line, line + count):
+            value = None if line_flags[i] & NO_SCORE else line_scores[i]
+            mate = line_flags[i] & MATE
+            lines.append({
+                "Move": move_uci(line_moves[i]),
+                "Centipawn": None if mate else value,
+                "Mate": value if mate else None,
+            })
+        line += count
+
+        result = {
+            "eval": {"type": "mate" if flags & MATE else "cp", "value": None if flags & NO_SCORE else score},
+            "lines": lines,
+        }
+        if source:
+            result["source"] = SOURCES[source]
+        results.append(result)
+    return results
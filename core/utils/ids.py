@@ -0,0 +1,35 @@
+import hashlib
+import re
+
+# Hex digits of the content hash used as a game's ID in URLs
+PGN_ID_LENGTH = 16
+
+# URL pattern of a game ID, for routes that take one
+PGN_ID_PATTERN = f"[0-9a-f]{{{PGN_ID_LENGTH}}}"
+
+_HASH_PREFIX = re.compile(f"{PGN_ID_PATTERN}|[0-9a-f]{{64}}")
+
+def pgn_hash(pgn_text: str) -> str:
+    """Stable content hash of a PGN, ignoring surrounding whitespace"""
+    return hashlib.sha256(pgn_text.strip().encode("utf-8")).hexdigest()
+
+def pgn_id(pgn_text: str) -> str:
+    """
+    Short ID of a PGN for URLs and channel group names
+
+    Args:
+        pgn_text: PGN text of the game
+
+    Returns:
+        The first PGN_ID_LENGTH hex digits of pgn_hash()
+    """
+    return pgn_hash(pgn_text)[:PGN_ID_LENGTH]
+
+def is_hash_prefix(value: str) -> bool:
+    """
+    Check a game lookup key is a full game ID or a full PGN hash
+
+    Shorter prefixes are refused so that a lookup never resolves to
+    whichever game happens to start with them.
+    """
+    return bool(value) and _HASH_PREFIX.fullmatch(value) is not None
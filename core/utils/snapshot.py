@@ -0,0 +1,80 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+from .evalcodec import MATE, NO_SCORE, SOURCES, decode_analysis, decode_arrays, encode_analysis, move_uci
+
+# Media type of the binary snapshot, for clients that decode it themselves
+SNAPSHOT_CONTENT_TYPE = "application/x-chess-analysis"
+
+def pack_snapshot(results: List[Dict], stats: Optional[Dict] = None, *, depth: int = 0, multipv: int = 0) -> bytes:
+    """
+    Store a finished game analysis compactly
+
+    The per-ply results are an evalcodec struct, followed by the game stats
+    as UTF-8 JSON.
+
+    Args:
+        results: One {"eval", "lines", "source"} dict per ply
+        stats: Game stats sent with the analysis, see game_stats()
+        depth: Search depth the analysis ran at
+        multipv: Number of engine lines searched
+
+    Returns:
+        Snapshot bytes
+    """
+    return encode_analysis(results, depth=depth, multipv=multipv) + json.dumps(stats, separators=(",", ":")).encode("utf-8")
+
+def unpack_snapshot(data: bytes) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    Rebuild the per-ply results and game stats of a pack_snapshot() snapshot
+
+    Args:
+        data: Snapshot bytes
+
+    Returns:
+        Tuple of (one {"eval", "lines"} dict per ply, game stats)
+
+    Raises:
+        ValueError: If the snapshot is not of this codec version
+    """
+    data = bytes(data)
+    size = decode_arrays(data).size
+    return decode_analysis(data), json.loads(data[size:])
+
+def snapshot_json(data: bytes) -> bytes:
+    """
+    A snapshot as JSON with one array per field, for clients without a decoder
+
+    Per-ply evals are split into centipawn and mate arrays (null where the
+    other applies) and every ply's engine lines are flattened into move,
+    centipawn and mate arrays, with line_count giving each ply's share.
+    """
+    data = bytes(data)
+    decoded = decode_arrays(data)
+    plies, lines = decoded.plies, decoded.lines
+
+    def column(records, flag: int) -> List[Optional[int]]:
+        # Scores where the flags match, null elsewhere
+        kind = (records["flags"] & (MATE | NO_SCORE)) == flag
+        return [score if wanted else None for score, wanted in zip(records["score"].tolist(), kind.tolist())]
+
+    body = {
+        "depth": decoded.depth,
+        "multipv": decoded.multipv,
+        "plies": len(plies),
+        "sources": list(SOURCES),
+        "cp": column(plies, 0),
+        "mate": column(plies, MATE),
+        "source": plies["source"].tolist(),
+        "line_count": plies["lines"].tolist(),
+        "line_move": [move_uci(code) for code in lines["move"].tolist()],
+        "line_cp": column(lines, 0),
+        "line_mate": column(lines, MATE),
+        "stats": json.loads(data[decoded.size:]),
+    }
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+def snapshot_etag(data: bytes) -> str:
+    """ETag of a snapshot, weak as the same snapshot is sent in several encodings"""
+    return f'W/"{hashlib.sha256(bytes(data)).hexdigest()[:32]}"'
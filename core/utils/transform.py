@@ -1,25 +1,23 @@
 from datetime import datetime
 from typing import Dict, List
-import base64
+from .ids import pgn_id
 from .outcomes import calculate_outcome_with_class
 
-def massage_game(game: Dict, username: str) -> Dict:
+def massage_game(game: Dict, username: str, *, include_pgn: bool = True) -> Dict:
     """
     Flatten the nested JSON and add user-perspective outcome
     
     Args:
         game: Raw game dictionary from Chess.com API
         username: The username we're analyzing for
+        include_pgn: Whether to include the PGN text, left out of list payloads
         
     Returns:
         Flattened game dictionary with presentation-ready fields
     """
     outcome, outcome_class = calculate_outcome_with_class(game, username)
     
-    # Create a unique ID for the PGN
-    pgn_id = base64.urlsafe_b64encode(game["pgn"].encode()).decode().rstrip('=')
-    
-    return {
+    massaged = {
         "end": datetime.utcfromtimestamp(game["end_time"]),
         "white": game["white"]["username"],
         "white_rating": game["white"]["rating"],
@@ -29,21 +27,25 @@ def massage_game(game: Dict, username: str) -> Dict:
         "black_result": game["black"]["result"],
         "time_class": game["time_class"],
         "pgn": game["pgn"],
-        "pgn_id": pgn_id,
+        "pgn_id": pgn_id(game["pgn"]),
         "url": game.get("url", ""),
         "outcome": outcome,
         "outcome_class": outcome_class,
     }
+    if not include_pgn:
+        del massaged["pgn"]
+    return massaged
 
-def massage_games(games: List[Dict], username: str) -> List[Dict]:
+def massage_games(games: List[Dict], username: str, *, include_pgn: bool = True) -> List[Dict]:
     """
     Massage a list of games
     
     Args:
         games: List of raw game dictionaries from Chess.com API
         username: The username we're analyzing for
+        include_pgn: Whether to include the PGN texts
         
     Returns:
         List of flattened game dictionaries
     """
-    return [massage_game(game, username) for game in games] 
\ No newline at end of file
+    return [massage_game(game, username, include_pgn=include_pgn) for game in games] 
\ No newline at end of file
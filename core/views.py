@@ -1,16 +1,31 @@
+import asyncio
 import json
+import logging
+import re
 from django.views.generic import TemplateView, View
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.shortcuts import render
-import hashlib
-import base64
+from django.utils.http import parse_etags
+from django.utils.text import compress_string
 
-from .services.chesscom import player_profile, player_games
+from .services.chesscom import aplayer_profile, aplayer_games
+from .services.engine import get_pool
+from .services.gamelist import apage_games, find_pgn, parse_filters
+from .services.jobs import running_jobs
+from .services.metrics import render as render_metrics, timed
+from .services.openings import opening_tree
+from .services.report import player_report
+from .services.snapshots import find_snapshot
+from .services.timeusage import time_usage
+from .utils.snapshot import SNAPSHOT_CONTENT_TYPE, snapshot_json
 from .utils.transform import massage_games
 from .forms import UsernameForm
 
+logger = logging.getLogger(__name__)
+
+_accepts_gzip = re.compile(r"\bgzip\b")
+
 class HomeView(TemplateView):
     """Home page with form to enter username"""
     template_name = "core/home.html"
@@ -22,9 +37,9 @@ class HomeView(TemplateView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class FetchGamesAPIView(View):
-    """API endpoint to fetch games for a given username"""
+    """API endpoint to fetch one page of games for a given username, filtered on the server"""
     
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         try:
             data = json.loads(request.body)
             username = data.get('username')
@@ -35,58 +50,81 @@ class FetchGamesAPIView(View):
             # Normalize username to lowercase
             username = username.strip().lower()
             
-            print(f"Fetching games for username: {username}")  # Debug print
+            logger.info(f"Fetching games for username: {username}")
             
-            # Fetch games from Chess.com
-            raw_games = player_games(username, limit=100)
-            processed_games = massage_games(raw_games, username)
+            # Fetch one page of games, leaving the PGNs out of the list
+            filters = parse_filters(data)
+            raw_games, next_cursor = await apage_games(
+                username,
+                filters=filters,
+                cursor=data.get('cursor'),
+                limit=data.get('limit')
+            )
+            with timed("transform"):
+                processed_games = massage_games(raw_games, username, include_pgn=False)
             
-            print(f"Successfully fetched {len(processed_games)} games")  # Debug print
-            return JsonResponse({'games': processed_games})
+            logger.info(f"Fetched {len(processed_games)} games for {username}")
+            return JsonResponse({'games': processed_games, 'next_cursor': next_cursor})
             
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")  # Debug print
+            logger.error(f"Invalid JSON in fetch games request: {e}")
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except ValueError as e:
-            print(f"Value error: {e}")  # Debug print
+            logger.error(f"Error fetching games: {e}")
             return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
-            print(f"Unexpected error: {e}")  # Debug print
+            logger.error(f"Unexpected error fetching games: {e}")
             return JsonResponse({'error': str(e)}, status=500)
 
 class GamesListView(TemplateView):
     """Display list of fetched games"""
     template_name = "core/games_list.html"
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        username = self.request.GET.get('username')
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        username = request.GET.get('username')
         
         if username:
+            profile = None
             try:
-                # Fetch profile information
-                profile = player_profile(username)
+                filters = parse_filters(request.GET)
+                
+                # Fetch profile information and the page of games concurrently
+                profile, page = await asyncio.gather(
+                    aplayer_profile(username),
+                    apage_games(username, filters=filters, cursor=request.GET.get('cursor')),
+                    return_exceptions=True
+                )
+                if isinstance(page, Exception):
+                    raise page
+                raw_games, next_cursor = page
+                with timed("transform"):
+                    processed_games = massage_games(raw_games, username)
                 
-                # Fetch games
-                raw_games = player_games(username, limit=100)
-                processed_games = massage_games(raw_games, username)
+                next_url = None
+                if next_cursor:
+                    params = request.GET.copy()
+                    params['cursor'] = next_cursor
+                    next_url = f"?{params.urlencode()}"
                 
                 context.update({
                     'games': processed_games,
-                    'profile': profile
+                    'profile': profile,
+                    'next_url': next_url,
                 })
             except ValueError as e:
                 context.update({
                     'error': str(e),
-                    'profile': profile if 'profile' in locals() else None
+                    'profile': profile
                 })
         else:
             context.update({
                 'games': [],
                 'profile': None
             })
+        context['filters'] = request.GET
         
-        return context
+        return self.render_to_response(context)
 
 class GameDetailView(TemplateView):
     """Display individual game analysis"""
@@ -96,24 +134,106 @@ class GameDetailView(TemplateView):
         context = super().get_context_data(**kwargs)
         pgn_id = self.kwargs.get('pgn_id')
         
-        # Decode PGN from base64
-        try:
-            pgn_bytes = base64.urlsafe_b64decode(pgn_id + '==')
-            pgn_text = pgn_bytes.decode('utf-8')
+        # Look the PGN up by its short ID
+        pgn_text = find_pgn(pgn_id)
+        if pgn_text is None:
+            context['error'] = f"Game not found: {pgn_id}"
+        else:
             context['pgn_text'] = pgn_text
             context['pgn_id'] = pgn_id
-        except Exception as e:
-            context['error'] = f"Invalid game ID: {str(e)}"
         
         return context
 
+class PlayerReportView(TemplateView):
+    """Display a player's results and accuracy over all stored games"""
+    template_name = "core/report.html"
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        username = self.kwargs.get('username')
+        
+        report = player_report(username)
+        if report is None:
+            context['error'] = f'No games stored for "{username}" yet. Fetch their games first.'
+        else:
+            context['time_usage'] = time_usage(username)
+        context['report'] = report
+        context['username'] = username
+        return context
+
+class OpeningTreeAPIView(View):
+    """API endpoint returning a player's opening tree below a position"""
+    
+    def get(self, request, *args, **kwargs):
+        username = self.kwargs.get('username')
+        moves = [move for move in request.GET.get('moves', '').split(',') if move]
+        
+        try:
+            tree = opening_tree(
+                username,
+                fen=request.GET.get('fen') or None,
+                moves=moves,
+                colour=request.GET.get('colour') or None,
+                depth=int(request.GET.get('depth', 1))
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        if tree is None:
+            return JsonResponse({'error': f'No games stored for "{username}"'}, status=404)
+        return JsonResponse(tree)
+
+class TimeUsageAPIView(View):
+    """API endpoint returning how a player uses their clock"""
+    
+    def get(self, request, *args, **kwargs):
+        username = self.kwargs.get('username')
+        usage = time_usage(username, time_class=request.GET.get('time_class') or None)
+        
+        if usage is None:
+            return JsonResponse({'error': f'No games stored for "{username}"'}, status=404)
+        return JsonResponse(usage)
+
+class AnalysisSnapshotView(View):
+    """API endpoint returning a game's finished analysis as a compact snapshot"""
+    
+    def get(self, request, *args, **kwargs):
+        pgn_id = self.kwargs.get('pgn_id')
+        try:
+            depth = int(request.GET['depth']) if request.GET.get('depth') else None
+            multipv = int(request.GET['multipv']) if request.GET.get('multipv') else None
+        except ValueError:
+            return JsonResponse({'error': 'depth and multipv must be numbers'}, status=400)
+        
+        snapshot = find_snapshot(pgn_id, depth=depth, multipv=multipv)
+        if snapshot is None:
+            return JsonResponse({'error': f'No finished analysis for game {pgn_id}'}, status=404)
+        
+        # The snapshot never changes for these settings, clients revalidate it by ETag
+        if snapshot.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            # Clients with a decoder get the stored bytes, others columnar JSON
+            if SNAPSHOT_CONTENT_TYPE in request.headers.get('Accept', ''):
+                body, content_type = bytes(snapshot.data), SNAPSHOT_CONTENT_TYPE
+            else:
+                body, content_type = snapshot_json(snapshot.data), 'application/json'
+            gzipped = bool(_accepts_gzip.search(request.headers.get('Accept-Encoding', '')))
+            response = HttpResponse(compress_string(body) if gzipped else body, content_type=content_type)
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = snapshot.etag
+        response['Vary'] = 'Accept, Accept-Encoding'
+        response['Cache-Control'] = 'no-cache'
+        return response
+
 class TestAPIView(View):
     """Test endpoint to verify Chess.com API is working"""
     
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         try:
             # Test with a known public account
-            raw_games = player_games('Hikaru', limit=5)
+            raw_games = await aplayer_games('Hikaru', limit=5)
             processed_games = massage_games(raw_games, 'Hikaru')
             
             return JsonResponse({
@@ -123,3 +243,19 @@ class TestAPIView(View):
             })
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)})
+
+class MetricsView(View):
+    """Prometheus metrics of this process: stage timings, cache lookups, engine pool and analyses"""
+    
+    def get(self, request, *args, **kwargs):
+        pool = get_pool().stats()
+        gauges = {
+            "chess_analysis_engine_pool_size": ("Engines the pool may run at once", pool["size"]),
+            "chess_analysis_engine_pool_alive": ("Engine processes started and not stopped", pool["alive"]),
+            "chess_analysis_engine_pool_in_use": ("Engines checked out by an analysis", pool["in_use"]),
+            "chess_analysis_engine_pool_idle": ("Engines waiting for an analysis", pool["idle"]),
+            "chess_analysis_engine_pool_waiting": ("Analyses waiting for a free engine", pool["waiting"]),
+            "chess_analysis_engine_pool_restarts": ("Crashed engines replaced since start", pool["restarts"]),
+            "chess_analysis_jobs_running": ("Analysis jobs running in this process", running_jobs()),
+        }
+        return HttpResponse(render_metrics(gauges), content_type="text/plain; version=0.0.4; charset=utf-8")